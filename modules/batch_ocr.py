@@ -0,0 +1,436 @@
+"""
+Kommandozeilen-Stapelverarbeitung ohne GUI: wendet einen gespeicherten Filterstapel aus
+settings.json auf Bilder und PDFs an und führt OCR darauf aus.
+
+Beispiel:
+    python batch.py scans/ "archiv/**/*.pdf" -o ergebnis --workers 16 --backend tesseract_cpu
+
+Für jede Eingabedatei entsteht <Ausgabe>/<relativer Pfad>.txt, mit --format außerdem bzw.
+stattdessen .hocr (hOCR), .xml (ALTO) und .pdf (durchsuchbares PDF mit dem ungefilterten
+Seitenbild, siehe modules.ocr_export):
+    python batch.py scans/ -o ergebnis --format txt,pdf --pdf-images jpeg --jpeg-quality 60
+
+Fertige Seiten werden in
+<Ausgabe>/manifest.jsonl protokolliert; ein abgebrochener Lauf setzt beim nächsten Aufruf
+mit denselben Argumenten an dieser Stelle fort. Am Ende steht eine Zusammenfassung mit
+Durchsatz und Zeiten pro Datei in <Ausgabe>/summary.json.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from modules.documents import TIFF_EXTENSIONS, TiffDocument, open_document, open_image
+from modules.ocr_export import (
+    COMPRESSIONS, EXPORT_FORMATS, ImageOptions, export_results, load_page as load_stored_page, open_writer,
+    parse_formats, save_page
+)
+from modules.tracing import trace_span
+
+SUPPORTED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".pdf")
+
+
+def _is_under(path, directory):
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Verschiedene Laufwerke (Windows)
+        return False
+
+
+def collect_files(inputs, exclude=()):
+    """
+    Löst Verzeichnisse (rekursiv), Glob-Muster und einzelne Dateien zu einer sortierten
+    Liste unterstützter Dateien auf. Dateien unterhalb der Verzeichnisse in exclude (etwa
+    das Ausgabeverzeichnis mit den exportierten PDFs) werden übergangen.
+    """
+    excluded = [os.path.normcase(os.path.realpath(directory)) for directory in exclude]
+    files = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            candidates = glob.glob(os.path.join(entry, "**", "*"), recursive=True)
+        elif glob.has_magic(entry):
+            candidates = glob.glob(entry, recursive=True)
+        else:
+            candidates = [entry]
+        for path in candidates:
+            if not (os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS)):
+                continue
+            real = os.path.normcase(os.path.realpath(path))
+            if not any(_is_under(real, directory) for directory in excluded):
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def count_pages(path, poppler_path=None):
+    if path.lower().endswith(".pdf"):
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(path, poppler_path=poppler_path)["Pages"])
+    if path.lower().endswith(TIFF_EXTENSIONS):
+        document = TiffDocument(path)
+        document.close()
+        return document.page_count
+    return 1
+
+
+def load_page(path, page, dpi=200, poppler_path=None):
+    """
+    Lädt Seite page (1-basiert) einer Datei als RGB-Bild; bei PDFs wird nur diese Seite gerastert,
+    bei TIFFs nur diese Seite dekodiert (Graustufenseiten bleiben dabei "L", siehe TiffDocument).
+    """
+    if path.lower().endswith(".pdf"):
+        from pdf2image import convert_from_path
+        with trace_span("load:pdf", file=os.path.basename(path), page=page, dpi=dpi):
+            pages = convert_from_path(path, dpi=dpi, first_page=page, last_page=page, poppler_path=poppler_path)
+            return pages[0].convert("RGB")
+    if path.lower().endswith(TIFF_EXTENSIONS):
+        document = TiffDocument(path, cache_size=0)
+        try:
+            return document.get_page(page - 1)
+        finally:
+            document.close()
+    with trace_span("load:image", file=os.path.basename(path)), open_image(path) as image:
+        return image.convert("RGB")
+
+
+def page_dpi(path, page, dpi=200):
+    """
+    Auflösung (x, y) von Seite page: bei PDFs die Rasterauflösung, sonst die Angabe der Datei.
+    """
+    if path.lower().endswith(".pdf"):
+        return (float(dpi), float(dpi))
+    document = open_document(path)
+    try:
+        return document.page_dpi(page - 1)
+    finally:
+        document.close()
+
+
+def recognize(image, backend, lang):
+    """
+    Führt OCR mit dem gewählten Backend aus und liefert ein Dictionary mit 'text' und 'words'.
+    Fehler werden weitergereicht, damit die Seite als fehlgeschlagen protokolliert und beim
+    nächsten Lauf erneut versucht wird.
+    """
+    if backend.startswith("tesseract"):
+        # Wie ocr_page (mit OCR-Cache), aber ohne den Fehler als Seitentext einzutragen
+        from modules.ocr_display import recognize_page
+        words, _ = recognize_page(image, lang)
+        return {'text': words.full_text(), 'words': words}
+    from modules.ocr_factory import recognize_cached
+    words = recognize_cached(image, backend, lang)
+    return {'text': "\n".join(words.texts()), 'words': words}
+
+
+def _init_worker():
+    # Parallelisiert wird über die Prozesse; Tesseract selbst soll nur einen Thread nutzen
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    # Ebenso die gekachelte Verarbeitung sehr großer Seiten
+    os.environ.setdefault("TILE_WORKERS", "1")
+    from modules.tesseract_pool import configure_engine_pool
+    configure_engine_pool(size=1)
+
+
+def process_page(path, page, layers, backend, lang, dpi, poppler_path, formats=("txt",), image_options=None):
+    """
+    Arbeitsschritt eines Worker-Prozesses: Seite laden, Filterstapel anwenden, OCR. Für andere
+    Formate als txt kommen die Wörter und fürs PDF das kodierte Seitenbild unter 'export' mit:
+    das Original, bei einem drehenden Stapel (Deskew) das gefilterte Bild, auf dem die
+    Wortboxen gemessen wurden.
+    """
+    from modules.pipeline import apply_pipeline, changes_geometry
+    timings = {}
+    with trace_span("batch:page", file=path, page=page) as span:
+        start = time.perf_counter()
+        original = load_page(path, page, dpi, poppler_path)
+        timings['load'] = time.perf_counter() - start
+        start = time.perf_counter()
+        image = apply_pipeline(original, layers) if layers else original
+        timings['filter'] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            result = recognize(image, backend, lang)
+        except Exception as e:
+            # Manche Ausnahmen (z. B. TesseractNotFoundError) lassen sich nicht zurück in den
+            # Hauptprozess übertragen und würden den ganzen Pool abbrechen
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        timings['ocr'] = time.perf_counter() - start
+        span.set(size=image.size, words=len(result['words']))
+        output = {'file': path, 'page': page, 'text': result['text'], 'words': len(result['words']),
+                  'timings': timings}
+        if any(name != "txt" for name in formats):
+            start = time.perf_counter()
+            export = {'page': page, 'words': result['words'], 'size': image.size, 'dpi': page_dpi(path, page, dpi)}
+            if "pdf" in formats:
+                embedded, source = original, path
+                if changes_geometry(layers):
+                    embedded, source = image, None
+                # Nur Einzelbilder können unverändert übernommen werden (JPEG ohne Neukodierung)
+                if path.lower().endswith((".pdf",) + TIFF_EXTENSIONS):
+                    source = None
+                export['image'] = (image_options or ImageOptions()).encode(embedded, export['dpi'], source=source)
+            timings['export'] = time.perf_counter() - start
+            output['export'] = export
+    return output
+
+
+class BatchJob:
+    """
+    Verwaltet Ausgabeverzeichnis, Checkpoint-Manifest und Statistik eines Stapellaufs.
+    Bis eine Datei vollständig ist, liegen ihre Seiten einzeln unter <Ausgabe>/.pages.
+    """
+
+    def __init__(self, files, output_dir, formats=("txt",), lang="deu", image_options=None):
+        self.files = files
+        self.output_dir = output_dir
+        self.formats = formats
+        self.lang = lang
+        self.image_options = image_options
+        self.manifest_path = os.path.join(output_dir, "manifest.jsonl")
+        base = os.path.commonpath([os.path.dirname(path) for path in files]) if files else output_dir
+        self.base_dir = base
+        self.done_pages = {}
+        self.done_files = {}
+        self.page_counts = {}
+        self.stats = {}
+        self.failures = []
+        os.makedirs(output_dir, exist_ok=True)
+        self._read_manifest()
+        self._manifest = open(self.manifest_path, "a", encoding="utf-8")
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Eine beim Abbruch nur halb geschriebene Zeile wird ignoriert
+                    continue
+                if entry.get("done"):
+                    self.done_files[entry["file"]] = entry["pages"]
+                elif "error" not in entry:
+                    self.done_pages.setdefault(entry["file"], set()).add(entry["page"])
+
+    def output_path(self, path, extension=".txt"):
+        return os.path.join(self.output_dir, os.path.relpath(path, self.base_dir) + extension)
+
+    def page_path(self, path, page, extension=".txt"):
+        return os.path.join(self.output_dir, ".pages", os.path.relpath(path, self.base_dir), f"{page:05d}{extension}")
+
+    def _log(self, entry):
+        self._manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._manifest.flush()
+
+    def pending_pages(self, path, page_count):
+        done = self.done_pages.get(path, set())
+        return [page for page in range(1, page_count + 1) if page not in done]
+
+    def record_page(self, result):
+        path, page = result['file'], result['page']
+        page_path = self.page_path(path, page)
+        os.makedirs(os.path.dirname(page_path), exist_ok=True)
+        if "txt" in self.formats:
+            with open(page_path, "w", encoding="utf-8") as f:
+                f.write(result['text'])
+        if 'export' in result:
+            save_page(self.page_path(path, page, ".npz"), result['export'])
+        self.done_pages.setdefault(path, set()).add(page)
+        stats = self.stats.setdefault(path, {'pages': 0, 'load': 0.0, 'filter': 0.0, 'ocr': 0.0})
+        stats['pages'] += 1
+        for key, seconds in result['timings'].items():
+            stats[key] = stats.get(key, 0.0) + seconds
+        self._log({'file': path, 'page': page, 'words': result['words'], 'timings': result['timings']})
+        if len(self.done_pages[path]) == self.page_counts[path]:
+            self.finish_file(path)
+
+    def record_failure(self, path, page, error):
+        self.failures.append({'file': path, 'page': page, 'error': str(error)})
+        self._log({'file': path, 'page': page, 'error': str(error)})
+
+    def stored_page(self, path, page):
+        """
+        Liest eine zwischengespeicherte Seite für die Writer aus modules.ocr_export.
+        """
+        result = {'page': page}
+        if any(name != "txt" for name in self.formats):
+            result.update(load_stored_page(self.page_path(path, page, ".npz")))
+        if "txt" in self.formats:
+            with open(self.page_path(path, page), "r", encoding="utf-8") as f:
+                result['text'] = f.read()
+        return result
+
+    def finish_file(self, path):
+        """
+        Schreibt die Seiten einer vollständig erkannten Datei der Reihe nach in die
+        Ausgabedateien aller Formate; dabei ist immer nur eine Seite im Speicher.
+        """
+        os.makedirs(os.path.dirname(self.output_path(path)), exist_ok=True)
+        writers = [open_writer(name, self.output_path(path, EXPORT_FORMATS[name]), lang=self.lang,
+                               title=os.path.basename(path), image_options=self.image_options)
+                   for name in self.formats]
+        pages = (self.stored_page(path, page) for page in range(1, self.page_counts[path] + 1))
+        with trace_span("batch:export", file=path, formats=",".join(self.formats)):
+            export_results(pages, writers)
+        shutil.rmtree(os.path.dirname(self.page_path(path, 1)), ignore_errors=True)
+        self.done_files[path] = self.page_counts[path]
+        self._log({'file': path, 'done': True, 'pages': self.page_counts[path]})
+
+    def close(self):
+        self._manifest.close()
+
+
+def run_batch(files, output_dir, layers, backend="tesseract_cpu", lang="deu", workers=None,
+              dpi=200, poppler_path=None, progress=print, formats=("txt",), image_options=None):
+    """
+    Verarbeitet alle Dateien und gibt die Zusammenfassung als Dictionary zurück.
+    formats sind Schlüssel aus ocr_export.EXPORT_FORMATS; image_options gilt für das PDF.
+    """
+    workers = workers or os.cpu_count() or 1
+    job = BatchJob(files, output_dir, formats, lang, image_options)
+    start = time.perf_counter()
+    tasks = []
+    skipped = 0
+    for path in files:
+        if path in job.done_files:
+            skipped += job.done_files[path]
+            continue
+        try:
+            job.page_counts[path] = count_pages(path, poppler_path)
+        except Exception as e:
+            job.record_failure(path, None, e)
+            continue
+        pending = job.pending_pages(path, job.page_counts[path])
+        skipped += job.page_counts[path] - len(pending)
+        if not pending:
+            job.finish_file(path)
+        tasks.extend((path, page, layers, backend, lang, dpi, poppler_path, formats, image_options)
+                     for page in pending)
+
+    processed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            in_flight = {}
+            task_iter = iter(tasks)
+            while True:
+                # Höchstens zwei Seiten pro Worker gleichzeitig im Umlauf halten
+                while len(in_flight) < 2 * workers:
+                    task = next(task_iter, None)
+                    if task is None:
+                        break
+                    in_flight[executor.submit(process_page, *task)] = task
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path, page = in_flight.pop(future)[:2]
+                    try:
+                        job.record_page(future.result())
+                        processed += 1
+                        progress(f"[{processed}/{len(tasks)}] {os.path.relpath(path, job.base_dir)} Seite {page}")
+                    except Exception as e:
+                        job.record_failure(path, page, e)
+                        progress(f"Fehler: {path} Seite {page}: {e}")
+    finally:
+        job.close()
+
+    wall = time.perf_counter() - start
+    summary = {
+        'files': len(files),
+        'files_done': len(job.done_files),
+        'pages_processed': processed,
+        'pages_skipped': skipped,
+        'failures': job.failures,
+        'workers': workers,
+        'backend': backend,
+        'formats': list(formats),
+        'wall_seconds': wall,
+        'pages_per_second': processed / wall if wall > 0 else 0.0,
+        'per_file': job.stats,
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4, ensure_ascii=False)
+    return summary
+
+
+def main(argv=None):
+    from modules.ocr_factory import OCR_BACKENDS
+    parser = argparse.ArgumentParser(description="OCR-Stapelverarbeitung für Bilder und PDFs (ohne GUI).")
+    parser.add_argument("inputs", nargs="+", help="Dateien, Verzeichnisse oder Glob-Muster")
+    parser.add_argument("-o", "--output", default="ocr_output", help="Ausgabeverzeichnis (Standard: ocr_output)")
+    parser.add_argument("--settings", help="settings.json mit dem Filterstapel (Standard: keine Filter)")
+    parser.add_argument("--backend", default=None, choices=OCR_BACKENDS,
+                        help="OCR-Backend (Standard: aus --settings, sonst tesseract_cpu)")
+    parser.add_argument("--lang", default=None, help="OCR-Sprache (Standard: aus --settings, sonst deu)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Worker-Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--dpi", type=int, default=200, help="Auflösung beim Rastern von PDFs")
+    parser.add_argument("--poppler-path", default=None, help="Verzeichnis der Poppler-Programme")
+    parser.add_argument("--cache-dir", default=None, help="Verzeichnis des OCR-Caches (Standard: ocr_cache)")
+    parser.add_argument("--no-cache", action="store_true", help="OCR-Cache weder lesen noch schreiben")
+    parser.add_argument("--max-pixels", type=int, default=None,
+                        help="Größte zulässige Seite in Pixeln, als Schutz vor Dekompressionsbomben "
+                             "(Standard: 1 Milliarde; 0 = Grenze von Pillow, etwa 89 Megapixel)")
+    parser.add_argument("--format", default="txt",
+                        help=f"Ausgabeformate, durch Komma getrennt: {', '.join(EXPORT_FORMATS)} (Standard: txt)")
+    parser.add_argument("--pdf-images", default="auto", choices=COMPRESSIONS,
+                        help="Seitenbilder im PDF: auto (JPEG-Dateien unverändert, Schwarzweiß verlustfrei, "
+                             "sonst JPEG), jpeg oder lossless (Standard: auto)")
+    parser.add_argument("--jpeg-quality", type=int, default=75, help="JPEG-Qualität der Seitenbilder im PDF")
+    parser.add_argument("--pdf-max-dpi", type=int, default=0,
+                        help="Seitenbilder im PDF höchstens mit dieser Auflösung (Standard: Quellauflösung)")
+    args = parser.parse_args(argv)
+    try:
+        formats = parse_formats(args.format)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    image_options = ImageOptions(args.pdf_images, args.jpeg_quality, args.pdf_max_dpi)
+    # Über die Umgebung gelangen die Cache-Einstellungen auch in die Worker-Prozesse
+    if args.no_cache:
+        os.environ["OCR_CACHE"] = "0"
+    if args.cache_dir:
+        os.environ["OCR_CACHE_DIR"] = os.path.abspath(args.cache_dir)
+    if args.max_pixels is not None:
+        os.environ["MAX_PAGE_PIXELS"] = str(args.max_pixels)
+
+    from modules.pipeline_spec import PipelineSpec
+    settings = {}
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = json.load(f)
+    spec = PipelineSpec.from_settings(settings)
+    backend = args.backend or spec.backend
+    lang = args.lang or spec.lang
+    poppler_path = args.poppler_path or settings.get("poppler_path") or None
+    if poppler_path and not os.path.isdir(poppler_path):
+        poppler_path = None
+
+    if backend not in OCR_BACKENDS:
+        print(f"Unbekanntes OCR-Backend: {backend}", file=sys.stderr)
+        return 2
+    missing = OCR_BACKENDS[backend].missing()
+    if missing:
+        print(f"Das OCR-Backend {backend} ist nicht verfügbar, es fehlt: {', '.join(missing)} "
+              f"({OCR_BACKENDS[backend].install_hint})", file=sys.stderr)
+        return 2
+
+    files = collect_files(args.inputs, exclude=[args.output])
+    if not files:
+        print("Keine passenden Dateien gefunden.", file=sys.stderr)
+        return 1
+    summary = run_batch(files, args.output, spec.active_layers, backend=backend, lang=lang,
+                        workers=args.workers, dpi=args.dpi, poppler_path=poppler_path,
+                        formats=formats, image_options=image_options)
+    print(f"{summary['pages_processed']} Seiten in {summary['wall_seconds']:.1f} s "
+          f"({summary['pages_per_second']:.2f} Seiten/s), {summary['pages_skipped']} bereits erledigt, "
+          f"{len(summary['failures'])} Fehler")
+    return 1 if summary['failures'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
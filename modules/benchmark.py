@@ -0,0 +1,335 @@
+"""
+Reproduzierbare Leistungsmessung ohne GUI und ohne Netzwerk.
+
+Beispiel:
+    python bench.py -o messung_neu.json
+    python bench.py -o messung_neu.json --compare messung_alt.json --suites filters,stacks
+
+Gemessen wird auf synthetischen Dokumentseiten mit bekanntem Text (fester Zufallsstartwert,
+mehrere Größen):
+- filters: jeder Filter einzeln über apply_filter (ops/s und Megapixel/s),
+- stacks:  typische Stapel aus fünf Ebenen auf demselben Weg wie update_image_op
+           (LayerCache auf der Vorschau und in voller Auflösung, dazu eine Reglerbewegung
+           auf der vierten Ebene, bei der nur die Ebenen ab dort neu berechnet werden),
+- pdf:     Rastern einer mehrseitigen PDF in verschiedenen Auflösungen (Seiten/s, Poppler nötig),
+- ocr:     Durchsatz (Seiten/s), Kaltstart und Wortgenauigkeit jedes installierten OCR-Backends.
+
+Jede Gruppe läuft in einem eigenen Prozess, sodass der Spitzenwert des Arbeitsspeichers
+(peak RSS) ihr zugeordnet werden kann. Der OCR-Cache ist während der Messung abgeschaltet.
+Das Ergebnis ist eine JSON-Datei mit 'meta' (Umgebung) und 'results'; mit --compare werden
+die Zeiten gegen eine frühere Messung gestellt.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Seitengrößen in Pixeln (Format und Auflösung)
+SIZES = {
+    "a5_150dpi": (874, 1240),
+    "a4_200dpi": (1654, 2339),
+    "a4_300dpi": (2480, 3508),
+    "a0_150dpi": (4967, 7022),
+}
+DEFAULT_SIZES = ("a5_150dpi", "a4_200dpi", "a4_300dpi")
+SUITES = ("filters", "stacks", "pdf", "ocr")
+
+# Typische Stapel aus fünf Ebenen
+STACKS = {
+    "scan_bereinigen": [("Graustufen", 1.0), ("Kontrast", 0.5), ("Weichzeichnen", 0.2),
+                        ("Sauvola", 0.6), ("Smooth", 0.5)],
+    "foto": [("Helligkeit", 0.2), ("Kontrast", 0.3), ("Gamma Correction", 0.4),
+             ("Schärfen", 0.5), ("Color Boost", 0.3)],
+    "ocr_binarisieren": [("Deskew", 1.0), ("Graustufen", 1.0), ("Adaptive Threshold", 1.0),
+                         ("Detail", 0.5), ("Otsu", 1.0)],
+}
+# Größe des Vorschau-Canvas, auf die update_image_op während der Reglerbewegung verkleinert
+PREVIEW_SIZE = (800, 600)
+
+WORDS = ("Rechnung Lieferung Betrag Datum Kunde Nummer Menge Preis Steuer Summe Anschrift "
+         "Straße Postfach Konto Zahlung Frist Mahnung Vertrag Auftrag Angebot Bestellung "
+         "Artikel Einheit Rabatt Versand Gesamt netto brutto Seite Termin Bemerkung Unterschrift "
+         "Abteilung Zeichen Betreff Anlage Leistung Zeitraum Stunden").split()
+
+
+def make_document(size, seed=0):
+    """
+    Erzeugt eine Dokumentseite mit bekanntem Text: Zeilen aus deutschen Wörtern auf leicht
+    grauem, verrauschtem Papier. Liefert (Bild, Text).
+    """
+    rng = random.Random(seed)
+    width, height = size
+    font_size = max(10, width // 60)
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except (TypeError, OSError):
+        # Pillow ohne FreeType: nur die kleine Bitmap-Schrift
+        font = ImageFont.load_default()
+    margin = width // 12
+    line_height = int(font_size * 1.8)
+    image = Image.new("L", size, 238)
+    draw = ImageDraw.Draw(image)
+    lines = []
+    y = margin
+    while y + line_height < height - margin:
+        words = []
+        while True:
+            candidate = words + [rng.choice(WORDS)]
+            if draw.textlength(" ".join(candidate), font=font) > width - 2 * margin:
+                break
+            words = candidate
+        draw.text((margin, y), " ".join(words), fill=25, font=font)
+        lines.append(" ".join(words))
+        # Absätze wie in echten Dokumenten
+        y += line_height * (2 if rng.random() < 0.15 else 1)
+    noise = Image.effect_noise(size, 12)
+    image = Image.blend(image, noise, 0.15)
+    return image.convert("RGB"), "\n".join(lines)
+
+
+def measure(func, repeat=5, min_seconds=0.2):
+    """
+    Führt func mindestens repeat-mal und mindestens min_seconds lang aus und liefert den
+    Median der Laufzeiten in Sekunden.
+    """
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - start < min_seconds:
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+        if len(times) >= 100 * repeat:
+            break
+    return statistics.median(times)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # Windows: ohne zusätzliche Pakete nicht verfügbar
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux meldet KiB, macOS Bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def bench_filters(sizes, repeat):
+    from modules.filters import FILTER_KERNELS, apply_filter
+    results = []
+    for size_name in sizes:
+        image, _ = make_document(SIZES[size_name])
+        megapixels = image.width * image.height / 1e6
+        for name in FILTER_KERNELS:
+            seconds = measure(lambda: apply_filter(image, name, 0.7), repeat)
+            results.append({'suite': "filters", 'name': name, 'size': size_name, 'seconds': seconds,
+                            'ops_per_s': 1 / seconds, 'megapixels_per_s': megapixels / seconds})
+    return results
+
+
+def bench_stacks(sizes, repeat):
+    from modules.render_cache import LayerCache
+    results = []
+    for size_name in sizes:
+        image, _ = make_document(SIZES[size_name])
+        scale = min(1.0, PREVIEW_SIZE[0] / image.width, PREVIEW_SIZE[1] / image.height)
+        preview = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                               Image.BILINEAR, reducing_gap=2.0)
+        for stack_name, layers in STACKS.items():
+            cache = LayerCache()
+            start = time.perf_counter()
+            cache.render(preview, layers, scale)
+            preview_cold = time.perf_counter() - start
+            # Reglerbewegung auf Ebene 4: die Ebenen davor kommen aus dem Cache
+            strengths = iter([0.1 * step for step in range(1, 1000)])
+
+            def drag():
+                changed = list(layers)
+                changed[3] = (changed[3][0], next(strengths) % 1.0)
+                cache.render(preview, changed, scale)
+            drag_seconds = measure(drag, repeat)
+            full_seconds = measure(lambda: LayerCache().render(image, layers, 1.0), max(1, repeat // 2))
+            results.append({'suite': "stacks", 'name': stack_name, 'size': size_name,
+                            'layers': [list(layer) for layer in layers], 'seconds': full_seconds,
+                            'ops_per_s': 1 / full_seconds, 'preview_cold_seconds': preview_cold,
+                            'preview_drag_seconds': drag_seconds, 'preview_drag_ops_per_s': 1 / drag_seconds})
+    return results
+
+
+def bench_pdf(dpis, pages=3, poppler_path=None):
+    from pdf2image import convert_from_path
+    images = [make_document(SIZES["a4_200dpi"], seed=page)[0] for page in range(pages)]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.pdf")
+        images[0].save(path, save_all=True, append_images=images[1:], resolution=200)
+        for dpi in dpis:
+            try:
+                start = time.perf_counter()
+                for page in range(1, pages + 1):
+                    convert_from_path(path, dpi=dpi, first_page=page, last_page=page, poppler_path=poppler_path)
+                seconds = (time.perf_counter() - start) / pages
+                results.append({'suite': "pdf", 'name': f"{dpi}dpi", 'size': "a4", 'seconds': seconds,
+                                'pages_per_s': 1 / seconds})
+            except Exception as e:
+                results.append({'suite': "pdf", 'name': f"{dpi}dpi", 'size': "a4", 'error': str(e)})
+    return results
+
+
+def bench_ocr(backends, sizes, lang, repeat):
+    from modules.ocr_factory import get_ocr_module
+    from modules.preset_search import word_accuracy
+    results = []
+    for backend in backends:
+        for size_name in sizes:
+            image, truth = make_document(SIZES[size_name])
+            entry = {'suite': "ocr", 'name': backend, 'size': size_name}
+            try:
+                perform_ocr = get_ocr_module(backend)
+                # Der erste Aufruf enthält das Laden von Engine bzw. Modell
+                start = time.perf_counter()
+                words = perform_ocr(image, lang=lang)
+                entry['cold_seconds'] = time.perf_counter() - start
+                seconds = measure(lambda: perform_ocr(image, lang=lang), repeat, min_seconds=0)
+                text = " ".join(words.texts())
+                entry.update(seconds=seconds, pages_per_s=1 / seconds, accuracy=word_accuracy(text, truth),
+                             words=len(words))
+            except Exception as e:
+                entry['error'] = str(e)
+            results.append(entry)
+    return results
+
+
+def run_suite(suite, options):
+    """
+    Läuft in einem eigenen Prozess; liefert die Ergebnisse samt peak RSS dieses Prozesses.
+    """
+    if suite == "filters":
+        results = bench_filters(options['sizes'], options['repeat'])
+    elif suite == "stacks":
+        results = bench_stacks(options['sizes'], options['repeat'])
+    elif suite == "pdf":
+        results = bench_pdf(options['dpis'], poppler_path=options['poppler_path'])
+    else:
+        results = bench_ocr(options['backends'], options['ocr_sizes'], options['lang'], options['repeat'])
+    peak = peak_rss_mb()
+    for result in results:
+        result['peak_rss_mb'] = peak
+    return results
+
+
+def environment():
+    import numpy
+    import PIL
+    meta = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pillow': PIL.__version__,
+        'numpy': numpy.__version__,
+    }
+    try:
+        meta['git_commit'] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    try:
+        from modules.tesseract_pool import tesseract_version
+        meta['tesseract'] = tesseract_version()
+    except Exception:
+        pass
+    return meta
+
+
+def result_key(result):
+    return result['suite'], result['name'], result['size']
+
+
+def compare(old, new):
+    """
+    Stellt die Zeiten zweier Messungen gegenüber; Faktor < 1 heißt schneller.
+    """
+    previous = {result_key(result): result for result in old['results'] if 'seconds' in result}
+    lines = []
+    for result in new['results']:
+        before = previous.get(result_key(result))
+        if before is None or 'seconds' not in result:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        marker = "  <-- langsamer" if ratio > 1.1 else ("  schneller" if ratio < 0.9 else "")
+        lines.append(f"{result['suite']:8} {result['name']:20} {result['size']:10} "
+                     f"{before['seconds'] * 1000:9.1f} ms -> {result['seconds'] * 1000:9.1f} ms  x{ratio:.2f}{marker}")
+    return lines
+
+
+def run_benchmarks(suites=SUITES, sizes=DEFAULT_SIZES, repeat=5, dpis=(100, 200, 300), backends=None,
+                   ocr_sizes=("a4_200dpi",), lang='deu', poppler_path=None, progress=print):
+    """
+    Führt die gewählten Gruppen nacheinander in je einem frischen Prozess aus.
+    """
+    if backends is None:
+        from modules.ocr_factory import available_backends
+        backends = available_backends()
+    options = {'sizes': list(sizes), 'repeat': repeat, 'dpis': list(dpis), 'backends': list(backends),
+               'ocr_sizes': list(ocr_sizes), 'lang': lang, 'poppler_path': poppler_path}
+    # Messungen sollen die Erkennung messen, nicht den Cache
+    os.environ["OCR_CACHE"] = "0"
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for suite in suites:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            suite_results = executor.submit(run_suite, suite, options).result()
+        results.extend(suite_results)
+        errors = sum(1 for result in suite_results if 'error' in result)
+        progress(f"{suite}: {len(suite_results)} Messungen in {time.perf_counter() - start:.1f} s"
+                 + (f", {errors} mit Fehler" if errors else ""))
+    return {'meta': dict(environment(), options=options), 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Leistungsmessung für Filter, Rendering, PDF-Rastern und OCR.")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="Ergebnisdatei (JSON)")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Kommagetrennte Auswahl aus {', '.join(SUITES)}")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help=f"Seitengrößen aus {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Mindestanzahl der Wiederholungen pro Messung")
+    parser.add_argument("--dpis", default="100,200,300", help="Auflösungen für das PDF-Rastern")
+    parser.add_argument("--backends", help="Kommagetrennte OCR-Backends (Standard: alle installierten)")
+    parser.add_argument("--ocr-sizes", default="a4_200dpi", help="Seitengrößen für die OCR-Messung")
+    parser.add_argument("--lang", default="deu")
+    parser.add_argument("--poppler-path", default=None)
+    parser.add_argument("--compare", help="Frühere Ergebnisdatei, gegen die verglichen wird")
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.suites.split(",")]
+    sizes = [size.strip() for size in args.sizes.split(",")]
+    ocr_sizes = [size.strip() for size in args.ocr_sizes.split(",")]
+    unknown = [suite for suite in suites if suite not in SUITES] + [size for size in sizes + ocr_sizes if size not in SIZES]
+    if unknown:
+        print(f"Unbekannt: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    backends = [name.strip() for name in args.backends.split(",")] if args.backends else None
+    report = run_benchmarks(suites, sizes, args.repeat, [int(dpi) for dpi in args.dpis.split(",")], backends,
+                            ocr_sizes, args.lang, args.poppler_path)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Ergebnisse geschrieben nach {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print("\n".join(compare(json.load(f), report)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from modules.tracing import trace_span
+
+TIFF_EXTENSIONS = (".tif", ".tiff")
+# Auflösung von Bildern ohne Angabe in der Datei (typisch für Scans)
+DEFAULT_DPI = 300
+
+# Großformatige Pläne überschreiten Pillows Schutzgrenze gegen Dekompressionsbomben
+# (etwa 179 Megapixel). Nur beim Öffnen von Dokumenten gilt stattdessen diese Grenze;
+# erst ab dem Doppelten lehnt Pillow ein Bild ab. Einstellbar über die Umgebungsvariable
+# MAX_PAGE_PIXELS (0 = Pillows Grenze auch für Dokumente).
+DEFAULT_MAX_PAGE_PIXELS = 1_000_000_000
+# Image.MAX_IMAGE_PIXELS ist global; der Lock hält gleichzeitige Änderungen auseinander
+_pixel_limit_lock = threading.Lock()
+
+
+def max_page_pixels():
+    try:
+        return int(os.environ.get("MAX_PAGE_PIXELS", DEFAULT_MAX_PAGE_PIXELS))
+    except ValueError:
+        return DEFAULT_MAX_PAGE_PIXELS
+
+
+@contextmanager
+def page_pixel_limit():
+    """
+    Hebt Pillows Grenze für die Dauer des Blocks auf max_page_pixels() an. Pillow prüft die
+    Bildgröße nur in Image.open, daher genügt es, das Öffnen einzuschließen.
+    """
+    with _pixel_limit_lock:
+        previous = Image.MAX_IMAGE_PIXELS
+        limit = max_page_pixels()
+        if previous is not None and limit > previous:
+            Image.MAX_IMAGE_PIXELS = limit
+        try:
+            yield
+        finally:
+            Image.MAX_IMAGE_PIXELS = previous
+
+
+def open_image(path):
+    """
+    Image.open mit der Grenze für Dokumentseiten (siehe page_pixel_limit).
+    """
+    with page_pixel_limit():
+        return Image.open(path)
+
+
+def preview_size(page_size, target):
+    """
+    Liefert (Größe, Maßstab) der Vorschau einer Seite, die in target passt (nie vergrößert).
+    """
+    scale = min(1.0, target[0] / page_size[0], target[1] / page_size[1])
+    return (max(1, round(page_size[0] * scale)), max(1, round(page_size[1] * scale))), scale
+
+
+def info_dpi(info):
+    """
+    Auflösung (x, y) aus dem info-Dictionary eines Bildes, sonst DEFAULT_DPI.
+    """
+    dpi = info.get("dpi")
+    try:
+        x, y = (float(value) for value in dpi)
+    except (TypeError, ValueError):
+        return (float(DEFAULT_DPI), float(DEFAULT_DPI))
+    if x <= 1 or y <= 1:
+        return (float(DEFAULT_DPI), float(DEFAULT_DPI))
+    return (x, y)
+
+
+def _resized_preview(page, target):
+    size, scale = preview_size(page.size, target)
+    if scale >= 1.0:
+        return page, 1.0
+    return page.resize(size, Image.BILINEAR, reducing_gap=2.0), scale
+
+
+class ImageDocument:
+    """
+    Einzelnes Bild mit derselben Seiten-Schnittstelle wie ein PDF-Dokument.
+
+    Beim Öffnen wird nur der Dateikopf gelesen; dekodiert wird erst mit get_page. Für die
+    Vorschau eines JPEGs dekodiert Pillow über draft() direkt in 1/2, 1/4 oder 1/8 der Größe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.page_count = 1
+        with open_image(path) as image:
+            self.size = image.size
+            self.dpi = info_dpi(image.info)
+        self._image = None
+
+    def get_page(self, index):
+        if index != 0:
+            raise IndexError(f"Seite {index + 1} existiert nicht")
+        if self._image is None:
+            with trace_span("load:image", file=os.path.basename(self.path), size=self.size) as span, \
+                    open_image(self.path) as image:
+                self._image = image.convert("RGB")
+                span.set(bytes=len(self._image.getbands()) * self._image.width * self._image.height)
+        return self._image
+
+    def get_preview(self, index, target):
+        """
+        Liefert (Vorschau, Maßstab) der Seite in höchstens target Pixeln.
+        """
+        if self._image is not None:
+            return _resized_preview(self.get_page(index), target)
+        size, scale = preview_size(self.size, target)
+        if scale >= 1.0:
+            return self.get_page(index), 1.0
+        with open_image(self.path) as image:
+            if image.format == "JPEG":
+                image.draft("RGB", size)
+            return image.convert("RGB").resize(size, Image.BILINEAR, reducing_gap=2.0), scale
+
+    def page_dpi(self, index):
+        return self.dpi
+
+    def prefetch(self, index):
+        pass
+
+    def close(self):
+        pass
+
+
+def map_strips(path, mode, size, tiles):
+    """
+    Blendet eine unkomprimierte Seite aus zusammenhängenden, volle Breite abdeckenden Streifen
+    als np.memmap (H, W) bzw. (H, W, 3) ein; tiles ist die Kachelliste von Pillow nach seek().
+    Für komprimierte Seiten, gekachelte Ablage und andere Modi als L/RGB: None.
+    """
+    channels = {"L": 1, "RGB": 3}.get(mode)
+    if channels is None or not tiles:
+        return None
+    width, height = size
+    row = 0
+    expected = tiles[0][2]
+    for codec, box, offset, args in tiles:
+        if (codec != "raw" or tuple(args) != (mode, 0, 1) or box != (0, row, width, box[3])
+                or offset != expected):
+            return None
+        expected += (box[3] - box[1]) * width * channels
+        row = box[3]
+    if row != height or os.path.getsize(path) < expected:
+        return None
+    import numpy as np
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=tiles[0][2], shape=shape)
+
+
+class TiffDocument:
+    """
+    Mehrseitiges TIFF, dessen Seiten erst bei Bedarf einzeln dekodiert werden.
+
+    Beim Öffnen liest Pillow nur die Kette der Seitenverzeichnisse, keine Bilddaten. Seiten
+    aus unkomprimierten Streifen werden nicht dekodiert, sondern per np.memmap eingeblendet:
+    Graustufenseiten teilen sich den Speicher mit der Datei, und das Betriebssystem liest nur
+    die Bereiche, die tatsächlich berührt werden. Alle anderen Seiten (komprimiert, gekachelt,
+    1 Bit) dekodiert Pillow; die zuletzt benutzten liegen in einem kleinen LRU-Cache.
+    Graustufen- und Schwarzweißseiten werden als "L" geliefert, alle anderen als "RGB".
+    """
+
+    def __init__(self, path, cache_size=3):
+        self.path = path
+        self.cache_size = cache_size
+        self._file = open_image(path)
+        self.page_count = getattr(self._file, "n_frames", 1)
+        self._pages = OrderedDict()
+        self._arrays = {}
+        # seek() verstellt den gemeinsamen Dateizeiger
+        self._lock = threading.Lock()
+
+    def _frame_info(self, index):
+        if not 0 <= index < self.page_count:
+            raise IndexError(f"Seite {index + 1} existiert nicht")
+        with self._lock:
+            self._file.seek(index)
+            return self._file.mode, self._file.size, list(self._file.tile)
+
+    def page_size(self, index):
+        return self._frame_info(index)[1]
+
+    def page_dpi(self, index):
+        """
+        Auflösung (x, y) der Seite laut Seitenverzeichnis, sonst DEFAULT_DPI.
+        """
+        if not 0 <= index < self.page_count:
+            raise IndexError(f"Seite {index + 1} existiert nicht")
+        with self._lock:
+            self._file.seek(index)
+            return info_dpi(self._file.info)
+
+    def page_array(self, index):
+        """
+        np.memmap der Seite, falls sie unkomprimiert in Streifen vorliegt, sonst None.
+        """
+        if index not in self._arrays:
+            mode, size, tiles = self._frame_info(index)
+            self._arrays[index] = map_strips(self.path, mode, size, tiles)
+        return self._arrays[index]
+
+    def _decode(self, index):
+        with trace_span("load:tiff", file=os.path.basename(self.path), page=index + 1) as span:
+            image = self._decode_page(index)
+            span.set(size=image.size, bytes=len(image.getbands()) * image.width * image.height)
+        return image
+
+    def _decode_page(self, index):
+        array = self.page_array(index)
+        if array is not None:
+            height, width = array.shape[:2]
+            if array.ndim == 2:
+                # Ohne Kopie: das Bild liest direkt aus der eingeblendeten Datei
+                return Image.frombuffer("L", (width, height), array, "raw", "L", 0, 1)
+            return Image.fromarray(array)
+        with self._lock:
+            self._file.seek(index)
+            return self._file.convert("L" if self._file.mode in ("1", "L") else "RGB")
+
+    def get_page(self, index):
+        with self._lock:
+            if index in self._pages:
+                self._pages.move_to_end(index)
+                return self._pages[index]
+        image = self._decode(index)
+        with self._lock:
+            self._pages[index] = image
+            while len(self._pages) > self.cache_size:
+                self._pages.popitem(last=False)
+        return image
+
+    def get_preview(self, index, target):
+        """
+        Liefert (Vorschau, Maßstab). Eingeblendete Seiten werden dafür nur zeilen- und
+        spaltenweise ausgedünnt gelesen, sodass nur ein Bruchteil der Datei berührt wird.
+        """
+        with self._lock:
+            cached = self._pages.get(index)
+        array = self.page_array(index)
+        if cached is not None or array is None:
+            return _resized_preview(cached if cached is not None else self.get_page(index), target)
+        size, scale = preview_size((array.shape[1], array.shape[0]), target)
+        if scale >= 1.0:
+            return self.get_page(index), 1.0
+        # Doppelt so fein wie die Vorschau ausdünnen, den Rest glättet das Verkleinern
+        step = max(1, int(1 / scale) // 2)
+        sample = Image.fromarray(array[::step, ::step].copy())
+        return sample.resize(size, Image.BILINEAR, reducing_gap=2.0), scale
+
+    def prefetch(self, index):
+        # Dekodiert wird nur, was angezeigt oder erkannt wird
+        pass
+
+    def close(self):
+        with self._lock:
+            self._pages.clear()
+            self._arrays.clear()
+            self._file.close()
+
+
+class PdfDocument:
+    """
+    PDF-Dokument, dessen Seiten erst bei Bedarf einzeln gerastert werden.
+
+    Die Seitenzahl wird einmal über pdfinfo ermittelt. Gerasterte Seiten liegen in einem
+    kleinen LRU-Cache; Nachbarseiten können im Hintergrund vorab gerastert werden.
+    """
+
+    def __init__(self, path, dpi=200, poppler_path=None, cache_size=5):
+        self.path = path
+        self.dpi = dpi
+        self.poppler_path = poppler_path or None
+        self.cache_size = cache_size
+        from pdf2image import pdfinfo_from_path
+        info = pdfinfo_from_path(path, poppler_path=self.poppler_path)
+        self.page_count = int(info["Pages"])
+        self._pages = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PdfPrefetch")
+
+    def _render(self, index):
+        from pdf2image import convert_from_path
+        with trace_span("load:pdf", file=os.path.basename(self.path), page=index + 1, dpi=self.dpi) as span:
+            pages = convert_from_path(
+                self.path, dpi=self.dpi, first_page=index + 1, last_page=index + 1,
+                poppler_path=self.poppler_path
+            )
+            image = pages[0].convert("RGB")
+            span.set(size=image.size, bytes=3 * image.width * image.height)
+        return image
+
+    def _store(self, index, image):
+        with self._lock:
+            self._pending.pop(index, None)
+            self._pages[index] = image
+            self._pages.move_to_end(index)
+            while len(self._pages) > self.cache_size:
+                self._pages.popitem(last=False)
+
+    def _prefetch_page(self, index):
+        try:
+            self._store(index, self._render(index))
+        except Exception:
+            with self._lock:
+                self._pending.pop(index, None)
+            raise
+
+    def get_page(self, index):
+        """
+        Liefert Seite index (0-basiert) als RGB-Bild. Eine gerade im Hintergrund
+        gerasterte Seite wird abgewartet statt doppelt gerastert.
+        """
+        if not 0 <= index < self.page_count:
+            raise IndexError(f"Seite {index + 1} existiert nicht")
+        with self._lock:
+            if index in self._pages:
+                self._pages.move_to_end(index)
+                return self._pages[index]
+            future = self._pending.get(index)
+        if future is not None:
+            try:
+                future.result()
+                with self._lock:
+                    if index in self._pages:
+                        return self._pages[index]
+            except Exception:
+                pass
+        image = self._render(index)
+        self._store(index, image)
+        return image
+
+    def get_preview(self, index, target):
+        return _resized_preview(self.get_page(index), target)
+
+    def page_dpi(self, index):
+        return (float(self.dpi), float(self.dpi))
+
+    def prefetch(self, index):
+        """
+        Rastert die Nachbarseiten von index im Hintergrund vor.
+        """
+        for neighbour in (index + 1, index - 1):
+            if 0 <= neighbour < self.page_count:
+                with self._lock:
+                    if neighbour in self._pages or neighbour in self._pending:
+                        continue
+                    self._pending[neighbour] = self._executor.submit(self._prefetch_page, neighbour)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def open_document(path, poppler_path=None, dpi=200):
+    """
+    Öffnet eine Bild-, TIFF- oder PDF-Datei als Dokument mit page_count, get_page(),
+    get_preview(), page_dpi() und prefetch().
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with trace_span("load:open", file=os.path.basename(path)):
+        if ext == ".pdf":
+            return PdfDocument(path, dpi=dpi, poppler_path=poppler_path)
+        if ext in TIFF_EXTENSIONS:
+            return TiffDocument(path)
+        return ImageDocument(path)
@@ -1,34 +1,74 @@
 import os
 from tkinter import filedialog, messagebox
-from PIL import Image
-from pdf2image import convert_from_path
+from modules.documents import open_document
 from modules.poppler_manager import get_poppler_path
+from modules.tracing import trace_span
 
 def load_image_file(app_instance):
     file_path = filedialog.askopenfilename(
-        filetypes=[("Bilder/PDFs", "*.png;*.jpg;*.jpeg;*.pdf"), ("Alle Dateien", "*.*")]
+        filetypes=[("Bilder/PDFs", "*.png;*.jpg;*.jpeg;*.tif;*.tiff;*.pdf"), ("Alle Dateien", "*.*")]
     )
     if file_path:
         try:
+            current_poppler_path = None
             if file_path.lower().endswith(".pdf"):
                 current_poppler_path = get_poppler_path(app_instance.poppler_path)
                 if not current_poppler_path:
                     messagebox.showerror("Fehler", "Poppler Pfad ist nicht gesetzt. Bitte setze den Pfad unter 'Einstellungen'.")
                     return
-                pages = convert_from_path(file_path, dpi=200, poppler_path=current_poppler_path)
-                app_instance.original_image = pages[0]
-            else:
-                app_instance.original_image = Image.open(file_path).convert("RGB")
+            document = open_document(file_path, poppler_path=current_poppler_path)
+            if app_instance.document:
+                app_instance.document.close()
+            app_instance.document = document
             app_instance.filename = os.path.basename(file_path)
             app_instance.filename_label.config(text=app_instance.filename)
-            from modules.image_ops import show_image_op, update_image_op
-            if app_instance.left_canvas:
-                show_image_op(app_instance.original_image, app_instance.left_canvas)
-            update_image_op(app_instance)
+            show_page(app_instance, 0)
         except Exception as e:
             messagebox.showerror("Fehler", f"Konnte Bild laden: {str(e)}")
 
+def show_page(app_instance, index):
+    """
+    Zeigt Seite index des geladenen Dokuments an; nur diese Seite wird gerastert bzw. dekodiert.
+    Die Vorschau kommt aus dem Dokument (z. B. verkleinert dekodiertes JPEG) und erscheint
+    links, bevor die Seite in voller Auflösung geladen ist.
+    """
+    document = app_instance.document
+    if document is None or not 0 <= index < document.page_count:
+        return
+    from modules.image_ops import canvas_size, show_image_op, update_image_op
+    from modules.ocr_overlay import clear_ocr_overlay_op
+    target = canvas_size(app_instance.right_canvas)
+    try:
+        with trace_span("load:preview", file=app_instance.filename, page=index + 1):
+            preview, scale = document.get_preview(index, target)
+        if app_instance.left_canvas:
+            page_size = (round(preview.width / scale), round(preview.height / scale))
+            show_image_op(preview, app_instance.left_canvas, page_size)
+            app_instance.root.update_idletasks()
+        app_instance.original_image = document.get_page(index)
+        if app_instance.left_canvas:
+            # Zum Hineinzoomen links die volle Auflösung; die Vorschau bleibt die grobe Stufe
+            show_image_op(app_instance.original_image, app_instance.left_canvas, coarse=preview)
+    except Exception as e:
+        messagebox.showerror("Fehler", f"Konnte Seite {index + 1} nicht laden: {str(e)}")
+        return
+    app_instance.preview_source = (app_instance.original_image, target, preview, scale)
+    app_instance.page_index = index
+    # Die Boxen der letzten OCR gehören zur vorherigen Seite
+    clear_ocr_overlay_op(app_instance)
+    app_instance.page_label.config(text=f"Seite {index + 1}/{document.page_count}")
+    update_image_op(app_instance)
+    document.prefetch(index)
+
+def next_page(app_instance):
+    show_page(app_instance, app_instance.page_index + 1)
+
+def previous_page(app_instance):
+    show_page(app_instance, app_instance.page_index - 1)
+
 def save_image_file(app_instance):
+    from modules.image_ops import ensure_full_render_op
+    ensure_full_render_op(app_instance)
     if app_instance.processed_image:
         filter_info = []
         for i, (enabled_var, filter_var, strength_var) in enumerate(app_instance.layer_vars):
@@ -37,6 +77,8 @@ def save_image_file(app_instance):
         default_name = ""
         if app_instance.filename:
             base = os.path.splitext(app_instance.filename)[0]
+            if app_instance.document and app_instance.document.page_count > 1:
+                base = f"{base}_S{app_instance.page_index + 1}"
             default_name = f"{base}_" + "_".join(filter_info) if filter_info else base
         file_path = filedialog.asksaveasfilename(
             defaultextension=".png",
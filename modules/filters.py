@@ -1,92 +1,700 @@
-from PIL import Image, ImageOps, ImageChops, ImageEnhance, ImageFilter
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def apply_filter(img, filter_name, strength=1.0):
-    try:
-        if filter_name == "Negativ":
-            blend_factor = min(max(strength, 0), 1)
-            inverted = ImageOps.invert(img)
-            return Image.blend(img, inverted, blend_factor)
-        elif filter_name == "Multiplikation":
-            blend_factor = min(max(strength, 0), 1)
-            overlay_value = int(255 * blend_factor)
-            overlay = Image.new("RGB", img.size, (overlay_value, overlay_value, overlay_value))
-            return ImageChops.multiply(img, overlay)
-        elif filter_name == "Helligkeit":
-            enhancer = ImageEnhance.Brightness(img)
-            effect = enhancer.enhance(1.0 + strength)
-            return Image.blend(img, effect, strength)
-        elif filter_name == "Kontrast":
-            enhancer = ImageEnhance.Contrast(img)
-            effect = enhancer.enhance(1.0 + strength)
-            return Image.blend(img, effect, strength)
-        elif filter_name == "Schärfen":
-            enhancer = ImageEnhance.Sharpness(img)
-            effect = enhancer.enhance(1.0 + strength)
-            return Image.blend(img, effect, strength)
-        elif filter_name == "Weichzeichnen":
-            effect = img.filter(ImageFilter.GaussianBlur(radius=strength * 5))
-            return Image.blend(img, effect, strength)
-        elif filter_name == "Graustufen":
-            blend_factor = min(max(strength, 0), 1)
-            gray = img.convert("L").convert("RGB")
-            return Image.blend(img, gray, blend_factor)
-        elif filter_name == "Sepia":
-            blend_factor = min(max(strength, 0), 1)
-            gray = img.convert("L")
-            sepia = ImageOps.colorize(gray, "#704214", "#C0A080")
-            return Image.blend(img, sepia, blend_factor)
-        elif filter_name == "Posterize":
-            bits = max(1, min(8, int(round((1 - strength) * 7) + 1)))
-            return ImageOps.posterize(img, bits)
-        elif filter_name == "Solarize":
-            threshold = int((1 - strength) * 255)
-            return ImageOps.solarize(img, threshold=threshold)
-        elif filter_name == "Kantenerkennung":
-            blend_factor = min(max(strength, 0), 1)
-            effect = img.filter(ImageFilter.FIND_EDGES)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Emboss":
-            blend_factor = min(max(strength, 0), 1)
-            effect = img.filter(ImageFilter.EMBOSS)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Edge Enhance":
-            blend_factor = min(max(strength, 0), 1)
-            effect = img.filter(ImageFilter.EDGE_ENHANCE)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Detail":
-            blend_factor = min(max(strength, 0), 1)
-            effect = img.filter(ImageFilter.DETAIL)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Smooth":
-            blend_factor = min(max(strength, 0), 1)
-            effect = img.filter(ImageFilter.SMOOTH)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Binarize":
-            blend_factor = min(max(strength, 0), 1)
-            gray = img.convert("L")
-            effect = gray.point(lambda x: 255 if x > 128 else 0).convert("RGB")
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Gamma Correction":
-            gamma = 1.0 + strength
-            inv_gamma = 1.0 / gamma
-            table = [int((i / 255.0) ** inv_gamma * 255) for i in range(256)]
-            effect = img.point(table * 3)
-            blend_factor = min(max(strength, 0), 1)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Adaptive Threshold":
-            blend_factor = min(max(strength, 0), 1)
-            effect = ImageOps.autocontrast(img)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Color Boost":
-            enhancer = ImageEnhance.Color(img)
-            effect = enhancer.enhance(1.0 + strength)
-            blend_factor = min(max(strength, 0), 1)
-            return Image.blend(img, effect, blend_factor)
-        elif filter_name == "Custom":
-            return img.copy()
+import numpy as np
+from PIL import Image, ImageOps, ImageFilter
+
+# Registry der Filterkerne: Name -> Funktion(arr, strength) -> arr
+# Alle Kerne arbeiten auf einem HxWx3-uint8-Puffer und schreiben ihr Ergebnis nach
+# Möglichkeit direkt in diesen Puffer zurück. Die Rechenvorschriften entsprechen
+# Pixel für Pixel den bisherigen PIL-Aufrufen (Image.blend, ImageEnhance, ImageOps).
+FILTER_KERNELS = {}
+
+# Filter, deren Wirkung von der Auflösung abhängt (z. B. ein Radius in Pixeln). Sie
+# bekommen den Maßstab einer verkleinerten Vorschau übergeben, damit diese dem Original entspricht.
+SCALABLE_FILTERS = set()
+
+# Reine Punktoperationen, deren Wirkung (inkl. Blending) nur von strength abhängt:
+# Name -> Funktion(strength) -> LUT mit 256 Einträgen
+POINT_LUTS = {}
+
+# Reichweite der Filter für die gekachelte Verarbeitung: Name -> Funktion(strength, scale)
+# -> Randbreite in Pixeln, die eine Kachel vom Nachbarn braucht, damit ihr Inneres
+# genauso aussieht wie im ganzen Bild. Filter ohne Eintrag brauchen das ganze Bild
+# (Statistik oder Geometrie) und werden von modules.tiled gesondert behandelt.
+FILTER_HALOS = {}
+
+# Filter, die Pixel verschieben (Drehung): Koordinaten im Ergebnis, etwa die Wortboxen
+# der OCR, passen danach nicht mehr zum Originalbild.
+GEOMETRY_FILTERS = {"Deskew"}
+
+_RAMP = np.arange(256, dtype=np.uint8)
+
+
+def register_filter(name, scalable=False, halo=None):
+    """
+    Registriert einen Filterkern unter dem angegebenen Namen. Kerne mit scalable=True
+    erhalten zusätzlich das Argument scale. halo ist die Reichweite des Filters in Pixeln
+    (Zahl oder Funktion(strength, scale)); None heißt, der Filter braucht das ganze Bild.
+    """
+    def decorator(func):
+        FILTER_KERNELS[name] = func
+        if scalable:
+            SCALABLE_FILTERS.add(name)
+        if halo is not None:
+            FILTER_HALOS[name] = halo if callable(halo) else (lambda strength, scale: halo)
+        return func
+    return decorator
+
+
+def register_point_filter(name, lut_func):
+    """
+    Registriert eine Punktoperation über ihre LUT-Funktion. Der zugehörige Filterkern
+    wendet die LUT direkt an, der Pipeline-Compiler kann sie mit Nachbarn verschmelzen.
+    """
+    POINT_LUTS[name] = lut_func
+
+    @register_filter(name, halo=0)
+    def _kernel(arr, strength):
+        return apply_lut(arr, lut_func(strength))
+    return _kernel
+
+
+def _clamp(strength):
+    return min(max(strength, 0), 1)
+
+
+# Zeilenblöcke dieser Größe passen mitsamt float32-Zwischenpuffer in den Cache
+_BLEND_CHUNK_BYTES = 1 << 19
+
+
+def _blend_into(arr, effect, alpha):
+    """
+    Entspricht Image.blend(arr, effect, alpha) und schreibt das Ergebnis direkt in arr.
+    Gerechnet wird wie in PIL in float32, danach abgeschnitten (nicht gerundet); für
+    alpha außerhalb von [0, 1] wird auf 0..255 begrenzt.
+    """
+    if alpha == 0:
+        return arr
+    if alpha == 1:
+        # x + 1 * (e - x) ist in float32 exakt e
+        arr[...] = effect
+        return arr
+    alpha = np.float32(alpha)
+    extrapolate = alpha < 0 or alpha > 1
+    row_bytes = max(1, arr[:1].size * 4)
+    rows = max(1, _BLEND_CHUNK_BYTES // row_bytes)
+    buf = np.empty((min(rows, len(arr)),) + arr.shape[1:], dtype=np.float32)
+    for y in range(0, len(arr), rows):
+        target = arr[y:y + rows]
+        tmp = buf[:len(target)]
+        np.subtract(effect[y:y + rows], target, out=tmp, dtype=np.float32)
+        tmp *= alpha
+        tmp += target
+        if extrapolate:
+            np.clip(tmp, 0, 255, out=tmp)
+        target[...] = tmp
+    return arr
+
+
+def _blend(base, effect, alpha):
+    """
+    Wie _blend_into, liefert aber ein neues Array und lässt base unverändert.
+    """
+    return _blend_into(np.array(base, dtype=np.uint8), np.asarray(effect), alpha)
+
+
+def apply_lut(arr, lut):
+    """
+    Wendet eine Lookup-Tabelle an, entweder eine gemeinsame (256,) oder eine pro Kanal (3, 256).
+    Eine gemeinsame Tabelle wird auf Bytepaare erweitert, sodass np.take nur halb so viele
+    Elemente nachschlagen muss.
+    """
+    if lut.ndim == 1 and arr.flags.c_contiguous and arr.size % 2 == 0:
+        pairs = arr.reshape(-1).view(np.uint16)
+        lut16 = lut.astype(np.uint16)
+        table = (lut16[:, None] << 8 | lut16[None, :]).reshape(-1)
+        np.take(table, pairs, out=pairs, mode="wrap")
+    elif lut.ndim == 1:
+        np.take(lut, arr, out=arr)
+    else:
+        arr[...] = np.asarray(Image.fromarray(arr).point(lut.reshape(-1).tolist()))
+    return arr
+
+
+def _gray_image(arr):
+    return Image.fromarray(arr).convert("L")
+
+
+def _effect_rgb(gray_img):
+    return np.asarray(gray_img.convert("RGB"))
+
+
+# --- Punktoperationen: das Ergebnis eines Pixels hängt nur von seinem eigenen Wert ab ---
+
+def negativ_lut(strength):
+    return _blend(_RAMP, 255 - _RAMP, _clamp(strength))
+
+
+def multiplikation_lut(strength):
+    overlay_value = int(255 * _clamp(strength))
+    return (_RAMP.astype(np.uint16) * overlay_value // 255).astype(np.uint8)
+
+
+def helligkeit_lut(strength):
+    effect = _blend(np.zeros(256, dtype=np.uint8), _RAMP, 1.0 + strength)
+    return _blend(_RAMP, effect, strength)
+
+
+def kontrast_lut(strength, mean):
+    degenerate = np.full(256, mean, dtype=np.uint8)
+    effect = _blend(degenerate, _RAMP, 1.0 + strength)
+    return _blend(_RAMP, effect, strength)
+
+
+def posterize_lut(strength):
+    bits = max(1, min(8, int(round((1 - strength) * 7) + 1)))
+    mask = ~(2 ** (8 - bits) - 1) & 0xFF
+    return _RAMP & mask
+
+
+def solarize_lut(strength):
+    threshold = int((1 - strength) * 255)
+    return np.where(_RAMP < threshold, _RAMP, 255 - _RAMP).astype(np.uint8)
+
+
+def gamma_lut(strength):
+    gamma = 1.0 + strength
+    inv_gamma = 1.0 / gamma
+    table = np.array([int((i / 255.0) ** inv_gamma * 255) for i in range(256)], dtype=np.uint8)
+    return _blend(_RAMP, table, _clamp(strength))
+
+
+def autocontrast_lut(strength, histograms):
+    """
+    Pro-Kanal-LUT wie ImageOps.autocontrast(img), anschließend mit strength geblendet.
+    """
+    luts = []
+    for h in histograms:
+        nonzero = np.flatnonzero(h)
+        lo, hi = (nonzero[0], nonzero[-1]) if len(nonzero) else (0, 0)
+        if hi <= lo:
+            table = _RAMP.copy()
         else:
-            return img.copy()
+            scale = 255.0 / (hi - lo)
+            offset = -lo * scale
+            table = np.array([min(max(int(ix * scale + offset), 0), 255) for ix in range(256)], dtype=np.uint8)
+        luts.append(_blend(_RAMP, table, _clamp(strength)))
+    return np.stack(luts)
+
+
+def luminance_histogram(arr, lut=None):
+    """
+    Histogramm von img.convert("L"). Mit lut wird das Histogramm des Bildes nach Anwendung
+    der LUT bestimmt, ohne dieses Zwischenbild in NumPy anzulegen.
+    """
+    img = Image.fromarray(arr)
+    if lut is not None:
+        img = img.point(np.broadcast_to(lut, (3, 256)).reshape(-1).tolist())
+    return np.array(img.convert("L").histogram(), dtype=np.int64)
+
+
+def histogram_mean(histogram):
+    # Gerundet wie ImageEnhance.Contrast
+    return int((histogram * np.arange(256)).sum() / histogram.sum() + 0.5)
+
+
+def luminance_mean(arr, lut=None):
+    """
+    Mittelwert wie ImageStat.Stat(img.convert("L")).mean[0], gerundet wie ImageEnhance.Contrast.
+    """
+    return histogram_mean(luminance_histogram(arr, lut))
+
+
+def channel_histograms(arr):
+    histogram = np.array(Image.fromarray(arr).histogram())
+    return histogram.reshape(-1, 256)
+
+
+register_point_filter("Negativ", negativ_lut)
+register_point_filter("Multiplikation", multiplikation_lut)
+register_point_filter("Helligkeit", helligkeit_lut)
+register_point_filter("Posterize", posterize_lut)
+register_point_filter("Solarize", solarize_lut)
+register_point_filter("Gamma Correction", gamma_lut)
+
+
+# Punktoperationen mit Bildstatistik: die LUT hängt zusätzlich vom Eingangsbild ab
+
+@register_filter("Kontrast")
+def _kontrast(arr, strength):
+    return apply_lut(arr, kontrast_lut(strength, luminance_mean(arr)))
+
+
+@register_filter("Adaptive Threshold")
+def _adaptive_threshold(arr, strength):
+    return apply_lut(arr, autocontrast_lut(strength, channel_histograms(arr)))
+
+
+# --- Operationen auf Basis der Graustufen ---
+# Der Effekt wird als L-Bild in PIL erzeugt und erst dann auf RGB erweitert: ein Blending
+# gegen ein (H, W, 1)-Array wäre in NumPy wegen der kurzen inneren Schleife sehr langsam.
+
+@register_filter("Graustufen", halo=0)
+def _graustufen(arr, strength):
+    return _blend_into(arr, _effect_rgb(_gray_image(arr)), _clamp(strength))
+
+
+@register_filter("Sepia", halo=0)
+def _sepia(arr, strength):
+    sepia = ImageOps.colorize(_gray_image(arr), "#704214", "#C0A080")
+    return _blend_into(arr, np.asarray(sepia), _clamp(strength))
+
+
+_BINARIZE_TABLE = np.where(_RAMP > 128, 255, 0).astype(np.uint8).tolist()
+
+
+@register_filter("Binarize", halo=0)
+def _binarize(arr, strength):
+    effect = _gray_image(arr).point(_BINARIZE_TABLE)
+    return _blend_into(arr, _effect_rgb(effect), _clamp(strength))
+
+
+@register_filter("Color Boost", halo=0)
+def _color_boost(arr, strength):
+    effect = _blend(_effect_rgb(_gray_image(arr)), arr, 1.0 + strength)
+    return _blend_into(arr, effect, _clamp(strength))
+
+
+# --- Binarisierung und Lagekorrektur für die OCR ---
+# Lokale Schwellen nach Sauvola und Niblack über Integralbilder: Mittelwert und Streuung
+# jedes Fensters ergeben sich aus vier Zugriffen, unabhängig von der Fenstergröße.
+
+# Fensterkantenlänge in Pixeln bei voller Auflösung (etwa zwei Textzeilen bei 200 dpi)
+THRESHOLD_WINDOW = 31
+# Dynamikbereich der Standardabweichung bei Sauvola
+SAUVOLA_R = 128.0
+# Fenster mit geringerer Streuung (in Grauwerten) gelten als Hintergrund und bleiben weiß
+THRESHOLD_MIN_STD = 8.0
+# Kleinste Streifenhöhe, wenn die lokalen Schwellen auf mehrere Threads verteilt werden
+THRESHOLD_STRIPE = 256
+
+_stripe_pool = None
+_stripe_pool_lock = threading.Lock()
+
+
+def _gray_array(arr):
+    return np.asarray(_gray_image(arr))
+
+
+def _running_sum(values, window, out=None):
+    """
+    Fenstersummen entlang Achse 0 (am Rand auf das Bild beschnitten) als laufende Summe:
+    pro Zeile eine Addition und eine Subtraktion über einen zusammenhängenden Vektor.
+    out darf ein vorhandener Puffer derselben Form sein, aber nicht values selbst.
+    """
+    count = values.shape[0]
+    half = window // 2
+    if out is None:
+        out = np.empty_like(values)
+    acc = values[:min(half + 1, count)].sum(axis=0)
+    out[0] = acc
+    for i in range(1, count):
+        if i + half < count:
+            acc += values[i + half]
+        if i > half:
+            acc -= values[i - half - 1]
+        out[i] = acc
+    return out
+
+
+def _edge_factors(length, window):
+    """
+    Korrekturen für die Fensterfläche entlang einer Achse als (Slice, Faktoren): window durch
+    die beschnittene Fensterlänge, nur für die Positionen am Rand, an denen sie kürzer ist.
+    """
+    half = window // 2
+    index = np.arange(length)
+    factors = (window / (np.minimum(index + half + 1, length) - np.maximum(index - half, 0))).astype(np.float32)
+    if length <= 2 * half:
+        return [(slice(None), factors)]
+    return [(slice(0, half), factors[:half]), (slice(length - half, length), factors[length - half:])]
+
+
+def _window_stats(gray, window):
+    """
+    Mittelwert und Standardabweichung im window x window-Fenster um jedes Pixel
+    (am Rand auf das Bild beschnitten). Das ist die Integralbild-Methode, aufgeteilt in
+    zwei eindimensionale Durchläufe; g und g² laufen gemeinsam. Gerechnet wird mit g - 128:
+    so bleiben bis zu einem 31er-Fenster alle Teilsummen ganze Zahlen unter 2**24 und sind
+    in float32 exakt, unabhängig davon, wo die laufende Summe beginnt (wichtig für Kacheln).
+    Der zweite Durchlauf arbeitet auf dem transponierten Puffer; die Ergebnisse sind
+    transponierte Sichten auf diesen Puffer. Die Division durch die Fensterfläche ist ein
+    Faktor für alle Pixel; nur die Ränder werden danach auf ihr kleineres Fenster korrigiert.
+    """
+    height, width = gray.shape
+    values = np.empty((height, 2, width), dtype=np.float32)
+    np.subtract(gray, np.float32(128), out=values[:, 0])
+    np.multiply(values[:, 0], values[:, 0], out=values[:, 1])
+    # Nur zwei Puffer im Wechsel: jeder frisch angelegte kostet auf großen Seiten spürbar
+    sums = _running_sum(values, window)
+    columns = values.reshape(width, 2, height)
+    np.copyto(columns, sums.transpose(2, 1, 0))
+    sums = _running_sum(columns, window, out=sums.reshape(width, 2, height))
+    sums *= np.float32(1.0 / (window * window))
+    for edge, factors in _edge_factors(width, window):
+        sums[edge] *= factors[:, None, None]
+    for edge, factors in _edge_factors(height, window):
+        sums[:, :, edge] *= factors
+    mean, variance = sums[:, 0], sums[:, 1]
+    square = columns[:, 0]
+    np.multiply(mean, mean, out=square)
+    variance -= square
+    np.maximum(variance, 0, out=variance)
+    mean += 128
+    return mean.T, np.sqrt(variance, out=variance).T
+
+
+def _threshold_window(scale):
+    return max(3, int(THRESHOLD_WINDOW * scale) | 1)
+
+
+def tile_workers():
+    """
+    Anzahl der Threads für Kacheln (modules.tiled) und Streifen der lokalen Schwellen;
+    TILE_WORKERS=1 schaltet beides ab (z. B. in den Prozessen der Stapelverarbeitung).
+    """
+    return int(os.environ.get("TILE_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+
+
+def _stripe_executor():
+    # Gemeinsamer Pool: auch Kacheln, die selbst schon parallel laufen, belegen nicht mehr Threads
+    global _stripe_pool
+    with _stripe_pool_lock:
+        if _stripe_pool is None:
+            _stripe_pool = ThreadPoolExecutor(max_workers=tile_workers(), thread_name_prefix="threshold")
+        return _stripe_pool
+
+
+def _local_binarize(arr, scale, threshold):
+    """
+    Binarisiert mit einer lokalen Schwelle: threshold(mean, std) rechnet aus den
+    Fensterstatistiken die Schwelle (und darf dafür die Puffer überschreiben). Pixel auf
+    oder über der Schwelle werden weiß, ebenso alle Pixel in Fenstern mit weniger als
+    THRESHOLD_MIN_STD Streuung: leeres Papier und einfarbige Flächen kippen sonst
+    wegen der Schwelle am Mittelwert in Rauschen oder ganz nach Schwarz.
+
+    Bei mehreren Kernen wird das Bild in einen Streifen je Thread (mindestens
+    THRESHOLD_STRIPE Zeilen) mit einem halben Fenster Rand zerlegt. Die Fenstersummen sind
+    exakt, das Ergebnis ist daher dasselbe wie in einem Stück.
+    """
+    gray = _gray_array(arr)
+    window = _threshold_window(scale)
+    half = window // 2
+    height = gray.shape[0]
+    workers = tile_workers()
+    rows = max(THRESHOLD_STRIPE, -(-height // workers))
+
+    def stripe(top):
+        bottom = min(height, top + rows)
+        outer_top = max(0, top - half)
+        part = gray[outer_top:min(height, bottom + half)]
+        mean, std = _window_stats(part, window)
+        flat = std < THRESHOLD_MIN_STD
+        # Vergleich im Speicherlayout der Schwelle (transponiert, siehe _window_stats)
+        white = np.greater_equal(part.T, threshold(mean, std).T)
+        white |= flat.T
+        inner = slice(top - outer_top, bottom - outer_top)
+        # Ergebnis direkt in den Eingangspuffer; gelesen wird nur noch gray
+        np.multiply(white[:, inner].T[:, :, None], np.uint8(255), out=arr[top:bottom])
+
+    tops = range(0, height, rows)
+    if len(tops) > 1:
+        for future in [_stripe_executor().submit(stripe, top) for top in tops]:
+            future.result()
+    else:
+        for top in tops:
+            stripe(top)
+    return arr
+
+
+def _threshold_halo(strength, scale):
+    return _threshold_window(scale) // 2
+
+
+@register_filter("Sauvola", scalable=True, halo=_threshold_halo)
+def _sauvola(arr, strength, scale=1.0):
+    # strength ist der Parameter k (0..0.5): je größer, desto weniger Hintergrund wird schwarz
+    k = 0.5 * _clamp(strength)
+
+    def threshold(mean, std):
+        # mean * (1 + k * (std / R - 1)), in Zwischenschritten ohne weitere Puffer
+        std *= k / SAUVOLA_R
+        std += 1.0 - k
+        std *= mean
+        return std
+    return _local_binarize(arr, scale, threshold)
+
+
+@register_filter("Niblack", scalable=True, halo=_threshold_halo)
+def _niblack(arr, strength, scale=1.0):
+    # strength ist -k (0..0.5): die Schwelle liegt so viele Standardabweichungen unter dem Mittel
+    k = 0.5 * _clamp(strength)
+
+    def threshold(mean, std):
+        std *= -k
+        std += mean
+        return std
+    return _local_binarize(arr, scale, threshold)
+
+
+def otsu_threshold(histogram):
+    """
+    Schwelle nach Otsu: maximiert die Varianz zwischen den Klassen für ein 256er-Histogramm.
+    """
+    counts = np.asarray(histogram, dtype=np.float64)
+    weight = np.cumsum(counts)
+    total = weight[-1]
+    # Leere oder einfarbige Bilder haben keine zwei Klassen (z. B. eine leere Seite)
+    if np.count_nonzero(counts) < 2:
+        return 127
+    first_moment = np.cumsum(counts * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (first_moment[-1] * weight / total - first_moment) ** 2 / (weight * (total - weight))
+    return int(np.nanargmax(between[:-1]))
+
+
+def binarize_at(arr, threshold, strength, gray=None):
+    """
+    Binarisiert mit fester Schwelle und blendet wie "Binarize"; gray ist das L-Bild, falls schon vorhanden.
+    """
+    gray = gray or _gray_image(arr)
+    table = np.where(_RAMP > threshold, 255, 0).astype(np.uint8).tolist()
+    return _blend_into(arr, _effect_rgb(gray.point(table)), _clamp(strength))
+
+
+@register_filter("Otsu")
+def _otsu(arr, strength):
+    gray = _gray_image(arr)
+    return binarize_at(arr, otsu_threshold(gray.histogram()), strength, gray)
+
+
+# Die Schräglage wird auf einer Verkleinerung dieser Breite gesucht
+DESKEW_WIDTH = 1000
+# Anzahl senkrechter Streifen für die Projektionsprofile
+DESKEW_STRIPS = 40
+# Größter korrigierter Winkel in Grad bei strength 1
+DESKEW_MAX_ANGLE = 10.0
+# Zeilen je Durchgang der NEAREST-Drehung (begrenzt die Koordinatenpuffer)
+ROTATE_BAND = 128
+
+
+def _profile_scores(strip_profiles, centers, angles):
+    """
+    Projektionsprofil je Winkel: die Zeilenprofile der Streifen werden um die Höhe
+    verschoben, um die eine Zeile unter diesem Winkel über die Streifenmitte ansteigt,
+    und aufsummiert. Scharf begrenzte Textzeilen ergeben eine große Quadratsumme.
+    """
+    height = strip_profiles.shape[0]
+    scores = []
+    for angle in np.radians(angles):
+        shifts = np.round(centers * np.tan(angle)).astype(np.int64)
+        shifts -= shifts.min()
+        profile = np.zeros(height + shifts.max())
+        for strip, shift in enumerate(shifts):
+            profile[shift:shift + height] += strip_profiles[:, strip]
+        scores.append(np.dot(profile, profile))
+    return np.asarray(scores)
+
+
+def skew_angle(gray_img, max_angle=DESKEW_MAX_ANGLE):
+    """
+    Schätzt die Schräglage in Grad (positiv = gegen den Uhrzeigersinn gedreht) über
+    Projektionsprofile der dunklen Pixel einer Verkleinerung: erst grob in 0,5°-Schritten,
+    dann fein in 0,05°-Schritten um das beste grobe Ergebnis.
+    """
+    factor = min(1.0, DESKEW_WIDTH / gray_img.width)
+    if factor < 1.0:
+        gray_img = gray_img.resize((max(1, round(gray_img.width * factor)),
+                                    max(1, round(gray_img.height * factor))), Image.BILINEAR, reducing_gap=2.0)
+    ink = np.asarray(gray_img) <= otsu_threshold(gray_img.histogram())
+    strips = min(DESKEW_STRIPS, ink.shape[1])
+    strip_width = ink.shape[1] // strips
+    strip_profiles = ink[:, :strips * strip_width].reshape(ink.shape[0], strips, strip_width).sum(axis=2)
+    if strip_profiles.sum() < 10:
+        return 0.0
+    # Streifenmitten relativ zur Bildmitte; die Zeile unter Winkel a steigt um x * tan(a) an
+    centers = (np.arange(strips) + 0.5) * strip_width - ink.shape[1] / 2
+    coarse = np.arange(-max_angle, max_angle + 0.25, 0.5)
+    best = coarse[np.argmax(_profile_scores(strip_profiles, centers, coarse))]
+    fine = np.arange(best - 0.5, best + 0.5 + 0.025, 0.05)
+    return float(fine[np.argmax(_profile_scores(strip_profiles, centers, fine))])
+
+
+def deskew_resample(histogram):
+    # Ein bereits binarisiertes Bild bleibt mit NEAREST zweifarbig (und ist dreimal schneller)
+    return Image.NEAREST if sum(histogram[1:255]) == 0 else Image.BILINEAR
+
+
+def rotation_matrix(size, angle):
+    """
+    Affine Matrix (Ausgabe -> Eingang) von Image.rotate(-angle) um die Bildmitte.
+    """
+    radians = -math.radians(-angle)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = -b, a
+    center_x, center_y = size[0] / 2.0, size[1] / 2.0
+    return (a, b, a * -center_x + b * -center_y + center_x,
+            d, e, d * -center_x + e * -center_y + center_y)
+
+
+def rotate_nearest(read, size, box, matrix):
+    """
+    Dreht mit NEAREST: jedes Pixel in box übernimmt den Eingangspixel, auf den seine Mitte
+    abgebildet wird, außerhalb des Eingangs (Größe size) weiß. read(region) liefert den Eingang.
+
+    Pillow rechnet NEAREST in Festkomma und zählt die Koordinaten je Zeile weiter, so dass
+    Pixel auf einer Abtastgrenze je nach Lage der Kachel kippen. Hier wird jede Koordinate
+    absolut in float64 berechnet; jede Kachel stimmt damit genau mit dem ganzen Bild überein.
+    """
+    a, b, c, d, e, f = matrix
+    left, top, right, bottom = box
+    out = np.empty((bottom - top, right - left, 3), dtype=np.uint8)
+    xs = np.arange(left, right) + 0.5
+    ax, dx = a * xs, d * xs
+    for band_top in range(top, bottom, ROTATE_BAND):
+        ys = np.arange(band_top, min(bottom, band_top + ROTATE_BAND))[:, None] + 0.5
+        xin = np.floor(ax + (b * ys + c))
+        yin = np.floor(dx + (e * ys + f))
+        rows = out[band_top - top:band_top - top + len(ys)]
+        x0, x1 = int(max(0, xin.min())), int(min(size[0], xin.max() + 1))
+        y0, y1 = int(max(0, yin.min())), int(min(size[1], yin.max() + 1))
+        if x1 <= x0 or y1 <= y0:
+            rows[:] = 255
+            continue
+        # Ein weißer Rand um den Ausschnitt nimmt alle Koordinaten außerhalb des Eingangs auf
+        region = np.pad(read((x0, y0, x1, y1)), ((1, 1), (1, 1), (0, 0)), constant_values=255)
+        np.clip(xin, x0 - 1, x1, out=xin)
+        np.clip(yin, y0 - 1, y1, out=yin)
+        index = ((yin - (y0 - 1)) * region.shape[1] + (xin - (x0 - 1))).astype(np.intp)
+        np.take(region.reshape(-1, 3), index, axis=0, out=rows)
+    return out
+
+
+@register_filter("Deskew")
+def _deskew(arr, strength):
+    # strength bestimmt den Suchbereich: bis zu ±10° bei 1, 0 schaltet die Korrektur ab
+    max_angle = DESKEW_MAX_ANGLE * _clamp(strength)
+    if max_angle <= 0:
+        return arr
+    gray = _gray_image(arr)
+    angle = skew_angle(gray, max_angle)
+    if abs(angle) < 0.05:
+        return arr
+    resample = deskew_resample(gray.histogram())
+    if resample == Image.NEAREST:
+        size = (arr.shape[1], arr.shape[0])
+        return rotate_nearest(lambda box: arr[box[1]:box[3], box[0]:box[2]], size, (0, 0) + size,
+                              rotation_matrix(size, angle))
+    image = Image.fromarray(arr).rotate(-angle, resample=resample, fillcolor=(255, 255, 255))
+    return np.array(image)
+
+
+# --- Nachbarschaftsfilter: der Faltungskern läuft in PIL (C), das Blending in NumPy ---
+
+def _pil_filter(arr, pil_filter):
+    return np.asarray(Image.fromarray(arr).filter(pil_filter))
+
+
+@register_filter("Schärfen", halo=1)
+def _schaerfen(arr, strength):
+    smooth = _pil_filter(arr, ImageFilter.SMOOTH)
+    effect = _blend(smooth, arr, 1.0 + strength)
+    return _blend_into(arr, effect, strength)
+
+
+def _blur_radius(strength, scale):
+    return strength * 5 * scale
+
+
+def _blur_halo(strength, scale):
+    # PIL nähert den Gauß durch drei Boxfilter; deren gemeinsame Reichweite bleibt unter 3 Radien
+    return int(3 * _blur_radius(strength, scale)) + 3
+
+
+@register_filter("Weichzeichnen", scalable=True, halo=_blur_halo)
+def _weichzeichnen(arr, strength, scale=1.0):
+    effect = _pil_filter(arr, ImageFilter.GaussianBlur(radius=_blur_radius(strength, scale)))
+    return _blend_into(arr, effect, strength)
+
+
+def _register_kernel_filter(name, pil_filter):
+    # Alle verwendeten PIL-Kerne sind 3x3
+    @register_filter(name, halo=1)
+    def _kernel(arr, strength):
+        return _blend_into(arr, _pil_filter(arr, pil_filter), _clamp(strength))
+    return _kernel
+
+
+_register_kernel_filter("Kantenerkennung", ImageFilter.FIND_EDGES)
+_register_kernel_filter("Emboss", ImageFilter.EMBOSS)
+_register_kernel_filter("Edge Enhance", ImageFilter.EDGE_ENHANCE)
+_register_kernel_filter("Detail", ImageFilter.DETAIL)
+_register_kernel_filter("Smooth", ImageFilter.SMOOTH)
+
+
+@register_filter("Custom", halo=0)
+def _custom(arr, strength):
+    return arr
+
+
+def to_array(img):
+    """
+    Liefert eine beschreibbare HxWx3-uint8-Kopie des Bildes.
+    """
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.array(img)
+
+
+def call_kernel(arr, filter_name, strength, scale=1.0):
+    """
+    Ruft den Filterkern auf, ohne Fehler abzufangen. scale ist der Maßstab des Puffers
+    relativ zum Originalbild.
+    """
+    kernel = FILTER_KERNELS.get(filter_name)
+    if kernel is None:
+        return arr
+    if filter_name in SCALABLE_FILTERS:
+        return kernel(arr, strength, scale=scale)
+    return kernel(arr, strength)
+
+
+def apply_filter_array(arr, filter_name, strength=1.0, scale=1.0):
+    """
+    Wendet einen Filter auf einen uint8-Puffer an. Das Ergebnis wird nach Möglichkeit
+    direkt in arr geschrieben; zurückgegeben wird immer der Ergebnis-Puffer.
+    """
+    try:
+        return call_kernel(arr, filter_name, strength, scale)
     except Exception as e:
         from tkinter import messagebox
         messagebox.showerror("Filter Error", f"Fehler beim Anwenden des Filters '{filter_name}': {str(e)}")
-        return img.copy()
+        return arr
+
+
+def apply_filters(img, layers):
+    """
+    Wendet eine Liste von (filter_name, strength) nacheinander auf img an.
+    Das Bild wird nur einmal nach NumPy und einmal zurück konvertiert.
+    """
+    arr = to_array(img)
+    for filter_name, strength in layers:
+        arr = apply_filter_array(arr, filter_name, strength)
+    return Image.fromarray(arr)
+
+
+def apply_filter(img, filter_name, strength=1.0):
+    return apply_filters(img, [(filter_name, strength)])
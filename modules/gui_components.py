@@ -22,6 +22,13 @@ def create_menu(root, app_instance):
 
 	extras_menu = tk.Menu(menu_bar, tearoff=0)
 	extras_menu.add_command(label="OCR ausführen", command=app_instance.run_ocr)
+	extras_menu.add_command(label="OCR in markierten Bereichen", command=app_instance.run_roi_ocr)
+	extras_menu.add_command(label="Dokument exportieren (PDF, hOCR, ALTO) ...", command=app_instance.export_document)
+	extras_menu.add_command(label="Markierte Bereiche löschen", command=app_instance.clear_roi)
+	extras_menu.add_checkbutton(label="Live-OCR", variable=app_instance.live_ocr_var, command=app_instance.toggle_live_ocr)
+	extras_menu.add_checkbutton(label="OCR-Boxen anzeigen", variable=app_instance.ocr_overlay_var, command=app_instance.toggle_ocr_overlay)
+	extras_menu.add_separator()
+	extras_menu.add_command(label="Laufzeitstatistik", command=app_instance.show_trace_panel)
 	menu_bar.add_cascade(label="Extras", menu=extras_menu)
 
 	root.config(menu=menu_bar)
@@ -1,22 +1,126 @@
-from PIL import ImageTk
-from modules.filters import apply_filter
+from PIL import Image
+from modules.pipeline_spec import LayerSpec, PipelineSpec
+
+# Nach dieser Ruhezeit ohne Reglerbewegung wird in voller Auflösung gerechnet
+FULL_RENDER_DELAY_MS = 400
+
+def current_spec(app_instance):
+    """
+    Liest die Ebenen aus den Tk-Variablen (nur im Tk-Thread) und liefert sie zusammen mit
+    OCR-Backend und Sprache als PipelineSpec, die ohne Tk weitergegeben werden kann.
+    """
+    layers = tuple(LayerSpec(filter_var.get(), float(strength_var.get()), bool(enabled_var.get()))
+                   for enabled_var, filter_var, strength_var in app_instance.layer_vars)
+    return PipelineSpec(layers, app_instance.ocr_backend, app_instance.ocr_lang)
+
+def current_layers(app_instance):
+    return current_spec(app_instance).active_layers
+
+def apply_spec_op(app_instance, spec):
+    """
+    Überträgt die Ebenen einer PipelineSpec in die Regler; überzählige Ebenen bleiben unverändert.
+    """
+    app_instance.ocr_backend = spec.backend
+    app_instance.ocr_lang = spec.lang
+    for (enabled_var, filter_var, strength_var), layer in zip(app_instance.layer_vars, spec.layers):
+        enabled_var.set(layer.enabled)
+        filter_var.set(layer.filter)
+        strength_var.set(layer.strength)
+
+def canvas_size(canvas):
+    """
+    Sichtbare Größe des Canvas abzüglich Rand; vor dem ersten Layout gilt die konfigurierte Größe.
+    """
+    width, height = canvas.winfo_width(), canvas.winfo_height()
+    if width <= 1 or height <= 1:
+        width, height = int(canvas.cget("width")), int(canvas.cget("height"))
+    return max(1, width - 20), max(1, height - 20)
+
+def fit_scale(image_size, target_size):
+    return min(1.0, target_size[0] / image_size[0], target_size[1] / image_size[1])
+
+def get_preview_source(app_instance):
+    """
+    Liefert (Vorschaubild, Maßstab): das Original verkleinert auf die Größe des rechten Canvas.
+    Solange die Regler bewegt werden, rechnet der Filterstapel nur auf diesem Bild.
+    """
+    original = app_instance.original_image
+    target = canvas_size(app_instance.right_canvas)
+    cached = app_instance.preview_source
+    if cached and cached[0] is original and cached[1] == target:
+        return cached[2], cached[3]
+    scale = fit_scale(original.size, target)
+    if scale < 1.0:
+        size = (max(1, round(original.width * scale)), max(1, round(original.height * scale)))
+        preview = original.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    else:
+        preview = original
+    app_instance.preview_source = (original, target, preview, scale)
+    return preview, scale
 
 def update_image_op(app_instance, *args):
     if app_instance.original_image:
-        img = app_instance.original_image.copy()
-        for enabled_var, filter_var, strength_var in app_instance.layer_vars:
-            if enabled_var.get():
-                img = apply_filter(img, filter_var.get(), strength_var.get())
+        layers = current_layers(app_instance)
+        preview, scale = get_preview_source(app_instance)
+        app_instance.render_scheduler.request(preview, layers, scale)
+        cancel_full_render_op(app_instance)
+        if preview is not app_instance.original_image:
+            app_instance.full_render_job = app_instance.root.after(
+                FULL_RENDER_DELAY_MS, lambda: request_full_render_op(app_instance))
+
+def cancel_full_render_op(app_instance):
+    if app_instance.full_render_job is not None:
+        app_instance.root.after_cancel(app_instance.full_render_job)
+        app_instance.full_render_job = None
+
+def request_full_render_op(app_instance):
+    app_instance.full_render_job = None
+    if app_instance.original_image:
+        app_instance.render_scheduler.request(app_instance.original_image, current_layers(app_instance), 1.0)
+
+def ensure_full_render_op(app_instance):
+    """
+    Sorgt dafür, dass processed_image dem aktuellen Filterstapel in voller Auflösung entspricht
+    (z. B. vor dem Speichern oder der OCR). Blockiert, bis das Bild fertig ist.
+    """
+    cancel_full_render_op(app_instance)
+    if app_instance.original_image is None:
+        return
+    layers = current_layers(app_instance)
+    if app_instance.processed_source is not app_instance.original_image or app_instance.processed_layers != layers:
+        app_instance.render_scheduler.request(app_instance.original_image, layers, 1.0)
+    app_instance.render_scheduler.wait()
+
+def render_layers_op(app_instance, source, layers, scale):
+    # Läuft im Hintergrund-Thread des RenderSchedulers, daher keine Tk-Aufrufe
+    return source, layers, app_instance.render_cache.render(source, layers, scale)
+
+def show_rendered_op(app_instance, result):
+    source, layers, img = result
+    coarse = None
+    if source is app_instance.original_image:
         app_instance.processed_image = img
-        show_image_op(img, app_instance.right_canvas)
+        app_instance.processed_source = source
+        app_instance.processed_layers = layers
+        # Die Vorschau desselben Filterstapels dient der Anzeige als fertige grobe Stufe
+        if app_instance.preview_render and app_instance.preview_render[0] == layers:
+            coarse = app_instance.preview_render[1]
+    else:
+        app_instance.preview_render = (layers, img)
+    page_size = app_instance.original_image.size if app_instance.original_image else None
+    show_image_op(img, app_instance.right_canvas, page_size, coarse)
+
+def show_busy_op(app_instance, busy):
+    app_instance.status_label.config(text="Berechne Vorschau ..." if busy else "")
 
-def show_image_op(image, canvas):
-    canvas.delete("all")
-    photo = ImageTk.PhotoImage(image)
-    canvas.create_image(10, 10, image=photo, anchor="nw")
-    canvas.image = photo
-    width, height = image.size
-    canvas.config(scrollregion=(0, 0, width + 20, height + 20))
+def show_image_op(image, canvas, page_size=None, coarse=None):
+    """
+    Zeigt image im Viewport des Canvas; image darf eine verkleinerte Fassung einer Seite der
+    Größe page_size sein. Umgerechnet wird nur der sichtbare Ausschnitt (siehe modules.viewport).
+    """
+    from modules.viewport import get_viewport
+    get_viewport(canvas).show(image, page_size, coarse)
 
 def apply_filter_op(img, filter_name, strength=1.0):
+    from modules.filters import apply_filter
     return apply_filter(img, filter_name, strength)
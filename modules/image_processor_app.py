@@ -7,9 +7,20 @@ from modules.poppler_manager import get_poppler_path, install_poppler
 from modules.settings_manager import load_settings as settings_load, save_settings as settings_save
 from modules.gui_components import create_menu, create_layers_ui
 from modules.view import build_view
-from modules.file_handlers import load_image_file, save_image_file
-from modules.image_ops import update_image_op, show_image_op, apply_filter_op
-from modules.ocr_runner import run_ocr_op
+from modules.file_handlers import load_image_file, save_image_file, next_page, previous_page
+from modules.image_ops import (
+    update_image_op, show_image_op, apply_filter_op, render_layers_op, show_rendered_op, show_busy_op,
+    current_spec, apply_spec_op
+)
+from modules.ocr_runner import export_document_op, run_ocr_op
+from modules.ocr_overlay import toggle_ocr_overlay_op
+from modules.live_ocr import toggle_live_ocr_op, live_ocr_update_op
+from modules.roi_ocr import bind_roi_selection, draw_roi_op, clear_roi_op, run_roi_ocr_op
+from modules.pipeline_spec import PipelineSpec
+from modules.render_cache import LayerCache
+from modules.render_scheduler import RenderScheduler
+from modules.trace_panel import show_trace_panel_op
+from modules.tracing import configure_tracing, tracing_enabled
 
 class ImageProcessorApp:
     def __init__(self, root):
@@ -17,18 +28,41 @@ class ImageProcessorApp:
         self.root.title("Bildprozessor Pro Version 1.0")
         self.poppler_path = ""
         self.settings_file_name = "Keine Einstellungen geladen"
-        self.default_layer_settings = []
+        self.default_spec = None
+        self.ocr_backend = "tesseract_cpu"
+        self.ocr_lang = "deu"
         self.show_left_preview = True
         self.layer_vars = []
         self.filter_options = [
             "Negativ", "Multiplikation", "Helligkeit", "Kontrast", "Schärfen",
             "Weichzeichnen", "Graustufen", "Sepia", "Posterize", "Solarize",
             "Kantenerkennung", "Emboss", "Edge Enhance", "Detail", "Smooth",
-            "Binarize", "Gamma Correction", "Adaptive Threshold", "Color Boost", "Custom"
+            "Binarize", "Gamma Correction", "Adaptive Threshold", "Color Boost", "Custom",
+            "Sauvola", "Niblack", "Otsu", "Deskew"
         ]
         self.original_image = None
         self.processed_image = None
         self.filename = None
+        self.document = None
+        self.page_index = 0
+        self.processed_source = None
+        self.processed_layers = None
+        self.preview_source = None
+        # Letzte Vorschau-Berechnung als (Ebenen, Bild); grobe Stufe für die Anzeige
+        self.preview_render = None
+        self.full_render_job = None
+        self.roi_regions = []
+        self.roi_drag = None
+        self.live_ocr = None
+        self.live_ocr_var = tk.BooleanVar(value=False)
+        self.ocr_overlay_var = tk.BooleanVar(value=True)
+        self.trace_panel = None
+        self.render_cache = LayerCache()
+        self.export_scheduler = None
+        self.render_scheduler = RenderScheduler(
+            self.root, self.render_layers, self.show_rendered_image,
+            on_busy=self.show_busy, on_error=self.show_render_error
+        )
 
         self.load_default_settings()
         self.create_menu()
@@ -42,13 +76,17 @@ class ImageProcessorApp:
                 with open(settings_file, "r") as f:
                     settings = json.load(f)
                 self.poppler_path = settings.get("poppler_path", "")
-                self.default_layer_settings = settings.get("layers", [])
+                self.default_spec = PipelineSpec.from_settings(settings)
+                self.ocr_backend = self.default_spec.backend
+                self.ocr_lang = self.default_spec.lang
                 self.settings_file_name = os.path.basename(settings_file)
                 self.show_left_preview = settings.get("show_left_preview", True)
+                if settings.get("trace"):
+                    configure_tracing(enabled=True)
             except Exception as e:
                 messagebox.showerror("Fehler", f"Einstellungen konnten nicht geladen werden: {str(e)}")
         else:
-            self.default_layer_settings = []
+            self.default_spec = None
             self.show_left_preview = True
             messagebox.showwarning("Einstellungen nicht gefunden", "Die Datei settings.json wurde nicht gefunden.")
 
@@ -66,17 +104,18 @@ class ImageProcessorApp:
         self.right_canvas = widgets["right_canvas"]
         self.filename_label = widgets["filename_label"]
         self.settings_label = widgets["settings_label"]
+        self.status_label = widgets["status_label"]
+        self.page_label = widgets["page_label"]
+        widgets["prev_page_button"].config(command=self.previous_page)
+        widgets["next_page_button"].config(command=self.next_page)
+        self.root.bind("<Prior>", lambda event: self.previous_page())
+        self.root.bind("<Next>", lambda event: self.next_page())
+        bind_roi_selection(self)
 
         create_layers_ui(self.slider_frame, self.layer_vars, self.filter_options, self.update_image)
 
-        if self.default_layer_settings:
-            for setting in self.default_layer_settings:
-                layer_idx = setting["layer"] - 1
-                if layer_idx < len(self.layer_vars):
-                    enabled_var, filter_var, strength_var = self.layer_vars[layer_idx]
-                    enabled_var.set(setting.get("enabled", False))
-                    filter_var.set(setting.get("filter", self.filter_options[0]))
-                    strength_var.set(setting.get("strength", 1.0))
+        if self.default_spec and self.default_spec.layers:
+            apply_spec_op(self, self.default_spec)
             self.update_image()
 
     def load_image(self):
@@ -85,6 +124,12 @@ class ImageProcessorApp:
     def save_image(self):
         save_image_file(self)
 
+    def next_page(self):
+        next_page(self)
+
+    def previous_page(self):
+        previous_page(self)
+
     def load_settings(self):
         file_path = filedialog.askopenfilename(
             title="Einstellungen laden",
@@ -96,13 +141,9 @@ class ImageProcessorApp:
                     settings = json.load(f)
                 self.poppler_path = settings.get("poppler_path", "")
                 self.show_left_preview = settings.get("show_left_preview", True)
-                for setting in settings.get("layers", []):
-                    layer_idx = setting["layer"] - 1
-                    if layer_idx < len(self.layer_vars):
-                        enabled_var, filter_var, strength_var = self.layer_vars[layer_idx]
-                        enabled_var.set(setting.get("enabled", False))
-                        filter_var.set(setting.get("filter", self.filter_options[0]))
-                        strength_var.set(setting.get("strength", 1.0))
+                if "trace" in settings:
+                    configure_tracing(enabled=settings["trace"])
+                apply_spec_op(self, PipelineSpec.from_settings(settings))
                 self.settings_file_name = os.path.basename(file_path)
                 self.settings_label.config(text="Einstellungen: " + self.settings_file_name)
                 messagebox.showinfo("Erfolg", "Einstellungen erfolgreich geladen.")
@@ -111,18 +152,10 @@ class ImageProcessorApp:
                 messagebox.showerror("Fehler", f"Laden fehlgeschlagen: {str(e)}")
 
     def save_settings(self):
-        settings = {
-            "poppler_path": self.poppler_path,
-            "layers": [],
-            "show_left_preview": self.show_left_preview
-        }
-        for idx, (enabled_var, filter_var, strength_var) in enumerate(self.layer_vars):
-            settings["layers"].append({
-                "layer": idx + 1,
-                "enabled": enabled_var.get(),
-                "filter": filter_var.get(),
-                "strength": strength_var.get()
-            })
+        settings = {"poppler_path": self.poppler_path}
+        settings.update(current_spec(self).to_settings())
+        settings["show_left_preview"] = self.show_left_preview
+        settings["trace"] = tracing_enabled()
         file_path = settings_save(settings)
         if file_path:
             self.settings_file_name = os.path.basename(file_path)
@@ -132,6 +165,20 @@ class ImageProcessorApp:
     def update_image(self, *args):
         update_image_op(self)
 
+    def render_layers(self, source, layers, scale):
+        return render_layers_op(self, source, layers, scale)
+
+    def show_rendered_image(self, result):
+        show_rendered_op(self, result)
+        draw_roi_op(self)
+        live_ocr_update_op(self)
+
+    def show_busy(self, busy):
+        show_busy_op(self, busy)
+
+    def show_render_error(self, error):
+        messagebox.showerror("Filter Error", f"Fehler beim Anwenden der Filter: {str(error)}")
+
     def apply_filter(self, img, filter_name, strength=1.0):
         return apply_filter_op(img, filter_name, strength)
 
@@ -152,6 +199,26 @@ class ImageProcessorApp:
         # OCR wird auf dem bearbeiteten (rechten) Bild ausgeführt.
         run_ocr_op(self)
 
+    def export_document(self):
+        # Alle Seiten als durchsuchbares PDF, hOCR, ALTO oder Text
+        export_document_op(self)
+
+    def run_roi_ocr(self):
+        # OCR nur in den im rechten Bild aufgezogenen Bereichen
+        run_roi_ocr_op(self)
+
+    def clear_roi(self):
+        clear_roi_op(self)
+
+    def toggle_live_ocr(self):
+        toggle_live_ocr_op(self)
+
+    def toggle_ocr_overlay(self):
+        toggle_ocr_overlay_op(self)
+
+    def show_trace_panel(self):
+        show_trace_panel_op(self)
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = ImageProcessorApp(root)
@@ -0,0 +1,222 @@
+import statistics
+import time
+import tkinter as tk
+from tkinter import scrolledtext
+from PIL import ImageChops, ImageStat
+from modules.ocr_factory import recognize_cached
+from modules.render_scheduler import RenderScheduler
+
+# Kantenlänge der Verkleinerung für den Vergleich eines Bandes mit dem vorherigen Stand
+SIGNATURE_REDUCTION = 8
+# Grauwertabweichung eines 8x8-Blocks, ab der ein Band neu erkannt wird. Maßgeblich ist der
+# stärkste Block, damit auch ein einzelnes geändertes Wort in einem breiten Band auffällt.
+CHANGE_THRESHOLD = 8
+
+def layout_bands(words, height, gap=None):
+    """
+    Teilt die Seite anhand der Wortboxen einer vollständigen OCR in waagerechte Bänder.
+    Zeilen, die weniger als gap (Standard: mittlere Zeilenhöhe) auseinander liegen, bilden
+    einen Block; die Grenzen liegen in der Mitte der Lücken, sodass die Bänder die ganze
+    Seite abdecken und auch neu auftauchender Text in einem Band landet.
+    """
+    spans = sorted((word['top'], word['top'] + word['height']) for word in words)
+    if not spans:
+        return [(0, height)]
+    if gap is None:
+        gap = statistics.median(bottom - top for top, bottom in spans)
+    blocks = []
+    for top, bottom in spans:
+        if blocks and top <= blocks[-1][1] + gap:
+            blocks[-1][1] = max(blocks[-1][1], bottom)
+        else:
+            blocks.append([top, bottom])
+    bands = []
+    start = 0
+    for block, following in zip(blocks, blocks[1:]):
+        cut = (block[1] + following[0]) // 2
+        bands.append((start, cut))
+        start = cut
+    bands.append((start, height))
+    return bands
+
+def band_signature(image, band):
+    top, bottom = band
+    crop = image.crop((0, top, image.width, bottom)).convert("L")
+    return crop.reduce(SIGNATURE_REDUCTION) if min(crop.size) >= SIGNATURE_REDUCTION else crop
+
+def band_changed(old, new):
+    if old is None or old.size != new.size:
+        return True
+    return ImageStat.Stat(ImageChops.difference(old, new)).extrema[0][1] > CHANGE_THRESHOLD
+
+def recognize_band(image, band, backend, lang):
+    """
+    Erkennt ein Band mit dem OCR-Backend (über den OCR-Cache) und liefert Text und Wörter
+    in Seitenkoordinaten. Polygone (PaddleOCR) werden zu umschließenden Boxen. Fehler der
+    Erkennung werden weitergereicht.
+    """
+    top, bottom = band
+    words = recognize_cached(image.crop((0, top, image.width, bottom)), backend, lang)
+    shifted = []
+    for word in words:
+        if 'points' in word:
+            xs = [point[0] for point in word['points']]
+            ys = [point[1] for point in word['points']]
+            word = {'number': word['number'], 'text': word['text'], 'conf': word['conf'],
+                    'left': min(xs), 'top': min(ys), 'width': max(xs) - min(xs), 'height': max(ys) - min(ys)}
+        shifted.append(dict(word, top=word['top'] + top))
+    return {'text': words.full_text(), 'words': shifted}
+
+def words_to_text(words):
+    """
+    Setzt Wörter zu Zeilen zusammen: ein Wort beginnt eine neue Zeile, wenn seine Mitte
+    unterhalb der bisherigen Zeile liegt.
+    """
+    lines = []
+    for word in sorted(words, key=lambda word: word['top']):
+        center = word['top'] + word['height'] / 2
+        if lines and center < lines[-1][0]:
+            lines[-1][0] = max(lines[-1][0], word['top'] + word['height'])
+            lines[-1][1].append(word)
+        else:
+            lines.append([word['top'] + word['height'], [word]])
+    return "\n".join(" ".join(word['text'] for word in sorted(line, key=lambda word: word['left']))
+                     for _, line in lines)
+
+def split_words(words, bands):
+    # Wörter der ersten, vollständigen OCR den Bändern nach ihrer vertikalen Mitte zuordnen
+    per_band = [[] for _ in bands]
+    for word in words:
+        center = word['top'] + word['height'] / 2
+        for index, (top, bottom) in enumerate(bands):
+            if top <= center < bottom:
+                per_band[index].append(word)
+                break
+    return per_band
+
+
+class LiveOcr:
+    """
+    Live-OCR während der Filtereinstellung: nach jeder fertigen Berechnung in voller
+    Auflösung werden nur die Bänder der Seite neu erkannt, die sich sichtbar verändert haben.
+
+    Die erste Erkennung einer Seite läuft über die ganze Seite und liefert die Bänder
+    (siehe layout_bands). Danach wird jedes Band verkleinert mit dem vorherigen Stand
+    verglichen. Gerechnet wird in einem einzigen Hintergrund-Thread; kommt ein neueres Bild,
+    bricht der laufende Auftrag nach dem aktuellen Band ab. Bereits erkannte Bänder landen
+    im OCR-Cache und kosten beim nächsten Mal nichts.
+    """
+
+    def __init__(self, app_instance):
+        self.app = app_instance
+        self.state = None
+        self.window = None
+        self.text = None
+        self.info_label = None
+        self.scheduler = RenderScheduler(app_instance.root, self.recognize, self.show,
+                                         on_busy=self.show_busy, on_error=self.show_error)
+
+    def open(self):
+        if self.window is not None:
+            self.window.lift()
+            return
+        self.window = tk.Toplevel(self.app.root)
+        self.window.title("Live-OCR")
+        self.info_label = tk.Label(self.window, text="", anchor="w")
+        self.info_label.pack(fill=tk.X, padx=5)
+        self.text = scrolledtext.ScrolledText(self.window, wrap=tk.WORD, width=80, height=30)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.text.config(state=tk.DISABLED)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        if self.state is not None:
+            self._fill_text(self.state)
+
+    def close(self):
+        if self.window is not None:
+            self.window.destroy()
+        self.window = None
+        self.text = None
+        self.info_label = None
+        self.app.live_ocr_var.set(False)
+
+    def update(self, image, source):
+        """
+        Plant die Erkennung des neu berechneten Bildes; source ist das Originalbild der Seite.
+        Backend und Sprache kommen aus den aktuellen Einstellungen der Anwendung.
+        """
+        self.scheduler.request(image, source, self.state, (self.app.ocr_backend, self.app.ocr_lang))
+
+    def recognize(self, image, source, state, engine):
+        # Läuft im Hintergrund-Thread, daher keine Tk-Aufrufe
+        start = time.perf_counter()
+        signatures = None
+        if (state is None or state['source'] is not source or state['size'] != image.size
+                or state['engine'] != engine):
+            page = recognize_band(image, (0, image.height), *engine)
+            bands = layout_bands(page['words'], image.height)
+            results = [{'text': words_to_text(words), 'words': words} for words in split_words(page['words'], bands)]
+            changed = len(bands)
+        else:
+            bands = state['bands']
+            results = list(state['results'])
+            signatures = state['signatures']
+            changed = 0
+        new_signatures = [band_signature(image, band) for band in bands]
+        if signatures is not None:
+            for index, band in enumerate(bands):
+                if not band_changed(signatures[index], new_signatures[index]):
+                    continue
+                if self.scheduler.superseded():
+                    return None
+                results[index] = recognize_band(image, band, *engine)
+                changed += 1
+        return {'source': source, 'size': image.size, 'engine': engine, 'bands': bands,
+                'signatures': new_signatures, 'results': results, 'changed': changed,
+                'seconds': time.perf_counter() - start}
+
+    def show(self, state):
+        if state is None:
+            return
+        self.state = state
+        if self.text is not None:
+            self._fill_text(state)
+
+    def _fill_text(self, state):
+        text = "\n\n".join(result['text'] for result in state['results'] if result['text'].strip())
+        # Text an Ort und Stelle ersetzen, ohne die Scrollposition zu verlieren
+        position = self.text.yview()[0]
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, text)
+        self.text.config(state=tk.DISABLED)
+        self.text.yview_moveto(position)
+        self.info_label.config(text=f"{state['changed']} von {len(state['bands'])} Bereichen neu erkannt "
+                                    f"in {state['seconds']:.2f} s")
+
+    def show_busy(self, busy):
+        if busy and self.info_label is not None:
+            self.info_label.config(text="Erkenne Text ...")
+
+    def show_error(self, error):
+        if self.info_label is not None:
+            self.info_label.config(text=f"OCR-Fehler: {str(error)}")
+
+
+def toggle_live_ocr_op(app_instance):
+    if app_instance.live_ocr_var.get():
+        if app_instance.live_ocr is None:
+            app_instance.live_ocr = LiveOcr(app_instance)
+        app_instance.live_ocr.open()
+        live_ocr_update_op(app_instance)
+    elif app_instance.live_ocr is not None:
+        app_instance.live_ocr.close()
+
+def live_ocr_update_op(app_instance):
+    """
+    Nach einer Berechnung in voller Auflösung die geänderten Bereiche neu erkennen lassen.
+    """
+    live_ocr = app_instance.live_ocr
+    if live_ocr is None or not app_instance.live_ocr_var.get():
+        return
+    if app_instance.processed_image is not None and app_instance.processed_source is app_instance.original_image:
+        live_ocr.update(app_instance.processed_image, app_instance.original_image)
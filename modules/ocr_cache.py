@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from modules.utils import get_program_path
+
+# Bei einer Änderung am Format der gespeicherten Ergebnisse erhöhen, damit alte Einträge nicht mehr passen
+CACHE_VERSION = 1
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def image_key(image, backend, lang, params=None):
+    """
+    Inhaltsadresse eines OCR-Aufrufs: Hash über die Pixel des (gefilterten) Bildes,
+    Backend, Sprache und Engine-Parameter. Gleiche Pixel ergeben denselben Schlüssel,
+    unabhängig davon, ob das Bild aus einer Datei, einer PDF-Seite oder dem Filterstapel stammt.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    header = [CACHE_VERSION, image.mode, image.size, backend, lang, params or {}]
+    digest.update(json.dumps(header, sort_keys=True).encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    Zweistufiger Cache für OCR-Ergebnisse: ein kleiner LRU-Cache im Speicher vor einem
+    größenbegrenzten Verzeichnis auf der Platte (eine JSON-Datei pro Schlüssel).
+
+    Auf der Platte gilt die Änderungszeit als letzter Zugriff; Treffer frischen sie auf.
+    Wird max_bytes überschritten, werden die am längsten nicht benutzten Dateien gelöscht.
+    Dateien werden über eine temporäre Datei und os.replace geschrieben, sodass mehrere
+    Prozesse (z. B. die Worker der Stapelverarbeitung) dasselbe Verzeichnis nutzen können.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, memory_entries=128):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Liefert das gespeicherte Ergebnis oder None.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            # Ein überschriebener Eintrag gibt seinen Platz frei
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            # Ohne beschreibbares Verzeichnis bleibt nur die Speicherstufe
+            return
+        with self.lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(entry[2] for entry in self._scan())
+            else:
+                self.disk_bytes += size - replaced
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _scan(self):
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        # Das Verzeichnis wird neu eingelesen, weil andere Prozesse ebenfalls schreiben
+        entries = sorted(self._scan())
+        total = sum(entry[2] for entry in entries)
+        # Bis auf 90 % räumen, damit nicht jeder weitere Eintrag erneut einen Durchlauf auslöst
+        limit = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self.disk_bytes = total
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            for _, path, _ in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.disk_bytes = 0
+
+
+def get_ocr_cache():
+    """
+    Gemeinsamer Cache des Prozesses oder None, wenn er über OCR_CACHE=0 abgeschaltet ist.
+    Das Verzeichnis lässt sich mit OCR_CACHE_DIR festlegen (Standard: ocr_cache neben settings.json).
+    """
+    global _cache
+    if os.environ.get("OCR_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            directory = os.environ.get("OCR_CACHE_DIR") or os.path.join(get_program_path(), "ocr_cache")
+            _cache = OcrCache(directory)
+        return _cache
+
+
+def cached_ocr(image, backend, lang, compute, params=None):
+    """
+    Liefert das Ergebnis von compute() für image aus dem Cache oder berechnet und speichert es.
+    compute muss ein JSON-serialisierbares Ergebnis liefern. Gibt (Ergebnis, Treffer) zurück.
+    """
+    cache = get_ocr_cache()
+    if cache is None:
+        return compute(), False
+    key = image_key(image, backend, lang, params)
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+    value = compute()
+    cache.put(key, value)
+    return value, False
+
+
+def engine_params(backend):
+    """
+    Parameter der OCR-Engine, die in den Schlüssel eingehen; ein Update von Tesseract
+    macht so die alten Einträge ungültig.
+    """
+    if backend.startswith("tesseract"):
+        from modules.tesseract_pool import tesseract_version
+        return {'tesseract': tesseract_version()}
+    return {}
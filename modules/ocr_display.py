@@ -1,53 +1,195 @@
 # ocr_display.py
 import os
+import queue
+import threading
+import time
 import tkinter as tk
-from tkinter import scrolledtext, messagebox
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from tkinter import scrolledtext
 from PIL import Image
-from pdf2image import convert_from_path
-
-# Falls pytesseract noch nicht installiert ist, kann dieser Trick hilfreich sein:
-try:
-    import pytesseract
-except ModuleNotFoundError:
-    import subprocess, sys
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "pytesseract"])
-    import pytesseract
+from modules.ocr_cache import cached_ocr, engine_params
+from modules.ocr_export import FORMAT_BY_EXTENSION, ImageOptions, export_results, format_page, open_writer
+from modules.ocr_result import OcrWords
+from modules.tesseract_pool import configure_engine_pool, image_to_words
+from modules.tracing import trace_span
 
 def perform_ocr_on_image(image, lang='deu'):
     """
     Führt OCR auf einem PIL-Image durch und gibt den erkannten Text zurück.
     """
+    return ocr_page(image, lang)['text']
+
+def recognize_page(image, lang='deu'):
+    """
+    Erkennt eine Seite mit Tesseract über den OCR-Cache und liefert (OcrWords, aus dem Cache).
+    Fehler der Erkennung werden nicht abgefangen.
+    """
+    params = dict(engine_params("tesseract_cpu"), result="words")
+    data, cached = cached_ocr(image, "tesseract_cpu", lang, lambda: image_to_words(image, lang).to_json(), params)
+    return OcrWords.from_json(data), cached
+
+def ocr_page(image, lang='deu', page=1):
+    """
+    Führt OCR auf einer Seite durch und liefert ein Dictionary mit
+    'page', 'text', 'words' (Wortboxen mit Konfidenz als OcrWords), 'size' (Bildgröße in Pixeln)
+    und 'seconds' (Dauer der Erkennung). Bereits erkannte Seiten mit identischen Pixeln kommen
+    aus dem OCR-Cache.
+    """
+    start = time.perf_counter()
+    with trace_span("ocr:page", size=image.size, lang=lang, page=page) as span:
+        try:
+            words, cached = recognize_page(image, lang)
+            text = words.full_text()
+            span.set(cached=cached, words=len(words))
+        except Exception as e:
+            words = OcrWords()
+            text = f"OCR-Fehler: {str(e)}"
+            span.set(error=type(e).__name__)
+    return {'page': page, 'text': text, 'words': words, 'size': image.size, 'seconds': time.perf_counter() - start}
+
+def iter_image_file(file_path, lang='deu', image_options=None):
+    """
+    Liefert die OCR-Ergebnisse eines Bildes Seite für Seite; mehrseitige TIFFs werden
+    dabei Seite für Seite dekodiert. Mit image_options (ocr_export.ImageOptions) enthält
+    jedes Ergebnis zusätzlich das für das PDF kodierte Seitenbild unter 'image'.
+    """
+    from modules.documents import open_document
+    document = open_document(file_path)
     try:
-        text = pytesseract.image_to_string(image, lang=lang)
-        return text
-    except Exception as e:
-        return f"OCR-Fehler: {str(e)}"
+        for index in range(document.page_count):
+            image = document.get_page(index)
+            result = ocr_page(image, lang, page=index + 1)
+            result['dpi'] = document.page_dpi(index)
+            if image_options is not None:
+                source = file_path if document.page_count == 1 else None
+                result['image'] = image_options.encode(image, result['dpi'], source=source)
+            yield result
+    finally:
+        document.close()
 
 def process_image_file(file_path, lang='deu'):
     """
     Öffnet ein Bild, führt OCR darauf aus und gibt den erkannten Text zurück.
     """
     try:
-        image = Image.open(file_path)
-        return perform_ocr_on_image(image, lang)
+        return "".join(result['text'] for result in iter_image_file(file_path, lang))
     except Exception as e:
         return f"Fehler beim Öffnen des Bildes: {str(e)}"
 
-def process_pdf_file(file_path, lang='deu', dpi=200):
+def _init_ocr_worker():
+    # Parallelisiert wird über die Prozesse; Tesseract selbst soll nur einen Thread nutzen
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    configure_engine_pool(size=1)
+
+def _ocr_pdf_chunk(file_path, first_page, last_page, lang, dpi, poppler_path, image_options=None):
+    """
+    Rastert die Seiten first_page..last_page im Worker-Prozess und führt OCR darauf aus.
+    So werden keine Seitenbilder zwischen den Prozessen übertragen, mit image_options nur
+    die bereits kodierten Bilder für das PDF.
+    """
+    from pdf2image import convert_from_path
+    pages = convert_from_path(file_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                              poppler_path=poppler_path)
+    results = []
+    for offset, image in enumerate(pages):
+        result = ocr_page(image, lang, page=first_page + offset)
+        result['dpi'] = (float(dpi), float(dpi))
+        if image_options is not None:
+            result['image'] = image_options.encode(image, result['dpi'])
+        results.append(result)
+    return results
+
+def _map_in_order(executor, func, tasks, max_in_flight):
+    """
+    Wie executor.map, aber mit höchstens max_in_flight gleichzeitig laufenden Aufgaben.
+    Die Ergebnisse kommen in der Reihenfolge der Aufgaben zurück.
+    """
+    in_flight = deque()
+    for task in tasks:
+        in_flight.append(executor.submit(func, *task))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def _ocr_pdf_chunks(tasks, workers):
+    """
+    Liefert die OCR-Ergebnisse der Seitenblöcke in Reihenfolge der Aufgaben.
+    """
+    if workers == 1:
+        for task in tasks:
+            yield _ocr_pdf_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker) as executor:
+        yield from _map_in_order(executor, _ocr_pdf_chunk, tasks, max_in_flight=2 * workers)
+
+def iter_pdf_pages(file_path, lang='deu', dpi=200, workers=None, chunk_size=2, poppler_path=None,
+                   image_options=None):
+    """
+    Führt OCR auf allen Seiten einer PDF aus und liefert die Ergebnisse (siehe ocr_page)
+    Seite für Seite in Reihenfolge, sobald sie fertig sind.
+    Die Seiten werden in Blöcken von chunk_size Seiten auf workers Prozesse verteilt
+    (Standard: Anzahl der CPU-Kerne). Es sind höchstens doppelt so viele Blöcke unterwegs
+    wie Prozesse, damit der Speicherbedarf nicht mit der Seitenzahl wächst.
+    image_options wie bei iter_image_file.
+    """
+    from pdf2image import pdfinfo_from_path
+    page_count = int(pdfinfo_from_path(file_path, poppler_path=poppler_path)["Pages"])
+    workers = workers or os.cpu_count() or 1
+    tasks = [(file_path, first, min(first + chunk_size - 1, page_count), lang, dpi, poppler_path, image_options)
+             for first in range(1, page_count + 1, chunk_size)]
+    for results in _ocr_pdf_chunks(tasks, workers):
+        yield from results
+
+def process_pdf_file(file_path, lang='deu', dpi=200, workers=None, chunk_size=2, poppler_path=None):
     """
-    Konvertiert alle Seiten einer PDF in Bilder, führt auf jeder Seite OCR aus und gibt den
-    gesamten erkannten Text zurück.
+    Führt OCR auf allen Seiten einer PDF aus und gibt den gesamten erkannten Text zurück.
     """
     try:
-        pages = convert_from_path(file_path, dpi=dpi)
-        result_text = ""
-        for i, page in enumerate(pages):
-            page_text = perform_ocr_on_image(page, lang)
-            result_text += f"--- Seite {i+1} ---\n{page_text}\n\n"
-        return result_text
+        return "".join(format_page(result) for result in
+                       iter_pdf_pages(file_path, lang, dpi, workers, chunk_size, poppler_path))
     except Exception as e:
         return f"Fehler beim Öffnen der PDF: {str(e)}"
 
+def iter_file(file_path, lang='deu', **options):
+    """
+    Liefert die OCR-Ergebnisse einer Bild- oder PDF-Datei Seite für Seite.
+    options werden an iter_pdf_pages weitergereicht (dpi, workers, chunk_size, poppler_path);
+    image_options gilt für beide (siehe iter_image_file).
+    """
+    _, ext = os.path.splitext(file_path.lower())
+    if ext == '.pdf':
+        return iter_pdf_pages(file_path, lang, **options)
+    return iter_image_file(file_path, lang, image_options=options.get('image_options'))
+
+def write_results(results, output_path):
+    """
+    Schreibt die Seiten eines Ergebnis-Iterators fortlaufend in eine Textdatei,
+    ohne den gesamten Text im Speicher zu halten. Gibt die Anzahl der Seiten zurück.
+    """
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(format_page(result))
+            f.flush()
+            count += 1
+    return count
+
+def export_file(file_path, output_path, lang='deu', image_options=None, **options):
+    """
+    Erkennt eine Bild- oder PDF-Datei und schreibt das Ergebnis Seite für Seite in output_path.
+    Das Format folgt aus der Endung: .txt, .hocr/.html (hOCR), .xml (ALTO) oder .pdf
+    (durchsuchbares PDF). Gibt die Anzahl der Seiten zurück.
+    """
+    format_name = FORMAT_BY_EXTENSION.get(os.path.splitext(output_path.lower())[1])
+    if format_name is None:
+        raise ValueError(f"Unbekanntes Ausgabeformat: {output_path} (erlaubt: {', '.join(FORMAT_BY_EXTENSION)})")
+    image_options = (image_options or ImageOptions()) if format_name == "pdf" else None
+    results = iter_file(file_path, lang, image_options=image_options, **options)
+    writer = open_writer(format_name, output_path, lang=lang, title=os.path.basename(file_path))
+    return export_results(results, [writer])
+
 def process_file(file_path, lang='deu'):
     """
     Entscheidet anhand der Dateiendung, ob es sich um eine Bild- oder PDF-Datei handelt,
@@ -71,15 +213,75 @@ def display_text(text, title="OCR Ergebnis"):
     st.configure(state='disabled')
     root.mainloop()
 
+def show_results(parent, results, title="OCR Ergebnis"):
+    """
+    Öffnet ein Fenster und hängt die Seiten eines Ergebnis-Iterators an, sobald sie fertig sind.
+    Der Iterator läuft in einem Hintergrund-Thread; der Text wird per after() im Tk-Thread eingefügt.
+    """
+    window = tk.Toplevel(parent) if parent is not None else tk.Tk()
+    window.title(title)
+    st = scrolledtext.ScrolledText(window, wrap=tk.WORD, width=80, height=30)
+    st.pack(expand=True, fill='both')
+    status = tk.Label(window, text="OCR läuft ...", anchor="w")
+    status.pack(fill='x')
+    st.configure(state='disabled')
+    pages = queue.Queue()
+    closed = threading.Event()
+
+    def consume():
+        try:
+            for result in results:
+                if closed.is_set():
+                    break
+                pages.put(format_page(result))
+            pages.put(None)
+        except Exception as e:
+            pages.put(f"Fehler bei der OCR: {str(e)}\n")
+            pages.put(None)
+
+    def poll():
+        if not window.winfo_exists():
+            return
+        while True:
+            try:
+                text = pages.get_nowait()
+            except queue.Empty:
+                window.after(50, poll)
+                return
+            if text is None:
+                status.config(text="OCR abgeschlossen")
+                return
+            st.configure(state='normal')
+            st.insert(tk.END, text)
+            st.configure(state='disabled')
+
+    def on_destroy(event):
+        if event.widget is window:
+            closed.set()
+
+    window.bind("<Destroy>", on_destroy)
+    threading.Thread(target=consume, daemon=True).start()
+    window.after(50, poll)
+    return window
+
+def display_results(results, title="OCR Ergebnis"):
+    """
+    Wie display_text, zeigt die Seiten aber an, sobald sie erkannt sind.
+    """
+    root = show_results(None, results, title)
+    root.mainloop()
+
 # Beispiel für den direkten Aufruf des Moduls über die Kommandozeile
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1:
         file_path = sys.argv[1]
-        if os.path.exists(file_path):
-            ocr_result = process_file(file_path, lang='deu')
-            display_text(ocr_result, title=f"OCR Ergebnis für {os.path.basename(file_path)}")
+        if not os.path.exists(file_path):
+            print(f"Datei nicht gefunden: {file_path}")
+        elif len(sys.argv) > 2:
+            page_count = export_file(file_path, sys.argv[2], lang='deu')
+            print(f"{page_count} Seite(n) nach {sys.argv[2]} geschrieben")
         else:
-            messagebox.showerror("Fehler", f"Datei nicht gefunden: {file_path}")
+            display_results(iter_file(file_path, lang='deu'), title=f"OCR Ergebnis für {os.path.basename(file_path)}")
     else:
-        print("Usage: python ocr_display.py <Pfad zur Datei>")
+        print("Usage: python ocr_display.py <Pfad zur Datei> [Ausgabedatei (.txt, .hocr, .xml oder .pdf)]")
@@ -0,0 +1,577 @@
+"""
+Export erkannter Seiten als Text, hOCR, ALTO-XML und durchsuchbares PDF.
+
+Alle Writer nehmen die Seiten einzeln entgegen, sobald sie aus der Verarbeitung kommen
+(add_page), und schreiben sie sofort in die Datei. Im Speicher bleibt nur die aktuelle
+Seite; beim PDF zusätzlich eine Zahl pro Objekt für die Querverweistabelle.
+
+Eine Seite ist ein Dictionary wie von ocr_display.ocr_page:
+    'page'   Seitennummer (1-basiert)
+    'text'   erkannter Text (nur für den Textexport)
+    'words'  OcrWords oder Liste von Dictionaries, Boxen in Pixeln des erkannten Bildes
+    'size'   (Breite, Höhe) des erkannten Bildes in Pixeln
+    'dpi'    (x, y) Auflösung des Bildes, sonst DEFAULT_DPI
+    'image'  Seitenbild für das PDF: PdfImage (siehe ImageOptions.encode) oder PIL-Image
+
+Das durchsuchbare PDF enthält pro Seite das Seitenbild in voller Größe und darüber den
+unsichtbaren Text (Darstellungsmodus 3) an den Wortpositionen. Die Schrift wird nicht
+eingebettet: sichtbar wird sie nie, und Breiten sowie Unicode-Zuordnung stehen im PDF.
+"""
+import io
+import json
+import zlib
+from collections import namedtuple
+from dataclasses import dataclass
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+from PIL import Image
+from modules.documents import DEFAULT_DPI
+from modules.ocr_result import as_words
+
+SOFTWARE = "Bildprozessor Pro"
+
+# Format -> Dateiendung der Ausgabe
+EXPORT_FORMATS = {"txt": ".txt", "hocr": ".hocr", "alto": ".xml", "pdf": ".pdf"}
+# Dateiendung -> Format, für die Wahl über den Namen der Ausgabedatei
+FORMAT_BY_EXTENSION = {".txt": "txt", ".hocr": "hocr", ".html": "hocr", ".xml": "alto", ".pdf": "pdf"}
+COMPRESSIONS = ("auto", "jpeg", "lossless")
+
+# Kodiertes Seitenbild als Bild-XObject: filter ist "DCTDecode" (JPEG) oder "FlateDecode"
+PdfImage = namedtuple("PdfImage", "width height colorspace bits filter data")
+
+
+def format_page(result):
+    return f"--- Seite {result['page']} ---\n{result['text']}\n\n"
+
+
+# --- Seitenbilder ---------------------------------------------------------------
+
+def is_bilevel(image):
+    """
+    True für reine Schwarzweißbilder (Modus "1" oder Graustufen nur aus 0 und 255).
+    """
+    if image.mode == "1":
+        return True
+    if image.mode != "L":
+        return False
+    histogram = image.histogram()
+    return not any(histogram[1:255])
+
+
+def jpeg_source(path):
+    """
+    Die Datei unverändert als PdfImage, falls sie ein JPEG in Graustufen oder RGB ist, sonst None.
+    """
+    with Image.open(path) as image:
+        if image.format != "JPEG" or image.mode not in ("L", "RGB"):
+            return None
+        width, height = image.size
+        mode = image.mode
+    with open(path, "rb") as f:
+        data = f.read()
+    return PdfImage(width, height, "DeviceGray" if mode == "L" else "DeviceRGB", 8, "DCTDecode", data)
+
+
+def _flate_image(image):
+    if image.mode not in ("1", "L", "RGB"):
+        image = image.convert("RGB")
+    # Modus "1" liegt zeilenweise auf ganze Bytes aufgefüllt vor, 1 = weiß wie in DeviceGray
+    bits = 1 if image.mode == "1" else 8
+    colorspace = "DeviceRGB" if image.mode == "RGB" else "DeviceGray"
+    return PdfImage(image.width, image.height, colorspace, bits, "FlateDecode", zlib.compress(image.tobytes(), 6))
+
+
+def _jpeg_image(image, quality):
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("L" if image.mode == "1" else "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    colorspace = "DeviceGray" if image.mode == "L" else "DeviceRGB"
+    return PdfImage(image.width, image.height, colorspace, 8, "DCTDecode", buffer.getvalue())
+
+
+@dataclass(frozen=True)
+class ImageOptions:
+    """
+    Wie Seitenbilder ins durchsuchbare PDF kommen.
+
+    compression:
+        "auto"      JPEG-Dateien unverändert übernehmen, Schwarzweißseiten verlustfrei mit
+                    1 Bit pro Pixel, alle anderen als JPEG mit quality
+        "jpeg"      alle Seiten als JPEG mit quality neu kodieren
+        "lossless"  alle Seiten verlustfrei (Flate), Schwarzweißseiten mit 1 Bit pro Pixel
+    max_dpi: Seiten mit höherer Auflösung werden darauf verkleinert (0 = Quellauflösung).
+    """
+    compression: str = "auto"
+    quality: int = 75
+    max_dpi: int = 0
+
+    def __post_init__(self):
+        if self.compression not in COMPRESSIONS:
+            raise ValueError(f"Unbekannte Kompression: {self.compression} (erlaubt: {', '.join(COMPRESSIONS)})")
+
+    def encode(self, image, dpi=(DEFAULT_DPI, DEFAULT_DPI), source=None):
+        """
+        Kodiert das Seitenbild als PdfImage. source ist der Pfad der Bilddatei, aus der
+        image unverändert geladen wurde; ein JPEG wird dann ohne Neukodierung übernommen.
+        """
+        bilevel = is_bilevel(image)
+        scale = min(1.0, self.max_dpi / max(dpi)) if self.max_dpi else 1.0
+        if scale < 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            if bilevel:
+                image = image.convert("L")
+            image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+            if bilevel:
+                image = image.point(lambda value: 255 if value >= 128 else 0)
+        elif self.compression == "auto" and source is not None:
+            embedded = jpeg_source(source)
+            if embedded is not None and (embedded.width, embedded.height) == image.size:
+                return embedded
+        if bilevel and self.compression != "jpeg":
+            return _flate_image(image.convert("1", dither=Image.Dither.NONE))
+        if self.compression == "lossless":
+            return _flate_image(image)
+        return _jpeg_image(image, self.quality)
+
+
+# --- Seitenaufbau ---------------------------------------------------------------
+
+def _runs(keys):
+    """
+    (Anfang, Ende) der Abschnitte aufeinanderfolgender gleicher Zeilen von keys.
+    """
+    if not len(keys):
+        return []
+    bounds = [0] + (np.flatnonzero((keys[1:] != keys[:-1]).any(axis=1)) + 1).tolist() + [len(keys)]
+    return list(zip(bounds, bounds[1:]))
+
+
+def page_layout(words):
+    """
+    Gliedert die Wörter einer Seite nach Block, Absatz und Zeile:
+    [(Anfang, Ende, [(Anfang, Ende, [(Anfang, Ende), ...]), ...]), ...] als Indizes in words.
+    """
+    table = words.table
+    keys = np.stack([table["block"], table["par"], table["line"]], axis=1)
+    blocks = []
+    for block_start, block_end in _runs(keys[:, :1]):
+        paragraphs = []
+        for start, end in _runs(keys[block_start:block_end, :2]):
+            start, end = block_start + start, block_start + end
+            lines = [(start + line_start, start + line_end) for line_start, line_end in _runs(keys[start:end])]
+            paragraphs.append((start, end, lines))
+        blocks.append((block_start, block_end, paragraphs))
+    return blocks
+
+
+class _Boxes:
+    """
+    Boxen (x0, y0, x1, y1) der Wörter einer Seite und ihrer Vereinigungen.
+    """
+
+    def __init__(self, words):
+        table = words.table
+        self.x0 = table["left"].astype(np.int64)
+        self.y0 = table["top"].astype(np.int64)
+        self.x1 = self.x0 + table["width"]
+        self.y1 = self.y0 + table["height"]
+
+    def __call__(self, start, end):
+        return (int(self.x0[start:end].min()), int(self.y0[start:end].min()),
+                int(self.x1[start:end].max()), int(self.y1[start:end].max()))
+
+
+def _page_fields(result):
+    words = as_words(result.get('words', []), result.get('page', 1))
+    size = tuple(int(value) for value in result['size'])
+    dpi = tuple(float(value) for value in result.get('dpi') or (DEFAULT_DPI, DEFAULT_DPI))
+    return words, size, dpi
+
+
+class TextWriter:
+    """
+    Reiner Text je Seite (format_page) und gemeinsamer Rahmen der Textformate: Kopf beim
+    Öffnen, Seiten fortlaufend, Fuß beim Schließen. hOCR und ALTO überschreiben header,
+    page und footer.
+    """
+
+    def __init__(self, path, **options):
+        self.path = path
+        self.pages = 0
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write(self.header(**options))
+
+    def header(self, **options):
+        return ""
+
+    def footer(self):
+        return ""
+
+    def page(self, result):
+        return format_page(result)
+
+    def add_page(self, result):
+        self.pages += 1
+        self._file.write(self.page(result))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.write(self.footer())
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HocrWriter(TextWriter):
+    """
+    hOCR 1.2: je Seite ein ocr_page mit ocr_carea (Block), ocr_par, ocr_line und ocrx_word.
+    """
+
+    def header(self, lang="deu", title=""):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+            '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xml:lang={quoteattr(lang)} lang={quoteattr(lang)}>\n'
+            f' <head>\n  <title>{escape(title)}</title>\n'
+            '  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+            f'  <meta name="ocr-system" content={quoteattr(SOFTWARE)}/>\n'
+            '  <meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par ocr_line ocrx_word ocrp_wconf"/>\n'
+            ' </head>\n <body>\n'
+        )
+
+    def footer(self):
+        return " </body>\n</html>\n"
+
+    def page(self, result):
+        words, (width, height), dpi = _page_fields(result)
+        number = result.get('page', self.pages)
+        texts = words.texts()
+        confs = words.table["conf"].tolist()
+        box = _Boxes(words)
+        parts = [f'  <div class="ocr_page" id="page_{number}" title="bbox 0 0 {width} {height}; '
+                 f'ppageno {number - 1}; scan_res {round(dpi[0])} {round(dpi[1])}">\n']
+        ids = {"block": 0, "par": 0, "line": 0}
+        for block_start, block_end, paragraphs in page_layout(words):
+            ids["block"] += 1
+            parts.append(f'   <div class="ocr_carea" id="block_{number}_{ids["block"]}" '
+                         f'title="bbox {" ".join(map(str, box(block_start, block_end)))}">\n')
+            for par_start, par_end, lines in paragraphs:
+                ids["par"] += 1
+                parts.append(f'    <p class="ocr_par" id="par_{number}_{ids["par"]}" '
+                             f'title="bbox {" ".join(map(str, box(par_start, par_end)))}">\n')
+                for line_start, line_end in lines:
+                    ids["line"] += 1
+                    parts.append(f'     <span class="ocr_line" id="line_{number}_{ids["line"]}" '
+                                 f'title="bbox {" ".join(map(str, box(line_start, line_end)))}">')
+                    for i in range(line_start, line_end):
+                        conf = f"; x_wconf {round(confs[i])}" if confs[i] >= 0 else ""
+                        parts.append(f'<span class="ocrx_word" id="word_{number}_{i + 1}" '
+                                     f'title="bbox {" ".join(map(str, box(i, i + 1)))}{conf}">{escape(texts[i])}</span>'
+                                     + (" " if i < line_end - 1 else ""))
+                    parts.append("</span>\n")
+                parts.append("    </p>\n")
+            parts.append("   </div>\n")
+        parts.append("  </div>\n")
+        return "".join(parts)
+
+
+class AltoWriter(TextWriter):
+    """
+    ALTO 4 in Pixeln: je Seite ein Page mit PrintSpace, TextBlock (Absatz), TextLine und String.
+    """
+
+    def header(self, lang="deu", title=""):
+        self.lang = lang
+        source = f"   <sourceImageInformation><fileName>{escape(title)}</fileName></sourceImageInformation>\n" \
+            if title else ""
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://www.loc.gov/standards/alto/ns-v4# '
+            'http://www.loc.gov/alto/v4/alto-4-2.xsd">\n'
+            ' <Description>\n  <MeasurementUnit>pixel</MeasurementUnit>\n' + source +
+            '  <OCRProcessing ID="OCR_0">\n   <ocrProcessingStep>\n    <processingSoftware>\n'
+            f'     <softwareName>{escape(SOFTWARE)}</softwareName>\n'
+            '    </processingSoftware>\n   </ocrProcessingStep>\n  </OCRProcessing>\n'
+            ' </Description>\n <Layout>\n'
+        )
+
+    def footer(self):
+        return " </Layout>\n</alto>\n"
+
+    def page(self, result):
+        words, (width, height), _ = _page_fields(result)
+        number = result.get('page', self.pages)
+        texts = words.texts()
+        confs = words.table["conf"].tolist()
+        box = _Boxes(words)
+
+        def position(start, end):
+            x0, y0, x1, y1 = box(start, end)
+            return f'HPOS="{x0}" VPOS="{y0}" WIDTH="{x1 - x0}" HEIGHT="{y1 - y0}"'
+
+        parts = [f'  <Page ID="page_{number}" PHYSICAL_IMG_NR="{number}" WIDTH="{width}" HEIGHT="{height}">\n',
+                 f'   <PrintSpace HPOS="0" VPOS="0" WIDTH="{width}" HEIGHT="{height}">\n']
+        blocks = lines_count = 0
+        for _, _, paragraphs in page_layout(words):
+            for par_start, par_end, lines in paragraphs:
+                blocks += 1
+                parts.append(f'    <TextBlock ID="block_{number}_{blocks}" {position(par_start, par_end)} '
+                             f'LANG={quoteattr(self.lang)}>\n')
+                for line_start, line_end in lines:
+                    lines_count += 1
+                    parts.append(f'     <TextLine ID="line_{number}_{lines_count}" {position(line_start, line_end)}>\n')
+                    for i in range(line_start, line_end):
+                        conf = f' WC="{min(1.0, confs[i] / 100):.2f}"' if confs[i] >= 0 else ""
+                        parts.append(f'      <String ID="string_{number}_{i + 1}" {position(i, i + 1)}{conf} '
+                                     f'CONTENT={quoteattr(texts[i])}/>\n')
+                        if i < line_end - 1:
+                            gap = max(0, int(box.x0[i + 1] - box.x1[i]))
+                            parts.append(f'      <SP WIDTH="{gap}" HPOS="{int(box.x1[i])}" VPOS="{int(box.y0[i])}"/>\n')
+                    parts.append("     </TextLine>\n")
+                parts.append("    </TextBlock>\n")
+        parts.append("   </PrintSpace>\n  </Page>\n")
+        return "".join(parts)
+
+
+# --- Durchsuchbares PDF -----------------------------------------------------------
+
+# Objektnummern, die beim Öffnen feststehen; die Seitenobjekte folgen dahinter
+_CATALOG, _PAGES, _FONT, _CID_FONT, _DESCRIPTOR, _TO_UNICODE, _FIRST_FREE = range(1, 8)
+# Breite jedes Zeichens der unsichtbaren Schrift in 1/1000 der Schriftgröße
+_GLYPH_WIDTH = 500
+# Lage der Grundlinie über der Unterkante der Zeilenbox, in Schriftgrößen
+_DESCENT = 0.2
+
+
+def _to_unicode_cmap():
+    # CID = Unicode-Codepunkt; bfrange darf nur das letzte Byte durchlaufen
+    ranges = [f"<{high:02X}00> <{high:02X}FF> <{high:02X}00>" for high in range(256) if not 0xD8 <= high <= 0xDF]
+    chunks = ["%d beginbfrange\n%s\nendbfrange" % (len(ranges[i:i + 100]), "\n".join(ranges[i:i + 100]))
+              for i in range(0, len(ranges), 100)]
+    return ("/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+            "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n" + "\n".join(chunks) +
+            "\nendcmap\nCMapName currentdict /CMap defineresource pop\nend\nend\n").encode("ascii")
+
+
+def _pdf_string(text):
+    """
+    Text als Hex-String in der Kodierung Identity-H (zwei Bytes pro Zeichen, CID = Codepunkt).
+    """
+    if text and max(text) > "\uffff":
+        text = "".join(char if char <= "\uffff" else "\ufffd" for char in text)
+    return b"<" + text.encode("utf-16-be").hex().encode("ascii") + b">"
+
+
+def _info_string(text):
+    # Textstrings im Infoverzeichnis: UTF-16BE mit Byte-Order-Mark
+    return b"<feff" + text.encode("utf-16-be").hex().encode("ascii") + b">"
+
+
+def text_layer(words, size, page_size):
+    """
+    Inhaltsoperatoren für den unsichtbaren Text einer Seite. Jede Zeile erhält die Höhe ihrer
+    Box als Schriftgröße; jedes Wort wird über die horizontale Skalierung auf seine Boxbreite
+    gestreckt, damit Markierungen im Viewer auf dem Bild liegen.
+    """
+    if not len(words):
+        return b""
+    scale_x, scale_y = page_size[0] / size[0], page_size[1] / size[1]
+    texts = words.texts()
+    box = _Boxes(words)
+    ops = [b"BT 3 Tr"]
+    for _, _, paragraphs in page_layout(words):
+        for _, _, lines in paragraphs:
+            for line_start, line_end in lines:
+                _, top, _, bottom = box(line_start, line_end)
+                font_size = max(1.0, (bottom - top) * scale_y)
+                baseline = page_size[1] - bottom * scale_y + _DESCENT * font_size
+                ops.append(b"/F1 %.2f Tf" % font_size)
+                for i in range(line_start, line_end):
+                    text = texts[i]
+                    if not text:
+                        continue
+                    width = (box.x1[i] - box.x0[i]) * scale_x
+                    stretch = 100.0 * width / (len(text) * _GLYPH_WIDTH / 1000 * font_size)
+                    ops.append(b"%.2f Tz 1 0 0 1 %.2f %.2f Tm %s Tj" % (stretch, box.x0[i] * scale_x, baseline,
+                                                                      _pdf_string(text)))
+                    if i < line_end - 1:
+                        # Leerzeichen, damit Textextraktion die Wörter trennt
+                        ops.append(b"<0020> Tj")
+    ops.append(b"ET")
+    return b"\n".join(ops)
+
+
+class PdfWriter:
+    """
+    Schreibt ein durchsuchbares PDF Seite für Seite. Bild, Inhalt und Seitenobjekt einer Seite
+    stehen nach add_page bereits in der Datei; erst close schreibt Seitenbaum und
+    Querverweistabelle. image_options gilt für Seiten, deren 'image' ein PIL-Image ist.
+    """
+
+    def __init__(self, path, lang="deu", title="", image_options=None):
+        self.path = path
+        self.title = title
+        self.image_options = image_options or ImageOptions()
+        self.pages = 0
+        self._page_objects = []
+        self._offsets = {}
+        self._next_object = _FIRST_FREE
+        self._file = open(path, "wb")
+        self._file.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+        self._write_font()
+
+    def _reserve(self):
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def _object(self, number, body, stream=None):
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number)
+        if stream is None:
+            self._file.write(body + b"\nendobj\n")
+        else:
+            self._file.write(body[:-2].rstrip() + b" /Length %d >>\nstream\n" % len(stream))
+            self._file.write(stream)
+            self._file.write(b"\nendstream\nendobj\n")
+
+    def _write_font(self):
+        self._object(_FONT, b"<< /Type /Font /Subtype /Type0 /BaseFont /GlyphLessFont /Encoding /Identity-H "
+                            b"/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (_CID_FONT, _TO_UNICODE))
+        self._object(_CID_FONT, b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /GlyphLessFont "
+                                b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                                b"/FontDescriptor %d 0 R /DW %d /CIDToGIDMap /Identity >>" % (_DESCRIPTOR, _GLYPH_WIDTH))
+        self._object(_DESCRIPTOR, b"<< /Type /FontDescriptor /FontName /GlyphLessFont /Flags 5 "
+                                  b"/FontBBox [0 %d %d %d] /ItalicAngle 0 /Ascent %d /Descent %d /CapHeight %d "
+                                  b"/StemV 80 >>" % (-1000 * _DESCENT, _GLYPH_WIDTH, 1000 * (1 - _DESCENT),
+                                                     1000 * (1 - _DESCENT), -1000 * _DESCENT, 1000 * (1 - _DESCENT)))
+        cmap = zlib.compress(_to_unicode_cmap())
+        self._object(_TO_UNICODE, b"<< /Filter /FlateDecode >>", cmap)
+
+    def add_page(self, result):
+        words, size, dpi = _page_fields(result)
+        image = result.get('image')
+        if image is None:
+            raise ValueError(f"Seite {result.get('page', self.pages + 1)}: kein Seitenbild für das PDF")
+        if not isinstance(image, PdfImage):
+            image = self.image_options.encode(image, dpi)
+        page_size = (size[0] * 72.0 / dpi[0], size[1] * 72.0 / dpi[1])
+        image_object, content_object, page_object = self._reserve(), self._reserve(), self._reserve()
+
+        self._object(image_object, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /%s "
+                                   b"/BitsPerComponent %d /Filter /%s >>"
+                     % (image.width, image.height, image.colorspace.encode("ascii"), image.bits,
+                        image.filter.encode("ascii")), image.data)
+        content = b"q %.3f 0 0 %.3f 0 0 cm /Im1 Do Q\n" % page_size + text_layer(words, size, page_size)
+        self._object(content_object, b"<< /Filter /FlateDecode >>", zlib.compress(content, 6))
+        self._object(page_object, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.3f %.3f] "
+                                  b"/Resources << /Font << /F1 %d 0 R >> /XObject << /Im1 %d 0 R >> >> "
+                                  b"/Contents %d 0 R >>"
+                     % (_PAGES, page_size[0], page_size[1], _FONT, image_object, content_object))
+        self._page_objects.append(page_object)
+        self.pages += 1
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        kids = b" ".join(b"%d 0 R" % number for number in self._page_objects)
+        self._object(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_objects)))
+        self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+        info = self._reserve()
+        self._object(info, b"<< /Title %s /Producer %s >>" % (_info_string(self.title), _info_string(SOFTWARE)))
+        xref = self._file.tell()
+        entries = [b"0000000000 65535 f \n"]
+        for number in range(1, self._next_object):
+            offset = self._offsets.get(number)
+            entries.append(b"%010d 00000 n \n" % offset if offset is not None else b"0000000000 65535 f \n")
+        self._file.write(b"xref\n0 %d\n" % self._next_object + b"".join(entries))
+        self._file.write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                         % (self._next_object, _CATALOG, info, xref))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+WRITERS = {"txt": TextWriter, "hocr": HocrWriter, "alto": AltoWriter, "pdf": PdfWriter}
+
+
+def parse_formats(value):
+    """
+    "txt,pdf" -> ("txt", "pdf"); unbekannte Formate ergeben ValueError.
+    """
+    formats = tuple(dict.fromkeys(part.strip().lower() for part in value.split(",") if part.strip()))
+    unknown = [name for name in formats if name not in EXPORT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unbekanntes Exportformat: {', '.join(unknown) or value} "
+                         f"(erlaubt: {', '.join(EXPORT_FORMATS)})")
+    return formats
+
+
+def open_writer(format_name, path, lang="deu", title="", image_options=None):
+    if format_name == "pdf":
+        return PdfWriter(path, lang=lang, title=title, image_options=image_options)
+    return WRITERS[format_name](path, lang=lang, title=title)
+
+
+def export_results(results, writers):
+    """
+    Reicht die Seiten eines Ergebnis-Iterators nacheinander an alle Writer weiter und
+    schließt sie am Ende. Gibt die Anzahl der Seiten zurück.
+    """
+    count = 0
+    try:
+        for result in results:
+            for writer in writers:
+                writer.add_page(result)
+            count += 1
+    finally:
+        for writer in writers:
+            writer.close()
+    return count
+
+
+# --- Zwischenablage einzelner Seiten ------------------------------------------------
+
+def save_page(path, result):
+    """
+    Speichert eine Seite (Wörter, Größe, Auflösung, kodiertes Bild) als .npz, damit außer der
+    Reihe fertige Seiten später in Reihenfolge exportiert werden können.
+    """
+    arrays = {'words_' + name: array for name, array in as_words(result['words']).to_arrays().items()}
+    meta = {key: result[key] for key in ('page', 'size', 'dpi') if key in result}
+    image = result.get('image')
+    if image is not None:
+        meta['image'] = image._replace(data=None)._asdict()
+        arrays['image'] = np.frombuffer(image.data, dtype=np.uint8)
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_page(path):
+    from modules.ocr_result import OcrWords
+    with np.load(path) as data:
+        result = json.loads(data['meta'].tobytes().decode("utf-8"))
+        result['words'] = OcrWords.from_arrays({name[6:]: data[name] for name in data.files if name.startswith("words_")})
+        if 'image' in result:
+            result['image'] = PdfImage(**dict(result['image'], data=data['image'].tobytes()))
+    return result
@@ -1,15 +1,116 @@
+import importlib
+import importlib.util
+from PIL import ImageDraw
+from modules.ocr_cache import get_ocr_cache, image_key, engine_params
+from modules.tesseract_pool import configure_engine_pool, get_engine_pool
+from modules.tracing import trace_span
+from modules.utils import get_font
+
+class OcrBackend:
+    """
+    Beschreibt ein OCR-Backend, ohne es zu importieren.
+
+    requirements nennt die benötigten Python-Module; ein Tupel steht für Alternativen,
+    von denen eines genügt. Die Verfügbarkeit wird über importlib.util.find_spec geprüft,
+    das nur sucht und nichts lädt. Das eigentliche Modul (und damit ein Modell) wird erst
+    beim ersten load() importiert.
+    """
+
+    def __init__(self, name, module, requirements, install_hint):
+        self.name = name
+        self.module = module
+        self.requirements = requirements
+        self.install_hint = install_hint
+
+    def missing(self):
+        missing = []
+        for requirement in self.requirements:
+            alternatives = requirement if isinstance(requirement, tuple) else (requirement,)
+            if not any(importlib.util.find_spec(module) for module in alternatives):
+                missing.append(" oder ".join(alternatives))
+        return missing
+
+    def is_available(self):
+        return not self.missing()
+
+    def load(self):
+        missing = self.missing()
+        if missing:
+            raise ImportError(f"Das OCR-Backend '{self.name}' ist nicht verfügbar, es fehlt: "
+                              f"{', '.join(missing)}. Installation: {self.install_hint}")
+        return importlib.import_module(self.module).perform_ocr
+
+
+OCR_BACKENDS = {backend.name: backend for backend in (
+    OcrBackend("tesseract_cpu", "modules.ocr_tesseract_cpu", [("tesserocr", "pytesseract")],
+               "pip install pytesseract (oder tesserocr) und Tesseract-OCR"),
+    OcrBackend("tesseract_gpu", "modules.ocr_tesseract_gpu", [("tesserocr", "pytesseract")],
+               "pip install pytesseract (oder tesserocr) und Tesseract-OCR"),
+    OcrBackend("paddleocr_cpu", "modules.ocr_paddleocr_cpu", ["numpy", "paddle", "paddleocr"],
+               "pip install paddlepaddle paddleocr"),
+    OcrBackend("paddleocr_gpu", "modules.ocr_paddleocr_gpu", ["numpy", "paddle", "paddleocr"],
+               "pip install paddlepaddle-gpu paddleocr"),
+)}
+
+def available_backends():
+    """
+    Namen der Backends, deren Abhängigkeiten installiert sind.
+    """
+    return [name for name, backend in OCR_BACKENDS.items() if backend.is_available()]
+
 def get_ocr_module(name="tesseract_cpu"):
-    if name == "tesseract_cpu":
-        from modules.ocr_tesseract_cpu import perform_ocr
-        return perform_ocr
-    elif name == "tesseract_gpu":
-        from modules.ocr_tesseract_gpu import perform_ocr
-        return perform_ocr
-    elif name == "paddleocr_cpu":
-        from modules.ocr_paddleocr_cpu import perform_ocr
-        return perform_ocr
-    elif name == "paddleocr_gpu":
-        from modules.ocr_paddleocr_gpu import perform_ocr
-        return perform_ocr
-    else:
+    """
+    Liefert die perform_ocr-Funktion des Backends. Fehlende Abhängigkeiten werden als
+    ImportError gemeldet, nicht nachinstalliert.
+    """
+    backend = OCR_BACKENDS.get(name)
+    if backend is None:
         raise ValueError(f"Unbekanntes OCR-Modul: {name}")
+    return backend.load()
+
+def get_ocr_engine(lang='deu'):
+    """
+    Kontextmanager, der eine bereits initialisierte Tesseract-Engine aus dem Pool des Prozesses
+    ausleiht (siehe tesseract_pool). Größe und Recycling lassen sich mit configure_engine_pool
+    oder den Umgebungsvariablen OCR_POOL_SIZE und OCR_ENGINE_MAX_PAGES einstellen.
+    """
+    return get_engine_pool().engine(lang)
+
+def draw_results(image, results):
+    """
+    Zeichnet Boxen und Nummern in image (für Exporte; die Anzeige nutzt modules.ocr_overlay).
+    """
+    draw = ImageDraw.Draw(image)
+    font = get_font(16)
+    for res in results:
+        if 'left' in res:
+            x, y = res['left'], res['top']
+            draw.rectangle([(x, y), (x + res['width'], y + res['height'])], outline="green", width=2)
+        else:
+            box = [tuple(point) for point in res['points']]
+            draw.line(box + [box[0]], fill="green", width=2)
+            x, y = box[0]
+        draw.text((x, y - 20), str(res['number']), fill="green", font=font)
+    return image
+
+def recognize_cached(image, backend="tesseract_cpu", lang='deu'):
+    """
+    Führt OCR mit dem Backend aus oder holt die Ergebnisse für identische Pixel aus dem OCR-Cache.
+    Gibt wie perform_ocr OcrWords zurück; das Bild wird weder kopiert noch bemalt. Im Cache
+    liegen die Ergebnisse spaltenweise (OcrWords.to_json).
+    """
+    # Erst hier: OcrWords braucht NumPy, das die Oberfläche beim Start nicht laden soll
+    from modules.ocr_result import as_words
+    with trace_span("ocr:" + backend, size=image.size, lang=lang) as span:
+        cache = get_ocr_cache()
+        if cache is None:
+            return as_words(get_ocr_module(backend)(image, lang=lang))
+        key = image_key(image, backend, lang, dict(engine_params(backend), result="boxes"))
+        results = cache.get(key)
+        span.set(cached=results is not None)
+        if results is not None:
+            # Ältere Einträge sind noch Listen von Dictionaries
+            return as_words(results)
+        results = as_words(get_ocr_module(backend)(image, lang=lang))
+        cache.put(key, results.to_json())
+        return results
@@ -1,15 +1,5 @@
 # ocr_manager.py
 
-try:
-	import pytesseract
-except ModuleNotFoundError:
-	import subprocess
-	import sys
-
-	# Versucht, pytesseract automatisch zu installieren
-	subprocess.check_call([sys.executable, "-m", "pip", "install", "pytesseract"])
-	import pytesseract
-
 from PIL import Image
 
 
@@ -19,6 +9,7 @@ def set_tesseract_cmd(cmd_path):
 
 	:param cmd_path: Vollständiger Pfad zur tesseract.exe (z. B. unter Windows)
 	"""
+	import pytesseract
 	pytesseract.pytesseract.tesseract_cmd = cmd_path
 
 
@@ -31,6 +22,7 @@ def perform_ocr(image, lang='deu'):
 	:return: Erkannten Text als String.
 	:raises Exception: Bei Fehlern während der OCR-Verarbeitung.
 	"""
+	import pytesseract
 	try:
 		text = pytesseract.image_to_string(image, lang=lang)
 		return text
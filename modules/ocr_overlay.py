@@ -0,0 +1,118 @@
+import statistics
+from modules.viewport import get_viewport
+
+# Nummern erscheinen erst ab dieser Boxhöhe in Bildschirmpixeln, sonst verdecken sie die Boxen
+LABEL_MIN_HEIGHT = 12
+LABEL_FONT = ("Arial", 8)
+COLOR = "green"
+
+
+class OcrOverlay:
+    """
+    Zeigt OCR-Ergebnisse (Boxen in Seitenkoordinaten) als Vektorobjekte über dem Bild im
+    Canvas, statt sie in eine Kopie des Bildes zu malen.
+
+    Die Objekte entstehen einmal für die aktuelle Ansicht des Viewports. Ändern sich Zoom
+    oder Verschiebung, werden alle gemeinsam mit je einem canvas.scale und canvas.move
+    nachgeführt; die Kosten hängen damit nicht von der Anzahl der Boxen ab. Die Nummern
+    werden bei kleinen Zoomstufen ausgeblendet.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.viewport = get_viewport(canvas)
+        self.results = []
+        self.visible = True
+        self.box_height = 0
+        # (zoom, offset) der Ansicht, für die die Objekte zuletzt platziert wurden
+        self.view = None
+        self.viewport.listeners.append(self.follow_view)
+
+    def show(self, results):
+        self.results = list(results)
+        heights = [bottom - top for _, top, _, bottom in map(_box, self.results)]
+        self.box_height = statistics.median(heights) if heights else 0
+        self.redraw()
+
+    def clear(self):
+        self.results = []
+        self.view = None
+        self.canvas.delete("ocr")
+
+    def set_visible(self, visible):
+        self.visible = visible
+        self.canvas.itemconfigure("ocr_box", state="normal" if visible else "hidden")
+        self.update_labels()
+
+    def redraw(self):
+        self.canvas.delete("ocr")
+        self.view = None
+        if not self.results or self.viewport.page_size is None:
+            return
+        state = "normal" if self.visible else "hidden"
+        to_canvas = self.viewport.page_to_canvas
+        for res in self.results:
+            if 'left' in res:
+                x0, y0 = to_canvas(res['left'], res['top'])
+                x1, y1 = to_canvas(res['left'] + res['width'], res['top'] + res['height'])
+                self.canvas.create_rectangle(x0, y0, x1, y1, outline=COLOR, tags=("ocr", "ocr_box"), state=state)
+            else:
+                coords = [value for point in res['points'] for value in to_canvas(*point)]
+                x0, y0 = coords[0], coords[1]
+                self.canvas.create_polygon(*coords, outline=COLOR, fill="", tags=("ocr", "ocr_box"), state=state)
+            self.canvas.create_text(x0, y0, text=str(res['number']), anchor="sw", fill=COLOR, font=LABEL_FONT,
+                                    tags=("ocr", "ocr_label"))
+        self.view = (self.viewport.zoom, self.viewport.offset)
+        self.update_labels()
+
+    def follow_view(self):
+        if self.view is None:
+            if self.results:
+                self.redraw()
+            return
+        zoom, offset = self.viewport.zoom, self.viewport.offset
+        old_zoom, old_offset = self.view
+        if (zoom, offset) == self.view:
+            return
+        # Canvas-Punkt = (Seitenpunkt - offset) * zoom; erst skalieren, dann verschieben
+        ratio = zoom / old_zoom
+        if ratio != 1.0:
+            self.canvas.scale("ocr", 0, 0, ratio, ratio)
+        self.canvas.move("ocr", (old_offset[0] - offset[0]) * zoom, (old_offset[1] - offset[1]) * zoom)
+        self.view = (zoom, offset)
+        self.update_labels()
+
+    def update_labels(self):
+        show = self.visible and self.box_height * self.viewport.zoom >= LABEL_MIN_HEIGHT
+        self.canvas.itemconfigure("ocr_label", state="normal" if show else "hidden")
+
+
+def _box(res):
+    if 'left' in res:
+        return res['left'], res['top'], res['left'] + res['width'], res['top'] + res['height']
+    xs = [point[0] for point in res['points']]
+    ys = [point[1] for point in res['points']]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def get_overlay(canvas):
+    overlay = getattr(canvas, "ocr_overlay", None)
+    if overlay is None:
+        overlay = canvas.ocr_overlay = OcrOverlay(canvas)
+    return overlay
+
+
+def show_ocr_overlay_op(app_instance, results):
+    """
+    Zeigt die Ergebnisse über dem rechten Bild und schaltet die Anzeige der Boxen ein.
+    """
+    app_instance.ocr_overlay_var.set(True)
+    overlay = get_overlay(app_instance.right_canvas)
+    overlay.set_visible(True)
+    overlay.show(results)
+
+def toggle_ocr_overlay_op(app_instance):
+    get_overlay(app_instance.right_canvas).set_visible(app_instance.ocr_overlay_var.get())
+
+def clear_ocr_overlay_op(app_instance):
+    get_overlay(app_instance.right_canvas).clear()
@@ -0,0 +1,33 @@
+import threading
+
+# Tesseract-Sprachcodes auf die Kürzel von PaddleOCR abbilden
+PADDLE_LANGS = {'deu': "de", 'eng': "en", 'fra': "fr", 'spa': "es", 'ita': "it"}
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(lang='deu', use_gpu=False):
+    """
+    Liefert das PaddleOCR-Modell für Sprache und Gerät. Es wird beim ersten Aufruf im
+    Prozess gebaut und danach wiederverwendet.
+    """
+    key = (PADDLE_LANGS.get(lang, lang), use_gpu)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            from paddleocr import PaddleOCR
+            model = PaddleOCR(use_angle_cls=True, lang=key[0], use_gpu=use_gpu)
+            _models[key] = model
+        return model
+
+def perform_ocr(image, lang='deu', use_gpu=False):
+    """
+    Erkennt die Textzeilen auf image als OcrWords; jede Zeile hat 'number', 'text', 'conf'
+    und ihr Viereck 'points'.
+    """
+    import numpy as np
+    from modules.ocr_result import OcrWords
+    image_np = np.array(image.convert("RGB"))
+    result = get_model(lang, use_gpu).ocr(image_np, cls=True)
+    return OcrWords.from_records([{'text': line[1][0], 'conf': 100.0 * line[1][1], 'points': line[0]}
+                                  for line in result])
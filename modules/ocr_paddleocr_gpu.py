@@ -1,39 +1,6 @@
-import subprocess, sys
-
-try:
-    from paddleocr import PaddleOCR, draw_ocr
-except ModuleNotFoundError as e:
-    if "paddle" in str(e).lower():
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "paddlepaddle-gpu"])
-    else:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "paddleocr"])
-    from paddleocr import PaddleOCR, draw_ocr
-
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
-
-ocr_model = PaddleOCR(use_angle_cls=True, lang="de", use_gpu=True)
+# modules/ocr_paddleocr_gpu.py
+# Das Modell wird erst bei der ersten Erkennung gebaut (siehe ocr_paddleocr_common).
+from modules.ocr_paddleocr_common import perform_ocr as _perform_ocr
 
 def perform_ocr(image, lang='deu'):
-    image_np = np.array(image.convert("RGB"))
-    result = ocr_model.ocr(image_np, cls=True)
-    draw = ImageDraw.Draw(image)
-    results = []
-    try:
-        font = ImageFont.truetype("arial.ttf", 16)
-    except:
-        font = None
-    num = 1
-    for line in result:
-        box = line[0]
-        text = line[1][0]
-        draw.line(box + [box[0]], fill="green", width=2)
-        x, y = box[0]
-        draw.text((x, y - 20), str(num), fill="green", font=font)
-        results.append({
-            'number': num,
-            'text': text,
-            'points': box
-        })
-        num += 1
-    return image, results
+    return _perform_ocr(image, lang, use_gpu=True)
@@ -0,0 +1,294 @@
+"""
+Spaltenweise Darstellung von OCR-Ergebnissen.
+
+Statt eines Dictionaries pro Wort hält OcrWords alle Wörter einer oder mehrerer Seiten in
+wenigen Arrays: eine Tabelle fester Breite (WORD_DTYPE) mit Seite, Ebene, Block-, Absatz-,
+Zeilen- und Wortnummer, Box und Konfidenz, dazu ein einziger UTF-8-Puffer mit allen Texten
+und ein Array der Anfangspositionen (wie eine Arrow-Stringspalte). Vierecke von Backends wie
+PaddleOCR stehen optional in points (n, 4, 2).
+
+Ausschnitte (words[a:b], words.page(n)) sind Sichten ohne Kopie auf dieselben Arrays.
+Die gewohnte Liste von Dictionaries bleibt als Sicht erhalten: Iteration und words[i] liefern
+Dictionaries mit 'number', 'text', 'left', 'top', 'width', 'height', 'conf' (bzw. 'points').
+"""
+import json
+
+import numpy as np
+
+WORD_DTYPE = np.dtype([
+    ("page", np.int32), ("level", np.int8), ("block", np.int16), ("par", np.int16), ("line", np.int16),
+    ("word", np.int16), ("left", np.int32), ("top", np.int32), ("width", np.int32), ("height", np.int32),
+    ("conf", np.float32),
+])
+# Ebene eines Wortes in der Ausgabe von Tesseract
+WORD_LEVEL = 5
+# Spalten der TSV-Ausgabe von Tesseract und ihr Feld in WORD_DTYPE
+_TSV_FIELDS = (("level", 0), ("page", 1), ("block", 2), ("par", 3), ("line", 4), ("word", 5),
+               ("left", 6), ("top", 7), ("width", 8), ("height", 9))
+
+
+class OcrWords:
+    """
+    Wörter einer oder mehrerer Seiten, nach Seite geordnet (siehe Modulbeschreibung).
+    offsets hat einen Eintrag mehr als Wörter und zeigt absolut in text_buffer, damit
+    Ausschnitte den Puffer teilen können.
+    """
+
+    __slots__ = ("table", "text_buffer", "offsets", "points")
+
+    def __init__(self, table=None, text_buffer=b"", offsets=None, points=None):
+        self.table = np.zeros(0, WORD_DTYPE) if table is None else table
+        self.text_buffer = text_buffer
+        self.offsets = np.zeros(1, np.int64) if offsets is None else offsets
+        self.points = points
+
+    # --- Erzeugen ---------------------------------------------------------------
+
+    @classmethod
+    def from_texts(cls, table, texts, points=None):
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        return cls(table, b"".join(encoded), offsets, points)
+
+    @classmethod
+    def from_tsv(cls, tsv, page=None):
+        """
+        Liest die TSV-Ausgabe von Tesseract (GetTSVText bzw. image_to_data als String) und
+        behält nur Wörter mit Text. page ersetzt die Seitennummer aus der TSV.
+        """
+        rows = [line.split("\t") for line in tsv.split("\n") if line and not line.startswith("level")]
+        rows = [row for row in rows if len(row) >= 12 and row[0] == "5" and row[11].strip()]
+        table = np.zeros(len(rows), WORD_DTYPE)
+        if rows:
+            columns = list(zip(*rows))
+            for name, index in _TSV_FIELDS:
+                table[name] = np.array(columns[index], dtype=np.int32)
+            table["conf"] = np.array(columns[10], dtype=np.float32)
+        if page is not None:
+            table["page"] = page
+        return cls.from_texts(table, [row[11].strip() for row in rows])
+
+    @classmethod
+    def from_data(cls, data, page=None):
+        """
+        Aus dem Dictionary von Listen, das pytesseract.image_to_data mit Output.DICT liefert.
+        """
+        texts = [str(text).strip() for text in data['text']]
+        keep = np.array([bool(text) for text in texts], dtype=bool)
+        table = np.zeros(int(keep.sum()), WORD_DTYPE)
+        names = {"page": "page_num", "block": "block_num", "par": "par_num", "line": "line_num", "word": "word_num"}
+        for name in ("level", "page", "block", "par", "line", "word", "left", "top", "width", "height", "conf"):
+            values = np.asarray(data[names.get(name, name)], dtype=WORD_DTYPE[name])
+            table[name] = values[keep]
+        if page is not None:
+            table["page"] = page
+        return cls.from_texts(table, [text for text in texts if text])
+
+    @classmethod
+    def from_records(cls, records, page=1):
+        """
+        Aus der bisherigen Liste von Dictionaries; Vierecke ('points') ergeben zusätzlich die umschließende Box.
+        """
+        table = np.zeros(len(records), WORD_DTYPE)
+        table["page"] = [record.get('page', page) for record in records]
+        table["level"] = WORD_LEVEL
+        table["word"] = np.arange(1, len(records) + 1)
+        table["conf"] = [record.get('conf', -1) for record in records]
+        points = None
+        if records and 'points' in records[0]:
+            # PaddleOCR liefert ganze Textzeilen: jede bildet eine eigene Zeile
+            table["line"] = table["word"]
+            points = np.array([record['points'] for record in records], dtype=np.float32).reshape(len(records), -1, 2)
+            low, high = points.min(axis=1), points.max(axis=1)
+            table["left"], table["top"] = low[:, 0], low[:, 1]
+            table["width"], table["height"] = high[:, 0] - low[:, 0], high[:, 1] - low[:, 1]
+        else:
+            for name in ("left", "top", "width", "height"):
+                table[name] = [record[name] for record in records]
+        return cls.from_texts(table, [record['text'] for record in records], points)
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        Hängt mehrere Ergebnisse (z. B. die Seiten eines Dokuments) aneinander.
+        """
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls()
+        buffers = [part.text_buffer[part.offsets[0]:part.offsets[-1]] for part in parts]
+        starts = np.cumsum([0] + [len(buffer) for buffer in buffers])
+        offsets = np.concatenate([part.offsets[:-1] - part.offsets[0] + start for part, start in zip(parts, starts)]
+                                 + [starts[-1:]])
+        points = None
+        if all(part.points is not None for part in parts):
+            points = np.concatenate([part.points for part in parts])
+        return cls(np.concatenate([part.table for part in parts]), b"".join(buffers), offsets, points)
+
+    # --- Zugriff ----------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("Nur zusammenhängende Ausschnitte")
+            stop = max(start, stop)
+            points = self.points[start:stop] if self.points is not None else None
+            return OcrWords(self.table[start:stop], self.text_buffer, self.offsets[start:stop + 1], points)
+        if index < 0:
+            index += len(self)
+        return self._record(index, index + 1, self.table[index], self.text(index))
+
+    def __iter__(self):
+        return iter(self.to_records())
+
+    def text(self, index):
+        return self.text_buffer[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def texts(self):
+        buffer = self.text_buffer
+        bounds = self.offsets.tolist()
+        return [buffer[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+    def page(self, number):
+        """
+        Wörter der Seite number als Sicht ohne Kopie.
+        """
+        pages = self.table["page"]
+        return self[int(np.searchsorted(pages, number, "left")):int(np.searchsorted(pages, number, "right"))]
+
+    def page_numbers(self):
+        return np.unique(self.table["page"]).tolist()
+
+    @property
+    def nbytes(self):
+        points = self.points.nbytes if self.points is not None else 0
+        return self.table.nbytes + self.offsets.nbytes + (self.offsets[-1] - self.offsets[0]) + points
+
+    def _record(self, index, number, row, text):
+        if self.points is not None:
+            return {'number': number, 'text': text, 'points': self.points[index].tolist(), 'conf': float(row['conf'])}
+        return {'number': number, 'text': text, 'left': int(row['left']), 'top': int(row['top']),
+                'width': int(row['width']), 'height': int(row['height']), 'conf': float(row['conf'])}
+
+    def to_records(self):
+        """
+        Die bisherige Liste von Dictionaries, nummeriert ab 1.
+        """
+        texts = self.texts()
+        confs = self.table["conf"].tolist()
+        if self.points is not None:
+            return [{'number': i + 1, 'text': text, 'points': points, 'conf': conf}
+                    for i, (text, points, conf) in enumerate(zip(texts, self.points.tolist(), confs))]
+        columns = zip(texts, self.table["left"].tolist(), self.table["top"].tolist(),
+                      self.table["width"].tolist(), self.table["height"].tolist(), confs)
+        return [{'number': i + 1, 'text': text, 'left': left, 'top': top, 'width': width, 'height': height,
+                 'conf': conf} for i, (text, left, top, width, height, conf) in enumerate(columns)]
+
+    def full_text(self):
+        """
+        Setzt den Text zeilenweise zusammen; zwischen Absätzen steht eine Leerzeile.
+        """
+        if not len(self):
+            return ""
+        keys = np.stack([self.table["page"], self.table["block"], self.table["par"], self.table["line"]], axis=1)
+        new_line = np.ones(len(self), dtype=bool)
+        new_line[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+        new_par = np.zeros(len(self), dtype=bool)
+        new_par[1:] = (keys[1:, :3] != keys[:-1, :3]).any(axis=1)
+        parts = []
+        for text, line, par in zip(self.texts(), new_line.tolist(), new_par.tolist()):
+            if par:
+                parts.append("\n\n")
+            elif line and parts:
+                parts.append("\n")
+            elif parts:
+                parts.append(" ")
+            parts.append(text)
+        return "".join(parts)
+
+    # --- Serialisierung -----------------------------------------------------------
+
+    def to_json(self):
+        """
+        JSON-taugliches Dictionary mit einer Liste pro Spalte (für den OCR-Cache und Protokolle).
+        """
+        data = {name: self.table[name].tolist() for name in WORD_DTYPE.names}
+        data['text'] = self.texts()
+        if self.points is not None:
+            data['points'] = self.points.tolist()
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        table = np.zeros(len(data['text']), WORD_DTYPE)
+        for name in WORD_DTYPE.names:
+            table[name] = data[name]
+        points = np.array(data['points'], dtype=np.float32).reshape(len(table), -1, 2) if 'points' in data else None
+        return cls.from_texts(table, data['text'], points)
+
+    def dumps(self):
+        return json.dumps(self.to_json(), ensure_ascii=False)
+
+    def to_arrays(self):
+        """
+        Die Arrays als Dictionary für np.savez; from_arrays setzt sie ohne Umwandlung wieder zusammen.
+        """
+        arrays = {'table': self.table, 'offsets': self.offsets - self.offsets[0],
+                  'text': np.frombuffer(self.text_buffer[self.offsets[0]:self.offsets[-1]], dtype=np.uint8)}
+        if self.points is not None:
+            arrays['points'] = self.points
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['table'], arrays['text'].tobytes(), arrays['offsets'], arrays.get('points'))
+
+    def save(self, path):
+        """
+        Speichert die Arrays unkomprimiert als .npz; load liest sie ohne Umwandlung zurück.
+        """
+        with open(path, "wb") as f:
+            np.savez(f, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_arrays({name: data[name] for name in data.files})
+
+    def to_arrow(self):
+        """
+        pyarrow.Table mit einer Spalte pro Feld; Zahlen und Texte werden ohne Kopie übernommen.
+        Benötigt pyarrow (pip install pyarrow).
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Für den Arrow-/Parquet-Export fehlt pyarrow (pip install pyarrow).")
+        table = np.ascontiguousarray(self.table)
+        columns = {name: pa.array(table[name]) for name in WORD_DTYPE.names}
+        offsets = self.offsets - self.offsets[0]
+        data = self.text_buffer[self.offsets[0]:self.offsets[-1]]
+        columns['text'] = pa.LargeStringArray.from_buffers(len(self), pa.py_buffer(offsets), pa.py_buffer(data))
+        return pa.table(columns)
+
+    def write_parquet(self, path):
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path)
+
+    def __repr__(self):
+        return f"OcrWords({len(self)} Wörter, {len(self.page_numbers())} Seiten)"
+
+
+def as_words(results, page=1):
+    """
+    Nimmt OcrWords oder eine Liste von Dictionaries (z. B. aus älteren Cache-Einträgen) entgegen.
+    """
+    if isinstance(results, OcrWords):
+        return results
+    if isinstance(results, dict):
+        return OcrWords.from_json(results)
+    return OcrWords.from_records(results, page)
@@ -1,30 +1,101 @@
+import os
 import tkinter as tk
-from tkinter import messagebox
-from PIL import ImageTk
-from modules.ocr_factory import get_ocr_module
+from tkinter import filedialog, messagebox, scrolledtext
+from modules.ocr_factory import recognize_cached
+from modules.ocr_overlay import show_ocr_overlay_op
+from modules.render_scheduler import RenderScheduler
+from modules.image_ops import current_spec, ensure_full_render_op
 
 def run_ocr_op(app_instance):
+    ensure_full_render_op(app_instance)
     if app_instance.processed_image is None:
         messagebox.showwarning("Kein Bild", "Bitte laden Sie ein Bild und wenden Sie Filter an, bevor OCR ausgeführt wird.")
         return
-    # Standard: tesseract_cpu
-    ocr_func = get_ocr_module("tesseract_cpu")
+    spec = current_spec(app_instance)
     try:
-        processed, results = ocr_func(app_instance.processed_image.copy(), lang='deu')
+        results = recognize_cached(app_instance.processed_image, spec.backend, lang=spec.lang)
     except Exception as e:
         messagebox.showerror("OCR Fehler", f"Bei der OCR ist ein Fehler aufgetreten: {str(e)}")
         return
+    show_ocr_overlay_op(app_instance, results)
+    show_ocr_window(app_instance, results)
+
+def show_ocr_window(app_instance, results, title="OCR Ergebnis"):
+    """
+    Listet die Ergebnisse mit ihren Nummern; die Boxen dazu zeigt das rechte Bild (siehe modules.ocr_overlay).
+    """
     ocr_window = tk.Toplevel(app_instance.root)
-    ocr_window.title("OCR Ergebnis")
-    tk_img = ImageTk.PhotoImage(processed)
-    img_label = tk.Label(ocr_window, image=tk_img)
-    img_label.image = tk_img
-    img_label.pack()
+    ocr_window.title(title)
     text_lines = []
     for res in results:
         if 'left' in res:
             text_lines.append(f"{res['number']}: {res['text']} (Position: {res['left']}, {res['top']})")
         else:
             text_lines.append(f"{res['number']}: {res['text']} (Box: {res['points']})")
-    text_label = tk.Label(ocr_window, text="\n".join(text_lines), justify="left")
-    text_label.pack()
+    text = scrolledtext.ScrolledText(ocr_window, wrap=tk.WORD, width=80, height=30)
+    text.pack(fill=tk.BOTH, expand=True)
+    text.insert(tk.END, "\n".join(text_lines))
+    text.config(state=tk.DISABLED)
+
+EXPORT_FILETYPES = [("Durchsuchbares PDF", "*.pdf"), ("hOCR", "*.hocr"), ("ALTO-XML", "*.xml"), ("Text", "*.txt")]
+
+def export_document_op(app_instance):
+    """
+    Erkennt alle Seiten des geladenen Dokuments mit Filterstapel, Backend und Sprache der
+    Oberfläche und schreibt sie als durchsuchbares PDF, hOCR, ALTO oder Text (nach Endung).
+    Die Seiten laufen einzeln im Hintergrund durch und werden sofort geschrieben; das PDF
+    enthält die ungefilterten Seitenbilder, bei einem drehenden Stapel (Deskew) die
+    gefilterten, damit die Textebene auf den sichtbaren Zeichen liegt.
+    """
+    from modules.documents import ImageDocument
+    from modules.ocr_export import FORMAT_BY_EXTENSION, ImageOptions, export_results, open_writer
+    from modules.pipeline import changes_geometry
+    document = app_instance.document
+    if document is None:
+        messagebox.showwarning("Kein Dokument", "Bitte laden Sie zuerst ein Bild oder PDF.")
+        return
+    output_path = filedialog.asksaveasfilename(
+        title="OCR-Ergebnis exportieren",
+        initialfile=os.path.splitext(app_instance.filename)[0] + "_ocr.pdf",
+        defaultextension=".pdf",
+        filetypes=EXPORT_FILETYPES
+    )
+    if not output_path:
+        return
+    format_name = FORMAT_BY_EXTENSION.get(os.path.splitext(output_path.lower())[1])
+    if format_name is None:
+        messagebox.showerror("Fehler", "Bitte als .pdf, .hocr, .xml oder .txt speichern.")
+        return
+    spec = current_spec(app_instance)
+    image_options = ImageOptions() if format_name == "pdf" else None
+    filtered_pages = changes_geometry(spec.active_layers)
+    # Nur ein einzelnes, ungefiltert eingebettetes Bild kann als Datei ins PDF übernommen werden
+    source = document.path if isinstance(document, ImageDocument) and not filtered_pages else None
+
+    def pages():
+        for index in range(document.page_count):
+            original = document.get_page(index)
+            image = spec.apply(original)
+            words = recognize_cached(image, spec.backend, lang=spec.lang)
+            result = {'page': index + 1, 'text': words.full_text(), 'words': words, 'size': image.size,
+                      'dpi': document.page_dpi(index)}
+            if image_options is not None:
+                embedded = image if filtered_pages else original
+                result['image'] = image_options.encode(embedded, result['dpi'], source=source)
+            yield result
+
+    def export():
+        # Läuft im Hintergrund-Thread; das Ergebnis holt der Tk-Thread über den Scheduler ab
+        writer = open_writer(format_name, output_path, lang=spec.lang, title=app_instance.filename)
+        return export_results(pages(), [writer]), output_path
+
+    if app_instance.export_scheduler is None:
+        app_instance.export_scheduler = RenderScheduler(
+            app_instance.root, lambda job: job(), lambda result: show_export_done(*result),
+            on_busy=lambda busy: app_instance.status_label.config(text="Exportiere Dokument ..." if busy else ""),
+            on_error=lambda error: messagebox.showerror("Fehler", f"Export fehlgeschlagen: {str(error)}")
+        )
+    app_instance.export_scheduler.request(export)
+
+def show_export_done(count, output_path):
+    messagebox.showinfo("Export abgeschlossen", f"{count} Seite(n) nach {output_path} geschrieben.")
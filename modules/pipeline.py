@@ -0,0 +1,160 @@
+from PIL import Image
+import numpy as np
+from modules.filters import (
+    GEOMETRY_FILTERS, POINT_LUTS, apply_lut, call_kernel, autocontrast_lut, channel_histograms,
+    histogram_mean, kontrast_lut, luminance_mean, to_array
+)
+from modules.pipeline_spec import LAYER_SLOTS, LayerSpec, PipelineSpec
+from modules.tracing import trace_span
+
+# Punktoperationen, deren LUT aus einer Statistik ihres Eingangsbildes entsteht.
+# Die Kanal-Histogramme für "Adaptive Threshold" lassen sich exakt durch die bisher
+# zusammengesetzte LUT schieben; den Luminanz-Mittelwert für "Kontrast" ermittelt PIL
+# direkt aus dem Stufeneingang und der bisherigen LUT.
+_STATISTIC_FILTERS = {"Kontrast", "Adaptive Threshold"}
+
+
+def _is_point_filter(filter_name):
+    return filter_name in POINT_LUTS or filter_name in _STATISTIC_FILTERS
+
+
+def compile_pipeline(layers):
+    """
+    Übersetzt eine Liste von (filter_name, strength) in Stufen. Benachbarte Punktoperationen
+    werden zu einer Stufe ("lut", [(filter_name, strength), ...]) zusammengefasst, alle
+    anderen Filter bilden eine eigene Stufe ("kernel", filter_name, strength) und wirken
+    als Barriere.
+    """
+    stages = []
+    run = []
+    for filter_name, strength in layers:
+        if _is_point_filter(filter_name):
+            run.append((filter_name, strength))
+        else:
+            if run:
+                stages.append(("lut", run))
+                run = []
+            stages.append(("kernel", filter_name, strength))
+    if run:
+        stages.append(("lut", run))
+    return stages
+
+
+def is_statistic_stage(stage):
+    """
+    True, wenn die LUT der Stufe von einer Statistik über das ganze Eingangsbild abhängt.
+    """
+    return stage[0] == "lut" and any(filter_name in _STATISTIC_FILTERS for filter_name, _ in stage[1])
+
+
+def build_stage_lut(arr, run, histograms=None, luminance_histogram=None):
+    """
+    Setzt die LUTs einer Stufe (inkl. ihrer Blend-Faktoren) zu einer LUT pro Kanal zusammen.
+    Bildstatistiken werden einmal vom Eingang der Stufe erhoben. Für die gekachelte
+    Verarbeitung können die Kanal-Histogramme und eine Funktion lut -> Luminanz-Histogramm
+    übergeben werden, die über alle Kacheln summieren; arr wird dann nicht gebraucht.
+    """
+    lut = np.tile(np.arange(256, dtype=np.uint8), (3, 1))
+    identity = True
+    for filter_name, strength in run:
+        if filter_name == "Kontrast":
+            current = None if identity else lut
+            if luminance_histogram is None:
+                mean = luminance_mean(arr, current)
+            else:
+                mean = histogram_mean(luminance_histogram(current))
+            step = kontrast_lut(strength, mean)
+        elif filter_name == "Adaptive Threshold":
+            if histograms is None:
+                histograms = channel_histograms(arr)
+            current = [np.bincount(lut[c], weights=histograms[c], minlength=256) for c in range(len(lut))]
+            step = autocontrast_lut(strength, current)
+        else:
+            step = POINT_LUTS[filter_name](strength)
+        if step.ndim == 1:
+            lut = step[lut]
+        else:
+            lut = np.stack([step[c][lut[c]] for c in range(len(lut))])
+        identity = False
+    if (lut == lut[0]).all():
+        return lut[0]
+    return lut
+
+
+def stage_size(stage):
+    """
+    Anzahl der Filterebenen, die eine Stufe abdeckt.
+    """
+    return len(stage[1]) if stage[0] == "lut" else 1
+
+
+def stage_label(stage):
+    """
+    Name einer Stufe für Messungen; verschmolzene Punktoperationen als "A+B".
+    """
+    if stage[0] == "lut":
+        return "+".join(filter_name for filter_name, _ in stage[1])
+    return stage[1]
+
+
+def run_stage(arr, stage, scale=1.0):
+    """
+    Führt eine einzelne Stufe aus; eine LUT-Stufe ist genau ein Durchlauf über das Bild.
+    Fehler werden an den Aufrufer weitergegeben, da die Stufen auch außerhalb des
+    Tk-Threads laufen. scale ist der Maßstab des Puffers relativ zum Originalbild.
+    """
+    with trace_span("stage:" + stage_label(stage), size=arr.shape[1::-1], scale=scale) as span:
+        if stage[0] == "lut":
+            arr = apply_lut(arr, build_stage_lut(arr, stage[1]))
+        else:
+            arr = call_kernel(arr, stage[1], stage[2], scale)
+        span.set(bytes=arr.nbytes)
+    return arr
+
+
+def run_pipeline(arr, stages, scale=1.0):
+    """
+    Führt kompilierte Stufen nacheinander auf einem uint8-Puffer aus.
+    """
+    for stage in stages:
+        arr = run_stage(arr, stage, scale)
+    return arr
+
+
+def apply_pipeline(img, layers, scale=1.0):
+    """
+    Wendet eine Liste von (filter_name, strength) mit verschmolzenen Punktoperationen an.
+    Sehr große Bilder werden gekachelt verarbeitet (siehe modules.tiled).
+    """
+    from modules.tiled import apply_pipeline_tiled, should_tile
+    if should_tile(img):
+        return apply_pipeline_tiled(img, layers, scale)
+    arr = run_pipeline(to_array(img), compile_pipeline(layers), scale)
+    return Image.fromarray(arr)
+
+
+def changes_geometry(layers):
+    """
+    True, wenn eine der Ebenen (filter_name, strength) das Bild dreht oder verschiebt
+    (GEOMETRY_FILTERS). Wortboxen der OCR gelten dann nur für das gefilterte Bild.
+    """
+    return any(filter_name in GEOMETRY_FILTERS and strength > 0 for filter_name, strength in layers)
+
+
+def layers_from_settings(settings):
+    """
+    Liefert die aktiven Ebenen eines settings.json-Inhalts als Liste von (filter_name, strength)
+    in Ebenen-Reihenfolge.
+    """
+    return list(PipelineSpec.from_settings(settings).active_layers)
+
+
+def settings_from_layers(layers, slots=LAYER_SLOTS):
+    """
+    Gegenstück zu layers_from_settings: legt die (filter_name, strength)-Paare in die ersten
+    Ebenen eines settings.json-Inhalts, die übrigen Ebenen bleiben deaktiviert.
+    """
+    settings = {"poppler_path": ""}
+    settings.update(PipelineSpec.from_layers(layers, slots=slots).to_settings())
+    settings["show_left_preview"] = True
+    return settings
@@ -0,0 +1,75 @@
+"""
+Beschreibung des Filterstapels ohne NumPy und Filter, damit die Oberfläche beim Start
+Einstellungen lesen kann, ohne die Bildverarbeitung zu laden (siehe modules.pipeline).
+"""
+from dataclasses import dataclass
+
+# Anzahl der Ebenen in der Oberfläche und in settings.json
+LAYER_SLOTS = 5
+
+
+@dataclass(frozen=True)
+class LayerSpec:
+    """
+    Eine Ebene des Filterstapels, wie sie in settings.json steht; auch deaktiviert behält sie
+    Filter und Stärke.
+    """
+    filter: str
+    strength: float = 1.0
+    enabled: bool = True
+
+
+@dataclass(frozen=True)
+class PipelineSpec:
+    """
+    Unveränderliche Beschreibung eines Filterstapels samt OCR-Backend und Sprache, ohne
+    Tk-Variablen. Lässt sich billig picklen und hashen und taugt damit als Cache-Schlüssel
+    und als Auftrag für Worker-Prozesse oder Hintergrund-Threads. from_settings und
+    to_settings übersetzen verlustfrei in den "layers"-Teil von settings.json.
+    """
+    layers: tuple = ()
+    backend: str = "tesseract_cpu"
+    lang: str = "deu"
+
+    @property
+    def active_layers(self):
+        """
+        (filter_name, strength)-Paare der aktivierten Ebenen; deaktivierte Ebenen verändern
+        das Bild nicht und gehören daher nicht in den Schlüssel einer Berechnung.
+        """
+        return tuple((layer.filter, layer.strength) for layer in self.layers if layer.enabled)
+
+    @classmethod
+    def from_layers(cls, layers, backend="tesseract_cpu", lang="deu", slots=LAYER_SLOTS):
+        """
+        Legt (filter_name, strength)-Paare in die ersten Ebenen; die übrigen bleiben deaktiviert.
+        """
+        specs = [LayerSpec(name, float(strength)) for name, strength in layers]
+        specs += [LayerSpec("Negativ", 1.0, False)] * max(0, slots - len(specs))
+        return cls(tuple(specs), backend, lang)
+
+    @classmethod
+    def from_settings(cls, settings):
+        layers = sorted(settings.get("layers", []), key=lambda setting: setting["layer"])
+        return cls(
+            tuple(LayerSpec(setting.get("filter", "Negativ"), float(setting.get("strength", 1.0)),
+                            bool(setting.get("enabled", False)))
+                  for setting in layers),
+            settings.get("ocr_backend", "tesseract_cpu"),
+            settings.get("ocr_lang", "deu"),
+        )
+
+    def to_settings(self):
+        """
+        Die Schlüssel "layers", "ocr_backend" und "ocr_lang" eines settings.json-Inhalts.
+        """
+        return {
+            "layers": [{"layer": index + 1, "enabled": layer.enabled, "filter": layer.filter, "strength": layer.strength}
+                       for index, layer in enumerate(self.layers)],
+            "ocr_backend": self.backend,
+            "ocr_lang": self.lang,
+        }
+
+    def apply(self, img, scale=1.0):
+        from modules.pipeline import apply_pipeline
+        return apply_pipeline(img, self.active_layers, scale)
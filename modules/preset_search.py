@@ -0,0 +1,208 @@
+"""
+Automatische Suche nach einem Filterstapel, mit dem Tesseract eine Dokumentklasse am besten liest.
+
+Beispiel:
+    python tune.py muster/*.png -o rechnungen.json --workers 8
+
+Bewertet wird jeder Kandidat über alle Musterbilder: liegt neben einem Bild eine Datei
+<Name>.gt.txt mit dem erwarteten Text, zählt die Wortgenauigkeit gegen diesen Text, sonst
+die mittlere Konfidenz der erkannten Wörter (conf aus image_to_data), gewichtet mit dem
+Anteil der Wörter, die auch ohne Filter gefunden werden.
+
+Gesucht wird Ebene für Ebene (Beam-Suche): jeder der besten Stapel wird um jeden Filter
+in jeder Stärke verlängert. Die Kandidaten werden zuerst auf verkleinerten Bildern
+bewertet, nur die besten werden in voller Auflösung nachgerechnet. Bringt eine weitere
+Ebene keine Verbesserung, endet die Suche. Jeder Worker-Prozess hält einen LayerCache,
+sodass gemeinsame Präfixe der Stapel nur einmal berechnet werden.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+DEFAULT_STRENGTHS = (0.25, 0.5, 0.75, 1.0)
+MAX_LAYERS = 5
+# Filter, die in der Standardauswahl fehlen ("Custom" ist die Identität)
+SKIPPED_FILTERS = {"Custom"}
+
+_samples = None
+_cache = None
+
+
+def load_samples(paths, proxy_scale):
+    """
+    Lädt die Musterbilder samt verkleinerter Fassung und optionalem Soll-Text.
+    """
+    samples = []
+    for path in paths:
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+        size = (max(1, round(image.width * proxy_scale)), max(1, round(image.height * proxy_scale)))
+        proxy = image.resize(size, Image.BILINEAR, reducing_gap=2.0) if proxy_scale < 1.0 else image
+        truth_path = os.path.splitext(path)[0] + ".gt.txt"
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, "r", encoding="utf-8") as f:
+                truth = f.read()
+        samples.append({'path': path, 'image': image, 'proxy': proxy, 'truth': truth})
+    return samples
+
+
+def word_accuracy(text, truth):
+    return 100.0 * difflib.SequenceMatcher(None, text.split(), truth.split(), autojunk=False).ratio()
+
+
+def score_page(result, truth=None, baseline_words=None):
+    """
+    Bewertung einer erkannten Seite zwischen 0 und 100.
+    """
+    if truth is not None:
+        return word_accuracy(result['text'], truth)
+    confs = result['words'].table["conf"]
+    confs = confs[confs >= 0]
+    if not len(confs):
+        return 0.0
+    coverage = min(1.0, len(confs) / baseline_words) if baseline_words else 1.0
+    return float(confs.mean()) * coverage
+
+
+def _init_worker(paths, proxy_scale):
+    global _samples, _cache
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    os.environ.setdefault("TILE_WORKERS", "1")
+    from modules.render_cache import LayerCache
+    from modules.tesseract_pool import configure_engine_pool
+    configure_engine_pool(size=1)
+    _samples = load_samples(paths, proxy_scale)
+    _cache = LayerCache(max_bytes=256 * 1024 * 1024)
+
+
+def evaluate(layers, proxy, lang, baselines):
+    """
+    Arbeitsschritt eines Worker-Prozesses: Stapel auf alle Musterbilder anwenden und
+    (mittlere Bewertung, Wortzahlen pro Bild) zurückgeben. OCR-Fehler brechen die Suche ab,
+    statt jeden Kandidaten mit 0 zu bewerten.
+    """
+    from modules.ocr_display import recognize_page
+    scores = []
+    word_counts = []
+    for index, sample in enumerate(_samples):
+        source = sample['proxy'] if proxy else sample['image']
+        scale = source.width / sample['image'].width
+        image = _cache.render(source, layers, scale)
+        try:
+            words, _ = recognize_page(image, lang)
+        except Exception as e:
+            # Wie in batch_ocr: nicht jede Ausnahme lässt sich in den Hauptprozess übertragen
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        result = {'text': words.full_text(), 'words': words}
+        word_counts.append(int((result['words'].table["conf"] >= 0).sum()))
+        baseline = baselines[index] if baselines else None
+        scores.append(score_page(result, sample['truth'], baseline))
+    return sum(scores) / len(scores), word_counts
+
+
+def extend(stack, filters, strengths):
+    """
+    Alle Verlängerungen eines Stapels um eine Ebene.
+    """
+    return [stack + ((name, strength),) for name in filters for strength in strengths]
+
+
+def search(paths, filters=None, strengths=DEFAULT_STRENGTHS, max_layers=MAX_LAYERS, beam=3,
+           finalists=6, proxy_scale=0.5, lang='deu', workers=None, min_gain=0.5, progress=print):
+    """
+    Sucht den besten Stapel und liefert ein Dictionary mit 'layers', 'score', 'baseline'
+    und der Rangliste der zuletzt in voller Auflösung bewerteten Kandidaten.
+    """
+    if filters is None:
+        from modules.filters import FILTER_KERNELS
+        filters = [name for name in FILTER_KERNELS if name not in SKIPPED_FILTERS]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(paths, proxy_scale)) as executor:
+        # Ausgangspunkt: ungefiltert; liefert auch die Wortzahlen für die Bewertung ohne Soll-Text
+        _, baselines = executor.submit(evaluate, (), False, lang, None).result()
+        _, proxy_baselines = executor.submit(evaluate, (), True, lang, None).result()
+        best_score = executor.submit(evaluate, (), False, lang, baselines).result()[0]
+        best = ()
+        baseline_score = best_score
+        progress(f"Ohne Filter: {best_score:.1f}")
+        beams = [()]
+        ranking = []
+        for depth in range(1, max_layers + 1):
+            candidates = sorted({candidate for stack in beams for candidate in extend(stack, filters, strengths)})
+            proxy_scores = list(executor.map(
+                evaluate, candidates, [True] * len(candidates), [lang] * len(candidates),
+                [proxy_baselines] * len(candidates), chunksize=max(1, len(candidates) // (4 * workers))))
+            # Nur die Besten auf den verkleinerten Bildern werden in voller Auflösung nachgerechnet
+            ranked = sorted(zip((score for score, _ in proxy_scores), candidates), reverse=True)[:finalists]
+            finals = [stack for _, stack in ranked]
+            full_scores = list(executor.map(
+                evaluate, finals, [False] * len(finals), [lang] * len(finals), [baselines] * len(finals)))
+            ranking = sorted(zip((score for score, _ in full_scores), finals), reverse=True)
+            top_score, top_stack = ranking[0]
+            progress(f"Ebene {depth}: {len(candidates)} Kandidaten, bester {top_score:.1f} "
+                     f"({', '.join(f'{name} {strength:.2f}' for name, strength in top_stack)})")
+            if top_score < best_score + min_gain:
+                # Frühzeitiger Abbruch: eine weitere Ebene bringt keine nennenswerte Verbesserung
+                break
+            best_score, best = top_score, top_stack
+            beams = [stack for _, stack in ranking[:beam]]
+    return {
+        'layers': list(best),
+        'score': best_score,
+        'baseline': baseline_score,
+        'ranking': [{'score': score, 'layers': list(stack)} for score, stack in ranking],
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sucht den Filterstapel mit der besten OCR-Bewertung.")
+    parser.add_argument("inputs", nargs="+", help="Musterbilder (daneben optional <Name>.gt.txt)")
+    parser.add_argument("-o", "--output", default="settings_tuned.json", help="Ausgabe als settings.json-Preset")
+    parser.add_argument("--filters", help="Kommagetrennte Auswahl der Filter (Standard: alle außer Custom)")
+    parser.add_argument("--strengths", default=",".join(str(s) for s in DEFAULT_STRENGTHS),
+                        help="Kommagetrennte Stärken, die probiert werden")
+    parser.add_argument("--max-layers", type=int, default=MAX_LAYERS)
+    parser.add_argument("--beam", type=int, default=3, help="Anzahl der Stapel, die pro Ebene weiterverfolgt werden")
+    parser.add_argument("--finalists", type=int, default=6, help="Kandidaten pro Ebene, die in voller Auflösung bewertet werden")
+    parser.add_argument("--proxy-scale", type=float, default=0.5, help="Verkleinerung für die Vorauswahl")
+    parser.add_argument("--lang", default="deu")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from modules.batch_ocr import collect_files
+    from modules.pipeline import settings_from_layers
+    paths = [path for path in collect_files(args.inputs) if not path.lower().endswith(".pdf")]
+    if not paths:
+        print("Keine Musterbilder gefunden.", file=sys.stderr)
+        return 1
+    filters = [name.strip() for name in args.filters.split(",")] if args.filters else None
+    strengths = tuple(float(value) for value in args.strengths.split(","))
+    try:
+        result = search(paths, filters, strengths, max_layers=min(args.max_layers, MAX_LAYERS), beam=args.beam,
+                        finalists=args.finalists, proxy_scale=args.proxy_scale, lang=args.lang,
+                        workers=args.workers)
+    except RuntimeError as e:
+        print(f"Suche abgebrochen, kein Preset geschrieben: {e}", file=sys.stderr)
+        return 1
+    settings = settings_from_layers(result['layers'])
+    settings["ocr_lang"] = args.lang
+    settings["preset_search"] = {key: result[key] for key in ('score', 'baseline', 'ranking', 'seconds')}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=4, ensure_ascii=False)
+    print(f"Bewertung {result['baseline']:.1f} -> {result['score']:.1f} in {result['seconds']:.0f} s, "
+          f"Preset geschrieben nach {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
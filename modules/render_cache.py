@@ -0,0 +1,96 @@
+import weakref
+from collections import OrderedDict
+from PIL import Image
+from modules.tracing import trace_span
+
+
+class LayerCache:
+    """
+    Merkt sich die Zwischenergebnisse des Filterstapels, damit bei einer Änderung an
+    Ebene k nur die Ebenen ab k neu berechnet werden.
+
+    Schlüssel ist das Quellbild zusammen mit dem Präfix der aktiven (Filter, Stärke)-Paare.
+    Deaktivierte Ebenen verändern das Bild nicht und tauchen deshalb im Schlüssel nicht auf.
+    Die Einträge werden nach LRU verdrängt, sobald max_bytes überschritten ist.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def _get(self, source, prefix):
+        key = (id(source), prefix)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        source_ref, arr = entry
+        if source_ref() is not source:
+            # Die id gehört inzwischen zu einem anderen Bild
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return arr
+
+    def _put(self, source, prefix, arr):
+        if arr.nbytes > self.max_bytes:
+            return
+        key = (id(source), prefix)
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (weakref.ref(source, self._forget), arr)
+        self.total_bytes += arr.nbytes
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def _forget(self, source_ref):
+        # Das Quellbild wurde freigegeben; seine Zwischenergebnisse werden nicht mehr gebraucht
+        for key in [key for key, entry in self.entries.items() if entry[0] is source_ref]:
+            self._remove(key)
+
+    def _remove(self, key):
+        _, arr = self.entries.pop(key)
+        self.total_bytes -= arr.nbytes
+
+    def render(self, source, layers, scale=1.0):
+        """
+        Wendet die Liste von (filter_name, strength) auf source an und nutzt dabei das
+        längste bereits berechnete Präfix. scale ist der Maßstab von source relativ zum
+        Originalbild; eine Vorschau ist ein eigenes Quellbild und hat eigene Einträge.
+        """
+        # NumPy und die Filter werden erst mit dem ersten Bild geladen
+        from modules.filters import to_array
+        from modules.pipeline import compile_pipeline, run_stage, stage_size
+        from modules.tiled import apply_pipeline_tiled, should_tile
+        layers = tuple(layers)
+        with trace_span("render", size=source.size, scale=scale, layers=len(layers)) as span:
+            if should_tile(source):
+                # Ganze Zwischenbilder sehr großer Seiten würden den Cache sprengen; gekachelt ohne Einträge
+                span.set(tiled=True)
+                return apply_pipeline_tiled(source, layers, scale)
+            start = len(layers)
+            cached = self._get(source, layers)
+            while cached is None and start > 0:
+                start -= 1
+                cached = self._get(source, layers[:start])
+            if cached is None:
+                cached = to_array(source)
+                self._put(source, (), cached)
+            # Anzahl der Ebenen, deren Ergebnis aus dem Cache kam
+            span.set(reused=start)
+            if start == len(layers):
+                return Image.fromarray(cached)
+
+            # Die Stufen arbeiten im Puffer, die Cache-Einträge bleiben unverändert
+            arr = cached.copy()
+            position = start
+            stages = compile_pipeline(layers[start:])
+            for i, stage in enumerate(stages):
+                arr = run_stage(arr, stage, scale)
+                position += stage_size(stage)
+                self._put(source, layers[:position], arr if i == len(stages) - 1 else arr.copy())
+            return Image.fromarray(arr)
@@ -0,0 +1,112 @@
+import threading
+
+
+class RenderScheduler:
+    """
+    Rechnet die Vorschau in einem Hintergrund-Thread, damit die Tk-Hauptschleife bei
+    Reglerbewegungen nicht blockiert.
+
+    Es wird immer nur der neueste Auftrag gerechnet: kommt während einer Berechnung ein
+    weiterer Auftrag, ersetzt er den noch wartenden. Fertige Ergebnisse holt der
+    Tk-Thread per root.after ab; ältere Ergebnisse als das zuletzt angezeigte werden
+    verworfen.
+    """
+
+    POLL_MS = 15
+
+    def __init__(self, root, render, on_done, on_busy=None, on_error=None):
+        self.root = root
+        self.render = render
+        self.on_done = on_done
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._shown_generation = 0
+        self._pending = None
+        self._running = False
+        self._result = None
+        self._polling = False
+        self._busy = False
+        self._thread = threading.Thread(target=self._worker, name="RenderScheduler", daemon=True)
+        self._thread.start()
+
+    def request(self, *args):
+        """
+        Plant eine Berechnung von render(*args); ein noch wartender Auftrag wird verworfen.
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, args)
+            self._condition.notify_all()
+        self._set_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def superseded(self):
+        """
+        True, wenn bereits ein neuerer Auftrag wartet. Lange laufende render-Funktionen
+        können damit zwischendurch prüfen, ob sich das Weiterrechnen noch lohnt.
+        """
+        with self._condition:
+            return self._pending is not None
+
+    def wait(self):
+        """
+        Blockiert, bis alle Aufträge gerechnet sind, und liefert das Ergebnis sofort aus.
+        Für Aktionen wie Speichern oder OCR, die das aktuelle Bild brauchen.
+        """
+        with self._condition:
+            while self._pending is not None or self._running:
+                self._condition.wait()
+        self._deliver()
+        self._set_busy(False)
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, args = self._pending
+                self._pending = None
+                self._running = True
+            try:
+                result = ("done", self.render(*args))
+            except Exception as e:
+                result = ("error", e)
+            with self._condition:
+                self._result = (generation,) + result
+                self._running = False
+                self._condition.notify_all()
+
+    def _poll(self):
+        self._polling = False
+        self._deliver()
+        with self._condition:
+            busy = self._pending is not None or self._running or self._result is not None
+        if busy:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._set_busy(False)
+
+    def _deliver(self):
+        with self._condition:
+            result, self._result = self._result, None
+        if result is None:
+            return
+        generation, kind, value = result
+        if generation <= self._shown_generation:
+            return
+        self._shown_generation = generation
+        if kind == "done":
+            self.on_done(value)
+        elif self.on_error:
+            self.on_error(value)
+
+    def _set_busy(self, busy):
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy:
+                self.on_busy(busy)
@@ -0,0 +1,188 @@
+from tkinter import messagebox
+from PIL import Image
+from modules.image_ops import ensure_full_render_op
+from modules.ocr_factory import recognize_cached
+from modules.ocr_overlay import show_ocr_overlay_op
+from modules.ocr_runner import show_ocr_window
+from modules.viewport import get_viewport
+
+# Weißer Abstand zwischen den Bereichen, wenn sie für einen einzigen OCR-Aufruf untereinander gesetzt werden
+MONTAGE_GAP = 40
+# Kürzere Ziehbewegungen gelten als Klick und legen keinen Bereich an
+MIN_REGION_SIZE = 4
+
+def display_transform(canvas, image_size):
+    """
+    Liefert (x0, y0, factor) für die Abbildung zwischen Canvas und Bild: Canvas-Punkt
+    = (x0, y0) + Bildpunkt / factor. x0, y0 ist die Lage der Bildecke auf dem Canvas bei
+    der aktuellen Verschiebung des Viewports, factor der Kehrwert seiner Zoomstufe.
+    """
+    viewport = get_viewport(canvas)
+    if viewport.page_size is None:
+        return None
+    x0, y0 = viewport.page_to_canvas(0, 0)
+    return x0, y0, image_size[0] / viewport.page_size[0] / viewport.zoom
+
+def canvas_to_image(canvas, x, y, image_size):
+    """
+    Rechnet Fensterkoordinaten eines Ereignisses in Bildkoordinaten um (auf das Bild begrenzt).
+    """
+    transform = display_transform(canvas, image_size)
+    if transform is None:
+        return None
+    x0, y0, factor = transform
+    image_x = (canvas.canvasx(x) - x0) * factor
+    image_y = (canvas.canvasy(y) - y0) * factor
+    return (min(max(image_x, 0), image_size[0]), min(max(image_y, 0), image_size[1]))
+
+def image_to_canvas(canvas, box, image_size):
+    x0, y0, factor = display_transform(canvas, image_size)
+    left, top, right, bottom = box
+    return (x0 + left / factor, y0 + top / factor, x0 + right / factor, y0 + bottom / factor)
+
+def normalize_box(start, end):
+    (x1, y1), (x2, y2) = start, end
+    return (round(min(x1, x2)), round(min(y1, y2)), round(max(x1, x2)), round(max(y1, y2)))
+
+def build_montage(image, regions, gap=MONTAGE_GAP):
+    """
+    Setzt die Bildausschnitte untereinander auf weißen Grund, damit alle Bereiche mit
+    einem einzigen Aufruf der OCR-Engine erkannt werden. Gibt das Montagebild und die
+    Lage jedes Bereichs als (Bereich, Versatz in y) zurück.
+    """
+    crops = [image.crop(region) for region in regions]
+    width = max(crop.width for crop in crops)
+    height = sum(crop.height for crop in crops) + gap * (len(crops) + 1)
+    montage = Image.new(image.mode, (width + 2 * gap, height), "white")
+    placements = []
+    y = gap
+    for region, crop in zip(regions, crops):
+        montage.paste(crop, (gap, y))
+        placements.append((region, y))
+        y += crop.height + gap
+    return montage, placements
+
+def map_results(results, placements, gap=MONTAGE_GAP):
+    """
+    Ordnet die Treffer aus dem Montagebild anhand ihrer vertikalen Mitte einem Bereich zu
+    und verschiebt ihre Boxen in Seitenkoordinaten. Treffer außerhalb aller Bereiche entfallen.
+    """
+    mapped = []
+    for res in results:
+        if 'left' in res:
+            center = res['top'] + res['height'] / 2
+        else:
+            center = sum(point[1] for point in res['points']) / len(res['points'])
+        for index, (region, offset) in enumerate(placements):
+            if offset <= center < offset + region[3] - region[1]:
+                dx, dy = region[0] - gap, region[1] - offset
+                res = dict(res, region=index + 1, number=len(mapped) + 1)
+                if 'left' in res:
+                    res['left'] += dx
+                    res['top'] += dy
+                else:
+                    res['points'] = [[point[0] + dx, point[1] + dy] for point in res['points']]
+                mapped.append(res)
+                break
+    return mapped
+
+def recognize_regions(image, regions, backend="tesseract_cpu", lang='deu'):
+    """
+    Führt OCR nur auf den Bereichen (left, top, right, bottom) von image aus und liefert
+    die Ergebnisse in Seitenkoordinaten. Mehrere Bereiche gehen gemeinsam in einen Aufruf.
+    """
+    if len(regions) == 1:
+        # Ein einzelner Ausschnitt braucht keine Montage
+        results = recognize_cached(image.crop(regions[0]), backend, lang)
+        return map_results(results, [(regions[0], 0)], gap=0)
+    montage, placements = build_montage(image, regions)
+    results = recognize_cached(montage, backend, lang)
+    return map_results(results, placements)
+
+def bind_roi_selection(app_instance):
+    """
+    Aufziehen eines Rechtecks im rechten Canvas legt einen OCR-Bereich an; mit gedrückter
+    Umschalttaste wird ein weiterer Bereich hinzugefügt, Rechtsklick löscht alle Bereiche.
+    """
+    canvas = app_instance.right_canvas
+    canvas.bind("<ButtonPress-1>", lambda event: start_roi_op(app_instance, event, add=False))
+    canvas.bind("<Shift-ButtonPress-1>", lambda event: start_roi_op(app_instance, event, add=True))
+    canvas.bind("<B1-Motion>", lambda event: drag_roi_op(app_instance, event))
+    canvas.bind("<ButtonRelease-1>", lambda event: end_roi_op(app_instance, event))
+    canvas.bind("<Button-3>", lambda event: clear_roi_op(app_instance))
+    # Nach jedem Neuzeichnen (Zoom, Verschieben, neues Bild) die Rahmen an die Lage des Bildes anpassen
+    get_viewport(canvas).listeners.append(lambda: draw_roi_op(app_instance))
+
+def _image_size(app_instance):
+    return app_instance.original_image.size if app_instance.original_image else None
+
+def start_roi_op(app_instance, event, add=False):
+    image_size = _image_size(app_instance)
+    point = image_size and canvas_to_image(app_instance.right_canvas, event.x, event.y, image_size)
+    if not point:
+        return
+    if not add:
+        app_instance.roi_regions = []
+    app_instance.roi_drag = point
+    draw_roi_op(app_instance)
+
+def drag_roi_op(app_instance, event):
+    if app_instance.roi_drag is None:
+        return
+    canvas = app_instance.right_canvas
+    image_size = _image_size(app_instance)
+    point = canvas_to_image(canvas, event.x, event.y, image_size)
+    canvas.delete("roi_drag")
+    canvas.create_rectangle(*image_to_canvas(canvas, normalize_box(app_instance.roi_drag, point), image_size),
+                            outline="red", dash=(4, 2), width=2, tags="roi_drag")
+
+def end_roi_op(app_instance, event):
+    if app_instance.roi_drag is None:
+        return
+    image_size = _image_size(app_instance)
+    box = normalize_box(app_instance.roi_drag, canvas_to_image(app_instance.right_canvas, event.x, event.y, image_size))
+    app_instance.roi_drag = None
+    app_instance.right_canvas.delete("roi_drag")
+    if box[2] - box[0] >= MIN_REGION_SIZE and box[3] - box[1] >= MIN_REGION_SIZE:
+        app_instance.roi_regions.append(box)
+    draw_roi_op(app_instance)
+
+def draw_roi_op(app_instance):
+    canvas = app_instance.right_canvas
+    canvas.delete("roi")
+    image_size = _image_size(app_instance)
+    if not image_size or display_transform(canvas, image_size) is None:
+        return
+    for number, box in enumerate(app_instance.roi_regions, start=1):
+        x1, y1, x2, y2 = image_to_canvas(canvas, box, image_size)
+        canvas.create_rectangle(x1, y1, x2, y2, outline="red", width=2, tags="roi")
+        canvas.create_text(x1 + 3, y1 + 2, text=str(number), anchor="nw", fill="red", tags="roi")
+
+def clear_roi_op(app_instance):
+    app_instance.roi_regions = []
+    draw_roi_op(app_instance)
+
+def run_roi_ocr_op(app_instance):
+    """
+    OCR nur in den markierten Bereichen des bearbeiteten Bildes (Boxen in Seitenkoordinaten).
+    """
+    if not app_instance.roi_regions:
+        messagebox.showinfo("Keine Bereiche", "Bitte ziehen Sie im rechten Bild mit der Maus einen oder mehrere "
+                                              "Bereiche auf (Umschalttaste für weitere Bereiche).")
+        return
+    ensure_full_render_op(app_instance)
+    image = app_instance.processed_image
+    if image is None:
+        messagebox.showwarning("Kein Bild", "Bitte laden Sie ein Bild und wenden Sie Filter an, bevor OCR ausgeführt wird.")
+        return
+    # Bereiche bleiben beim Blättern erhalten (Formulare); auf die aktuelle Seite begrenzen
+    regions = [(max(0, left), max(0, top), min(image.width, right), min(image.height, bottom))
+               for left, top, right, bottom in app_instance.roi_regions]
+    regions = [box for box in regions if box[2] > box[0] and box[3] > box[1]]
+    try:
+        results = recognize_regions(image, regions, app_instance.ocr_backend, lang=app_instance.ocr_lang)
+    except Exception as e:
+        messagebox.showerror("OCR Fehler", f"Bei der OCR ist ein Fehler aufgetreten: {str(e)}")
+        return
+    show_ocr_overlay_op(app_instance, results)
+    show_ocr_window(app_instance, results, title="OCR Ergebnis (Bereiche)")
@@ -0,0 +1,202 @@
+import functools
+import importlib.util
+import os
+import threading
+from contextlib import contextmanager
+
+# Spalten der TSV-Ausgabe von Tesseract, in der Reihenfolge von pytesseract.image_to_data
+TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf", "text")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def has_tesserocr():
+    # Nur suchen, nicht importieren: das Laden von libtesseract kostet Startzeit
+    return importlib.util.find_spec("tesserocr") is not None
+
+
+def parse_tsv(tsv):
+    """
+    Wandelt die TSV-Ausgabe von Tesseract in dasselbe Dictionary von Listen um,
+    das pytesseract.image_to_data(..., output_type=Output.DICT) liefert.
+    """
+    data = {column: [] for column in TSV_COLUMNS}
+    for line in tsv.splitlines():
+        fields = line.split("\t")
+        if len(fields) < len(TSV_COLUMNS) - 1 or fields[0] == "level":
+            continue
+        fields += [""] * (len(TSV_COLUMNS) - len(fields))
+        for column, value in zip(TSV_COLUMNS, fields):
+            if column == "text":
+                data[column].append(value)
+            elif column == "conf":
+                data[column].append(float(value))
+            else:
+                data[column].append(int(value))
+    return data
+
+
+class TesserocrEngine:
+    """
+    Initialisierte Tesseract-Instanz über die C-API (tesserocr). Sprachdaten werden nur
+    einmal beim Anlegen geladen; jeder Aufruf spart Prozessstart und temporäre Dateien.
+    """
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.pages = 0
+        import tesserocr
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def image_to_tsv(self, image):
+        self.api.SetImage(image)
+        self.api.Recognize()
+        self.pages += 1
+        return self.api.GetTSVText(0)
+
+    def image_to_data(self, image):
+        return parse_tsv(self.image_to_tsv(image))
+
+    def close(self):
+        self.api.End()
+
+
+class PytesseractEngine:
+    """
+    Rückfallebene ohne tesserocr: jeder Aufruf startet wie bisher ein tesseract-Programm.
+    """
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.pages = 0
+
+    def image_to_tsv(self, image):
+        import pytesseract
+        self.pages += 1
+        return pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.STRING)
+
+    def image_to_data(self, image):
+        import pytesseract
+        self.pages += 1
+        return pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+
+    def close(self):
+        pass
+
+
+class EnginePool:
+    """
+    Hält bis zu size fertig initialisierte Tesseract-Engines pro Prozess bereit.
+
+    Engines werden pro Sprache wiederverwendet. Nach max_pages erkannten Seiten wird eine
+    Engine geschlossen und bei Bedarf neu angelegt, damit Speicher, den Tesseract über
+    viele Seiten ansammelt, wieder freigegeben wird. Eine Engine, deren Aufruf mit einem
+    Fehler endet, wird verworfen.
+    """
+
+    def __init__(self, size=None, max_pages=None, engine_class=None):
+        self.size = size or int(os.environ.get("OCR_POOL_SIZE", "0")) or min(4, os.cpu_count() or 1)
+        self.max_pages = max_pages or int(os.environ.get("OCR_ENGINE_MAX_PAGES", "200"))
+        self.engine_class = engine_class or (TesserocrEngine if has_tesserocr() else PytesseractEngine)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.size)
+
+    def _take_idle(self, lang):
+        with self.lock:
+            for i, engine in enumerate(self.idle):
+                if engine.lang == lang:
+                    return self.idle.pop(i)
+        return None
+
+    def _give_back(self, engine):
+        if engine.pages >= self.max_pages:
+            engine.close()
+            return
+        with self.lock:
+            self.idle.append(engine)
+            # Bei wechselnden Sprachen die am längsten ungenutzte Engine schließen
+            surplus = self.idle[:-self.size] if len(self.idle) > self.size else []
+            del self.idle[:len(surplus)]
+        for old in surplus:
+            old.close()
+
+    @contextmanager
+    def engine(self, lang):
+        """
+        Leiht eine Engine für lang aus; wartet, solange alle size Engines in Benutzung sind.
+        """
+        with self.slots:
+            engine = self._take_idle(lang) or self.engine_class(lang)
+            try:
+                yield engine
+            except BaseException:
+                engine.close()
+                raise
+            self._give_back(engine)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for engine in idle:
+            engine.close()
+
+
+def get_engine_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EnginePool()
+        return _pool
+
+
+def configure_engine_pool(size=None, max_pages=None):
+    """
+    Ersetzt den Pool des Prozesses, z. B. durch eine einzelne Engine in Worker-Prozessen.
+    """
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, EnginePool(size, max_pages)
+    if old is not None:
+        old.close()
+
+
+def _reset_after_fork():
+    # Engines aus dem Elternprozess sind im Kindprozess nicht benutzbar; ohne close() verwerfen
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def image_to_data(image, lang='deu'):
+    """
+    Wie pytesseract.image_to_data mit Output.DICT, aber über eine Engine aus dem Pool.
+    """
+    with get_engine_pool().engine(lang) as engine:
+        return engine.image_to_data(image)
+
+
+def image_to_words(image, lang='deu', page=1):
+    """
+    Erkannte Wörter als OcrWords; die TSV-Ausgabe wird spaltenweise gelesen, ohne ein
+    Dictionary pro Wort anzulegen.
+    """
+    from modules.ocr_result import OcrWords
+    with get_engine_pool().engine(lang) as engine:
+        return OcrWords.from_tsv(engine.image_to_tsv(image), page)
+
+
+@functools.lru_cache(maxsize=None)
+def tesseract_version():
+    # Einmal je Prozess: pytesseract startet dafür jedes Mal "tesseract --version"
+    if has_tesserocr():
+        import tesserocr
+        return tesserocr.tesseract_version().split()[1]
+    import pytesseract
+    return str(pytesseract.get_tesseract_version())
@@ -0,0 +1,292 @@
+"""
+Gekachelte Ausführung des Filterstapels für sehr große Bilder (Pläne, große TIFFs).
+
+Das Bild wird in Kacheln von TILE_SIZE x TILE_SIZE Pixeln zerlegt. Jede Kachel wird mit
+einem Rand (Halo) gelesen, der so breit ist wie die Reichweiten aller Nachbarschaftsfilter
+zusammen (siehe FILTER_HALOS in modules.filters), läuft durch alle Stufen und wird ohne
+Rand in den Ausgabepuffer geschrieben. Das Innere jeder Kachel ist damit identisch mit
+dem Ergebnis auf dem ganzen Bild.
+
+Filter, die das ganze Bild brauchen, teilen den Stapel in Abschnitte:
+- Punktoperationen mit Statistik ("Kontrast", "Adaptive Threshold") und "Otsu" erheben
+  ihre Histogramme in einem gekachelten Durchlauf über den Eingang des Abschnitts und
+  laufen danach als gewöhnliche Punktoperation pro Kachel.
+- "Deskew" sucht den Winkel auf einer aus Kacheln zusammengesetzten Verkleinerung; die
+  Drehung erzeugt jede Ausgabekachel aus dem passenden Ausschnitt des Eingangs. Binäre
+  Bilder dreht rotate_nearest aus absoluten Koordinaten (auch im ganzen Bild), damit
+  Pixel auf einer Abtastgrenze nicht je nach Kachel kippen.
+- Unbekannte Filter ohne Halo laufen als Rückfallebene auf dem ganzen Zwischenbild.
+
+Zwischen zwei Abschnitten liegt das Bild in einer temporären, speicherabgebildeten Datei.
+Kacheln werden parallel in Threads berechnet (PIL und NumPy geben das GIL während der
+eigentlichen Rechnung frei); höchstens 2 * workers Kacheln sind gleichzeitig unterwegs.
+"""
+import math
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from modules.filters import (
+    DESKEW_MAX_ANGLE, DESKEW_WIDTH, FILTER_HALOS, _clamp, apply_lut, binarize_at, call_kernel,
+    channel_histograms, deskew_resample, luminance_histogram, otsu_threshold, rotate_nearest,
+    rotation_matrix, skew_angle, tile_workers, to_array
+)
+from modules.pipeline import build_stage_lut, compile_pipeline, is_statistic_stage, stage_label
+from modules.tracing import trace_span
+
+# Kantenlänge einer Kachel ohne Halo
+TILE_SIZE = 1024
+# Ab dieser Pixelzahl rechnen apply_pipeline und LayerCache gekachelt (etwa A4 bei 600 dpi)
+TILED_MIN_PIXELS = 36_000_000
+
+
+def tile_boxes(size, tile_size=TILE_SIZE):
+    width, height = size
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+
+
+def expand_box(box, halo, size):
+    left, top, right, bottom = box
+    return (max(0, left - halo), max(0, top - halo), min(size[0], right + halo), min(size[1], bottom + halo))
+
+
+def create_buffer(size, path=None):
+    """
+    Ausgabepuffer (H, W, 3) uint8: im Speicher oder, mit path, als speicherabgebildete Datei.
+    """
+    shape = (size[1], size[0], 3)
+    if path is None:
+        return np.empty(shape, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+
+
+def _spill_buffer(size, spill_dir):
+    # Die Datei ist schon gelöscht; der Speicher wird mit dem letzten Verweis auf das memmap frei
+    with tempfile.TemporaryFile(dir=spill_dir, prefix="tiles-") as f:
+        return np.memmap(f, dtype=np.uint8, mode="w+", shape=(size[1], size[0], 3))
+
+
+class _Source:
+    """
+    Einheitlicher Lesezugriff auf ein PIL-Bild oder einen (H, W, 3)-Puffer. read liefert
+    immer eine beschreibbare RGB-Kopie des Ausschnitts.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, Image.Image):
+            source.load()
+            self.image = source
+            self.array = None
+            self.size = source.size
+        else:
+            self.image = None
+            self.array = source
+            self.size = (source.shape[1], source.shape[0])
+
+    def read(self, box):
+        if self.image is not None:
+            return to_array(self.image.crop(box))
+        left, top, right, bottom = box
+        return np.array(self.array[top:bottom, left:right])
+
+
+class _Sink:
+    """
+    Schreibziel: ein Puffer (auch memmap) oder ein PIL-Bild, in das die Kacheln eingefügt werden.
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, box, tile):
+        if isinstance(self.target, Image.Image):
+            self.target.paste(Image.fromarray(tile), box[:2])
+        else:
+            self.target[box[1]:box[3], box[0]:box[2]] = tile
+
+
+def _map_tiles(func, boxes, workers):
+    """
+    Wie executor.map, aber mit höchstens 2 * workers Kacheln gleichzeitig im Speicher.
+    """
+    if workers <= 1:
+        for box in boxes:
+            yield box, func(box)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for box in boxes:
+            pending.append((box, executor.submit(func, box)))
+            if len(pending) >= 2 * workers:
+                done_box, future = pending.pop(0)
+                yield done_box, future.result()
+        for done_box, future in pending:
+            yield done_box, future.result()
+
+
+def _sum_tiles(source, func, tile_size, workers):
+    total = None
+    for _, value in _map_tiles(lambda box: func(source.read(box)), tile_boxes(source.size, tile_size), workers):
+        total = value if total is None else total + value
+    return total
+
+
+def _local_step(stage, scale):
+    """
+    (Halo, Funktion arr -> arr) für eine Stufe, die pro Kachel laufen kann, sonst None.
+    """
+    if stage[0] == "lut":
+        if is_statistic_stage(stage):
+            return None
+        lut = build_stage_lut(None, stage[1])
+        return 0, lambda arr: apply_lut(arr, lut)
+    _, filter_name, strength = stage
+    halo = FILTER_HALOS.get(filter_name)
+    if halo is None:
+        return None
+    return halo(strength, scale), lambda arr: call_kernel(arr, filter_name, strength, scale)
+
+
+def _resolve_global(stage, source, scale, tile_size, workers):
+    """
+    Erhebt die Statistik einer Stufe, die das ganze Bild braucht, und liefert
+    (read, Halo, Funktion): read ersetzt das Lesen der Kacheln (nur bei Deskew), die Funktion
+    läuft wie eine gewöhnliche Stufe pro Kachel. Für unbekannte Filter None.
+    """
+    if stage[0] == "lut":
+        histograms = _sum_tiles(source, channel_histograms, tile_size, workers)
+        lut = build_stage_lut(None, stage[1], histograms, lambda current: _sum_tiles(
+            source, lambda arr: luminance_histogram(arr, current), tile_size, workers))
+        return None, 0, lambda arr: apply_lut(arr, lut)
+    _, filter_name, strength = stage
+    if filter_name == "Otsu":
+        threshold = otsu_threshold(_sum_tiles(source, luminance_histogram, tile_size, workers))
+        return None, 0, lambda arr: binarize_at(arr, threshold, strength)
+    if filter_name == "Deskew":
+        return _deskew_reader(source, strength, tile_size, workers), 0, None
+    return None
+
+
+def _reduced_gray(source, tile_size, workers):
+    """
+    Verkleinerung auf DESKEW_WIDTH Pixel Breite, Kachel für Kachel zusammengesetzt,
+    sowie das Luminanz-Histogramm des ganzen Bildes.
+    """
+    factor = min(1.0, DESKEW_WIDTH / source.size[0])
+    reduced = Image.new("L", (max(1, round(source.size[0] * factor)), max(1, round(source.size[1] * factor))))
+    histogram = np.zeros(256, dtype=np.int64)
+
+    def reduce_tile(box):
+        gray = Image.fromarray(source.read(box)).convert("L")
+        target = tuple(round(value * factor) for value in box)
+        size = (max(1, target[2] - target[0]), max(1, target[3] - target[1]))
+        return target, gray.resize(size, Image.BILINEAR, reducing_gap=2.0), np.array(gray.histogram())
+
+    for _, (target, tile, tile_histogram) in _map_tiles(reduce_tile, tile_boxes(source.size, tile_size), workers):
+        reduced.paste(tile, target[:2])
+        histogram += tile_histogram
+    return reduced, histogram
+
+
+def _deskew_reader(source, strength, tile_size, workers):
+    """
+    Liefert eine Lesefunktion, die jede Ausgabekachel direkt gedreht aus dem Eingang
+    erzeugt, mit derselben Matrix wie Image.rotate(-angle) um die Bildmitte. Binäre Bilder
+    dreht wie im ganzen Bild rotate_nearest, alle anderen Image.transform mit BILINEAR.
+    """
+    max_angle = DESKEW_MAX_ANGLE * _clamp(strength)
+    if max_angle <= 0:
+        return source.read
+    reduced, histogram = _reduced_gray(source, tile_size, workers)
+    angle = skew_angle(reduced, max_angle)
+    if abs(angle) < 0.05:
+        return source.read
+    resample = deskew_resample(histogram)
+    matrix = rotation_matrix(source.size, angle)
+    if resample == Image.NEAREST:
+        return lambda box: rotate_nearest(source.read, source.size, box, matrix)
+    a, b, c, d, e, f = matrix
+
+    def read(box):
+        left, top, right, bottom = box
+        # Ausschnitt des Eingangs, aus dem die Kachel entsteht (Ecken abgebildet, 2 Pixel Reserve)
+        corners = [(a * x + b * y + c, d * x + e * y + f) for x in (left, right) for y in (top, bottom)]
+        region = expand_box((math.floor(min(x for x, _ in corners)), math.floor(min(y for _, y in corners)),
+                             math.ceil(max(x for x, _ in corners)), math.ceil(max(y for _, y in corners))),
+                            2, source.size)
+        if region[2] <= region[0] or region[3] <= region[1]:
+            return np.full((bottom - top, right - left, 3), 255, dtype=np.uint8)
+        tile_matrix = (a, b, c + a * left + b * top - region[0], d, e, f + d * left + e * top - region[1])
+        tile = Image.fromarray(source.read(region)).transform(
+            (right - left, bottom - top), Image.AFFINE, tile_matrix, resample, fillcolor=(255, 255, 255))
+        return np.array(tile)
+    return read
+
+
+def _run_segment(read, size, steps, sink, tile_size, workers):
+    halo = sum(step_halo for step_halo, _ in steps)
+
+    def process(box):
+        outer = expand_box(box, halo, size)
+        arr = read(outer)
+        for _, step in steps:
+            arr = step(arr)
+        return arr[box[1] - outer[1]:box[3] - outer[1], box[0] - outer[0]:box[2] - outer[0]]
+
+    for box, tile in _map_tiles(process, tile_boxes(size, tile_size), workers):
+        sink.write(box, tile)
+
+
+def apply_pipeline_tiled(source, layers, scale=1.0, out=None, tile_size=TILE_SIZE, workers=None, spill_dir=None):
+    """
+    Wendet eine Liste von (filter_name, strength) gekachelt auf source (PIL-Bild oder
+    (H, W, 3)-Puffer) an. Das Ergebnis landet in out (Puffer oder memmap aus create_buffer)
+    oder, ohne out, in einem neuen PIL-Bild. Zwischenbilder zwischen Abschnitten liegen als
+    temporäre Dateien in spill_dir (Standard: Temp-Verzeichnis).
+    """
+    workers = workers or tile_workers()
+    current = _Source(source)
+    size = current.size
+    stages = compile_pipeline(layers)
+
+    # Abschnitte: [(Stufe mit Ganzbild-Statistik oder None, [lokale Stufen], [Namen der Stufen])]
+    segments = [(None, [], [])]
+    for stage in stages:
+        step = _local_step(stage, scale)
+        if step is None:
+            segments.append((stage, [], [stage_label(stage)]))
+        else:
+            segments[-1][1].append(step)
+            segments[-1][2].append(stage_label(stage))
+
+    result = out if out is not None else Image.new("RGB", size)
+    for index, (global_stage, steps, labels) in enumerate(segments):
+        last = index == len(segments) - 1
+        if global_stage is None and not steps and not last:
+            continue
+        with trace_span("tiled:" + (" | ".join(labels) or "copy"), size=size, scale=scale, workers=workers):
+            read = current.read
+            if global_stage is not None:
+                resolved = _resolve_global(global_stage, current, scale, tile_size, workers)
+                if resolved is None:
+                    # Rückfallebene: der Filter läuft auf dem ganzen Zwischenbild
+                    arr = call_kernel(current.read((0, 0) + size), global_stage[1], global_stage[2], scale)
+                    current = _Source(arr)
+                    read = current.read
+                else:
+                    reader, halo, func = resolved
+                    read = reader or read
+                    if func is not None:
+                        steps = [(halo, func)] + steps
+            target = result if last else _spill_buffer(size, spill_dir)
+            _run_segment(read, size, steps, _Sink(target), tile_size, workers)
+            if not last:
+                current = _Source(target)
+    return result
+
+
+def should_tile(image):
+    return image.width * image.height >= TILED_MIN_PIXELS
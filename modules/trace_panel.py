@@ -0,0 +1,98 @@
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from modules.tracing import (
+    clear_events, configure_tracing, export_chrome_trace, recent_events, stage_stats, tracing_enabled
+)
+
+COLUMNS = (("count", "Anzahl", 60), ("mean", "Mittel ms", 80), ("p95", "p95 ms", 80), ("max", "Max ms", 80),
+           ("cpu", "CPU ms", 80), ("bytes", "Ausgabe MB", 80), ("slowest", "Langsamster Aufruf", 320))
+
+
+class TracePanel:
+    """
+    Fenster mit der laufenden Statistik der Messpunkte (siehe modules.tracing): pro Stufe
+    Anzahl, mittlere, p95- und Höchstdauer, CPU-Zeit und mittlere Größe des erzeugten
+    Bildpuffers (nicht der Speicherbedarf der Stufe) über die letzten Messungen, dazu die
+    Felder des langsamsten Aufrufs (z. B. Datei und Seite).
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, app_instance):
+        self.app = app_instance
+        self.window = None
+        self.tree = None
+        self.enabled_var = None
+        self.refresh_job = None
+
+    def open(self):
+        if self.window is not None:
+            self.window.lift()
+            return
+        self.window = tk.Toplevel(self.app.root)
+        self.window.title("Laufzeitstatistik")
+        top = tk.Frame(self.window)
+        top.pack(fill=tk.X, padx=5, pady=5)
+        self.enabled_var = tk.BooleanVar(value=tracing_enabled())
+        tk.Checkbutton(top, text="Messung aktiv", variable=self.enabled_var,
+                       command=lambda: configure_tracing(enabled=self.enabled_var.get())).pack(side=tk.LEFT)
+        tk.Button(top, text="Zurücksetzen", command=self.reset).pack(side=tk.RIGHT)
+        tk.Button(top, text="Chrome-Trace exportieren", command=self.export).pack(side=tk.RIGHT, padx=5)
+        self.tree = ttk.Treeview(self.window, columns=[key for key, _, _ in COLUMNS], height=20)
+        self.tree.heading("#0", text="Stufe")
+        self.tree.column("#0", width=220)
+        for key, title, width in COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor="w" if key == "slowest" else "e")
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def close(self):
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.window is not None:
+            self.window.destroy()
+        self.window = None
+        self.tree = None
+
+    def refresh(self):
+        self.refresh_job = None
+        if self.window is None:
+            return
+        self.tree.delete(*self.tree.get_children())
+        for entry in stage_stats(recent_events()):
+            slowest = ", ".join(f"{key}={value}" for key, value in entry['slowest'].items())
+            size = f"{entry['bytes_mean'] / 1e6:.1f}" if entry['bytes_mean'] is not None else ""
+            self.tree.insert("", tk.END, text=entry['name'], values=(
+                entry['count'], f"{entry['mean'] * 1000:.1f}", f"{entry['p95'] * 1000:.1f}",
+                f"{entry['max'] * 1000:.1f}", f"{entry['cpu_mean'] * 1000:.1f}", size, slowest))
+        self.refresh_job = self.window.after(self.REFRESH_MS, self.refresh)
+
+    def reset(self):
+        clear_events()
+        # Sonst liefe neben der bisherigen eine zweite Aktualisierungsschleife
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        self.refresh()
+
+    def export(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Chrome-Trace", "*.json"), ("Alle Dateien", "*.*")],
+            title="Chrome-Trace exportieren",
+            parent=self.window
+        )
+        if file_path:
+            try:
+                export_chrome_trace(file_path)
+            except Exception as e:
+                messagebox.showerror("Fehler", f"Export fehlgeschlagen: {str(e)}", parent=self.window)
+
+
+def show_trace_panel_op(app_instance):
+    if app_instance.trace_panel is None:
+        app_instance.trace_panel = TracePanel(app_instance)
+    app_instance.trace_panel.open()
@@ -0,0 +1,237 @@
+"""
+Leichtgewichtige Zeitmessung der heißen Pfade: Laden und Rastern, Filterstufen, Anzeige, OCR.
+
+Eingeschaltet wird über TRACE=1, "trace": true in settings.json oder das Fenster
+"Laufzeitstatistik". Mit TRACE_FILE=<Pfad> wird jede Messung zusätzlich als JSON-Zeile an
+die Datei angehängt; die Worker der Stapelverarbeitung erben beides und schreiben in dieselbe
+Datei. Ausgeschaltet kostet ein Messpunkt einen Funktionsaufruf, der ein gemeinsames, leeres
+Kontextobjekt liefert.
+
+Eine Messung hält Name, Startzeit, Wand- und CPU-Zeit, Prozess, Thread und frei wählbare
+Felder wie Bildgröße oder die Größe des erzeugten Puffers in Bytes:
+
+    with trace_span("stage:Sauvola", size=image.size) as span:
+        arr = ...
+        span.set(bytes=arr.nbytes)
+
+Die CPU-Zeit ist die des messenden Threads; Arbeit in Hilfsthreads (z. B. Kacheln) zählt
+dort nicht mit. Die letzten TRACE_BUFFER Messungen bleiben im Speicher für die Statistik.
+
+Eine Protokolldatei lässt sich in das Chrome-Trace-Format (chrome://tracing, Perfetto)
+umwandeln und zusammenfassen:
+    python -m modules.tracing trace.jsonl -o trace.json --stats
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+# Anzahl der Messungen, die im Speicher bleiben
+TRACE_BUFFER = 5000
+
+_enabled = os.environ.get("TRACE", "0") not in ("", "0")
+_log_path = os.environ.get("TRACE_FILE") or None
+_log_fd = None
+_events = deque(maxlen=TRACE_BUFFER)
+_lock = threading.Lock()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "fields", "epoch", "start", "cpu_start")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.epoch = time.time()
+        self.cpu_start = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        cpu = time.thread_time() - self.cpu_start
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        thread = threading.current_thread()
+        record({'name': self.name, 'ts': self.epoch, 'wall': wall, 'cpu': cpu, 'pid': os.getpid(),
+                'tid': thread.ident, 'thread': thread.name, 'args': self.fields})
+        return False
+
+
+def trace_span(name, **fields):
+    """
+    Kontextmanager für eine Messung; bei abgeschalteter Messung ein gemeinsames leeres Objekt.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, fields)
+
+
+def tracing_enabled():
+    return _enabled
+
+
+def configure_tracing(enabled=None, log_path=None):
+    """
+    Schaltet die Messung ein oder aus und legt die JSON-Lines-Datei fest; None lässt den
+    bisherigen Wert, ein leerer Pfad schaltet die Datei ab.
+    """
+    global _enabled, _log_path, _log_fd
+    with _lock:
+        if enabled is not None:
+            _enabled = bool(enabled)
+        if log_path is not None and (log_path or None) != _log_path:
+            if _log_fd is not None:
+                os.close(_log_fd)
+                _log_fd = None
+            _log_path = log_path or None
+
+
+def record(event):
+    global _log_fd
+    with _lock:
+        _events.append(event)
+        if _log_path is None:
+            return
+        try:
+            if _log_fd is None:
+                _log_fd = os.open(_log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            # Eine Zeile, ein write(): mehrere Prozesse können so dieselbe Datei beschreiben
+            os.write(_log_fd, (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+        except OSError:
+            # Eine volle Platte oder ein falscher Pfad soll die eigentliche Arbeit nicht stören
+            pass
+
+
+def recent_events():
+    with _lock:
+        return list(_events)
+
+
+def clear_events():
+    with _lock:
+        _events.clear()
+
+
+def _reset_after_fork():
+    # Eine im Elternprozess gehaltene Sperre wäre im Kindprozess für immer belegt
+    global _lock
+    _lock = threading.Lock()
+    _events.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def stage_stats(events):
+    """
+    Fasst Messungen nach Namen zusammen, absteigend nach Gesamtzeit. Zeiten in Sekunden.
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault(event['name'], []).append(event)
+    stats = []
+    for name, group in groups.items():
+        walls = sorted(event['wall'] for event in group)
+        sizes = [event['args']['bytes'] for event in group if 'bytes' in event['args']]
+        slowest = max(group, key=lambda event: event['wall'])
+        stats.append({
+            'name': name,
+            'count': len(group),
+            'total': sum(walls),
+            'mean': statistics.fmean(walls),
+            'p95': walls[min(len(walls) - 1, int(0.95 * len(walls)))],
+            'max': walls[-1],
+            'cpu_mean': statistics.fmean(event['cpu'] for event in group),
+            # Größe des erzeugten Puffers (Feld bytes), nicht der Speicherbedarf der Stufe
+            'bytes_mean': statistics.fmean(sizes) if sizes else None,
+            'slowest': slowest['args'],
+        })
+    return sorted(stats, key=lambda entry: -entry['total'])
+
+
+def chrome_trace(events):
+    """
+    Messungen im Trace-Event-Format (vollständige Ereignisse "X", Zeiten in Mikrosekunden).
+    """
+    trace_events = []
+    threads = {}
+    for event in events:
+        threads[(event['pid'], event['tid'])] = event.get('thread')
+        args = dict(event['args'], cpu_ms=round(event['cpu'] * 1000, 3))
+        trace_events.append({'name': event['name'], 'cat': event['name'].split(":")[0], 'ph': "X",
+                             'ts': event['ts'] * 1e6, 'dur': event['wall'] * 1e6,
+                             'pid': event['pid'], 'tid': event['tid'], 'args': args})
+    for (pid, tid), name in threads.items():
+        trace_events.append({'name': "thread_name", 'ph': "M", 'pid': pid, 'tid': tid, 'args': {'name': name}})
+    return {'traceEvents': trace_events, 'displayTimeUnit': "ms"}
+
+
+def export_chrome_trace(path, events=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(recent_events() if events is None else events), f, default=str)
+
+
+def read_jsonl(path):
+    """
+    Liest eine Protokolldatei; eine abgeschnittene letzte Zeile wird übersprungen.
+    """
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def format_stats(stats):
+    lines = [f"{'Stufe':32} {'Anzahl':>7} {'Summe s':>9} {'Mittel ms':>10} {'p95 ms':>9} {'Max ms':>9} {'CPU ms':>9}"]
+    for entry in stats:
+        lines.append(f"{entry['name'][:32]:32} {entry['count']:7} {entry['total']:9.2f} {entry['mean'] * 1000:10.1f} "
+                     f"{entry['p95'] * 1000:9.1f} {entry['max'] * 1000:9.1f} {entry['cpu_mean'] * 1000:9.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wandelt ein Messprotokoll (JSON Lines) in einen Chrome-Trace um.")
+    parser.add_argument("input", help="Protokolldatei aus TRACE_FILE")
+    parser.add_argument("-o", "--output", help="Chrome-Trace (Standard: <Eingabe>.trace.json)")
+    parser.add_argument("--stats", action="store_true", help="Zusammenfassung pro Stufe ausgeben")
+    args = parser.parse_args(argv)
+    events = read_jsonl(args.input)
+    output = args.output or os.path.splitext(args.input)[0] + ".trace.json"
+    export_chrome_trace(output, events)
+    print(f"{len(events)} Messungen nach {output} geschrieben")
+    if args.stats:
+        print(format_stats(stage_stats(events)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
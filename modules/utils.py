@@ -1,7 +1,24 @@
 import os, sys
+from functools import lru_cache
 
 def get_program_path():
     if getattr(sys, 'frozen', False):
         return os.path.dirname(sys.executable)
     else:
         return os.path.dirname(os.path.abspath(__file__))
+
+@lru_cache(maxsize=None)
+def get_font(size=16):
+    """
+    Schrift für Beschriftungen in Bildern, einmal pro Prozess und Größe geladen: Arial, falls
+    vorhanden, sonst die mitgelieferte Schrift von Pillow.
+    """
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            # Pillow vor 10.1 kennt keine Größe für die Standardschrift
+            return ImageFont.load_default()
@@ -13,16 +13,26 @@ def build_view(root, show_left_preview):
 	  - right_canvas
 	  - filename_label
 	  - settings_label
+	  - status_label
+	  - prev_page_button, page_label, next_page_button (Blättern in mehrseitigen Dokumenten)
 	"""
 	main_frame = tk.Frame(root, bg="white")
 	main_frame.pack(fill=tk.BOTH, expand=True)
 
 	top_frame = tk.Frame(main_frame, bg="lightblue")
 	top_frame.pack(fill=tk.X, padx=10, pady=5)
+	prev_page_button = tk.Button(top_frame, text="<", width=2)
+	prev_page_button.pack(side=tk.LEFT)
+	page_label = tk.Label(top_frame, text="", bg="lightblue", font=("Arial", 12))
+	page_label.pack(side=tk.LEFT, padx=5)
+	next_page_button = tk.Button(top_frame, text=">", width=2)
+	next_page_button.pack(side=tk.LEFT, padx=(0, 10))
 	filename_label = tk.Label(top_frame, text="Kein Bild geladen", anchor="w", bg="lightblue", font=("Arial", 12))
 	filename_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
 	settings_label = tk.Label(top_frame, text="Einstellungen: Keine", anchor="e", bg="lightblue", font=("Arial", 12))
 	settings_label.pack(side=tk.RIGHT)
+	status_label = tk.Label(top_frame, text="", anchor="e", bg="lightblue", fg="darkred", font=("Arial", 12))
+	status_label.pack(side=tk.RIGHT, padx=10)
 
 	preview_frame = tk.Frame(main_frame, bg="gray")
 	preview_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -52,7 +62,11 @@ def build_view(root, show_left_preview):
 		"left_canvas": left_canvas,
 		"right_canvas": right_canvas,
 		"filename_label": filename_label,
-		"settings_label": settings_label
+		"settings_label": settings_label,
+		"status_label": status_label,
+		"prev_page_button": prev_page_button,
+		"page_label": page_label,
+		"next_page_button": next_page_button
 	}
 
 
@@ -83,24 +97,7 @@ def create_canvas(parent, height=480, bg="white"):
 	container.grid_rowconfigure(0, weight=1)
 	container.grid_columnconfigure(0, weight=1)
 
-	def _on_mousewheel(event):
-		"""
-		Beim Scrollen mit dem Mausrad soll der Inhalt des Canvas skaliert werden.
-		Bei Windows wird event.delta verwendet, bei Linux die Button-Nummern.
-		"""
-		if event.delta:
-			# Windows: event.delta > 0 bedeutet Scroll-up
-			scale = 1.1 if event.delta > 0 else 0.9
-		else:
-			# Linux: Button 4 = scroll up, Button 5 = scroll down
-			scale = 1.1 if event.num == 4 else 0.9
-		# Zoom relativ zur Cursorposition
-		canvas.scale("all", event.x, event.y, scale, scale)
-		canvas.configure(scrollregion=canvas.bbox("all"))
-
-	# Bindings für Windows und Linux (für Mausrad)
-	canvas.bind("<MouseWheel>", _on_mousewheel)
-	canvas.bind("<Button-4>", _on_mousewheel)
-	canvas.bind("<Button-5>", _on_mousewheel)
+	# Zoom und Verschieben übernimmt modules.viewport; es steuert auch die Scrollbars
+	canvas.scrollbars = (h_scroll, v_scroll)
 
 	return canvas
@@ -0,0 +1,217 @@
+import math
+from PIL import Image, ImageTk
+from modules.tracing import trace_span
+
+# Zoomschritt pro Mausrad-Raste
+ZOOM_STEP = 1.25
+# Größte Vergrößerung (Bildschirmpixel pro Bildpixel)
+MAX_ZOOM = 16.0
+# Ab dieser Vergrößerung werden Pixel als Blöcke gezeigt statt interpoliert
+NEAREST_ZOOM = 2.0
+
+
+class Viewport:
+    """
+    Zeigt eine Seite in einem Canvas mit eigener Zoomstufe und Verschiebung.
+
+    Alle Koordinaten beziehen sich auf die Seite in voller Auflösung (page_size); angezeigt
+    werden darf aber auch eine verkleinerte Fassung (z. B. die Vorschau des Filterstapels).
+    Pro Bild wird nur der sichtbare Ausschnitt auf Bildschirmauflösung
+    umgerechnet, und zwar aus der gröbsten Stufe, die noch mindestens so fein ist wie die
+    Anzeige. Die Stufen bilden eine Mip-Pyramide: jede entsteht bei Bedarf durch Halbieren
+    der nächstfeineren (Image.reduce); eine mitgegebene Vorschau dient als fertige grobe Stufe.
+    Das Canvas enthält genau ein PhotoImage in Canvas-Größe, das mit paste() aktualisiert
+    und nur bei einer Größenänderung des Canvas neu angelegt wird.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.page_size = None
+        # Stufen der Pyramide als (Maßstab, Bild), absteigend nach Maßstab
+        self.levels = []
+        self.background = tuple(value >> 8 for value in canvas.winfo_rgb(canvas.cget("bg")))
+        self.zoom = 1.0
+        self.offset = (0.0, 0.0)
+        self.photo = None
+        self.render_job = None
+        self.pan_start = None
+        # Aufrufe nach jeder Änderung von Zoom oder Verschiebung (z. B. Rahmen neu zeichnen)
+        self.listeners = []
+        canvas.bind("<MouseWheel>", self.on_wheel)
+        canvas.bind("<Button-4>", self.on_wheel)
+        canvas.bind("<Button-5>", self.on_wheel)
+        canvas.bind("<ButtonPress-2>", self.on_pan_start)
+        canvas.bind("<B2-Motion>", self.on_pan)
+        canvas.bind("<Configure>", lambda event: self.schedule_render())
+        h_scroll, v_scroll = getattr(canvas, "scrollbars", (None, None))
+        self.h_scroll = h_scroll
+        self.v_scroll = v_scroll
+        if h_scroll is not None:
+            h_scroll.config(command=lambda *args: self.on_scrollbar(0, *args))
+            v_scroll.config(command=lambda *args: self.on_scrollbar(1, *args))
+
+    def view_size(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        return max(1, width), max(1, height)
+
+    def fit_zoom(self):
+        width, height = self.view_size()
+        # 10 Pixel Rand wie bisher
+        return min(1.0, (width - 20) / self.page_size[0], (height - 20) / self.page_size[1])
+
+    def show(self, image, page_size=None, coarse=None):
+        """
+        Zeigt image als Fassung einer Seite der Größe page_size (Standard: image.size).
+        coarse ist optional dieselbe Seite in geringerer Auflösung, z. B. die Vorschau.
+        Bleibt die Seitengröße gleich, bleiben Zoom und Ausschnitt erhalten.
+        """
+        page_size = tuple(page_size or image.size)
+        self.levels = [(image.width / page_size[0], image)]
+        if coarse is not None and coarse.width < image.width:
+            self.levels.append((coarse.width / page_size[0], coarse))
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.fit()
+        else:
+            self.schedule_render()
+
+    def clear(self):
+        self.page_size = None
+        self.levels = []
+        self.canvas.delete("image")
+        self.photo = None
+
+    def fit(self):
+        self.set_view(self.fit_zoom(), None)
+
+    def set_view(self, zoom, offset):
+        """
+        Setzt Zoom und Verschiebung (Seitenkoordinate der linken oberen Canvas-Ecke).
+        Passt die Seite in eine Richtung ganz hinein, wird sie dort zentriert.
+        """
+        if self.page_size is None:
+            return
+        fit = self.fit_zoom()
+        self.zoom = min(max(zoom, min(fit, 1.0) / 2), MAX_ZOOM)
+        view_w, view_h = (size / self.zoom for size in self.view_size())
+        offset = offset or (0.0, 0.0)
+        clamped = []
+        for value, view, page in ((offset[0], view_w, self.page_size[0]), (offset[1], view_h, self.page_size[1])):
+            if view >= page:
+                clamped.append((page - view) / 2)
+            else:
+                clamped.append(min(max(value, 0.0), page - view))
+        self.offset = tuple(clamped)
+        self.schedule_render()
+
+    def canvas_to_page(self, x, y):
+        return self.offset[0] + x / self.zoom, self.offset[1] + y / self.zoom
+
+    def page_to_canvas(self, x, y):
+        return (x - self.offset[0]) * self.zoom, (y - self.offset[1]) * self.zoom
+
+    def on_wheel(self, event):
+        if self.page_size is None:
+            return
+        if event.delta:
+            factor = ZOOM_STEP if event.delta > 0 else 1 / ZOOM_STEP
+        else:
+            factor = ZOOM_STEP if event.num == 4 else 1 / ZOOM_STEP
+        # Der Seitenpunkt unter dem Mauszeiger bleibt stehen
+        px, py = self.canvas_to_page(event.x, event.y)
+        zoom = self.zoom * factor
+        self.set_view(zoom, (px - event.x / zoom, py - event.y / zoom))
+
+    def on_pan_start(self, event):
+        self.pan_start = (event.x, event.y, self.offset)
+
+    def on_pan(self, event):
+        if self.pan_start is None or self.page_size is None:
+            return
+        x, y, (ox, oy) = self.pan_start
+        self.set_view(self.zoom, (ox - (event.x - x) / self.zoom, oy - (event.y - y) / self.zoom))
+
+    def on_scrollbar(self, axis, command, value, unit=None):
+        if self.page_size is None:
+            return
+        view = self.view_size()[axis] / self.zoom
+        offset = list(self.offset)
+        if command == "moveto":
+            offset[axis] = float(value) * self.page_size[axis]
+        else:
+            offset[axis] += int(value) * (view if unit == "pages" else view / 10)
+        self.set_view(self.zoom, tuple(offset))
+
+    def schedule_render(self):
+        # Mehrere Ereignisse in einem Durchlauf der Ereignisschleife ergeben nur ein Neuzeichnen
+        if self.render_job is None:
+            self.render_job = self.canvas.after_idle(self.render)
+
+    def level_for(self, zoom):
+        """
+        Gröbste Stufe mit Maßstab >= zoom; ist die nächste Halbierung noch fein genug,
+        wird sie angelegt (und für weitere Aufrufe behalten).
+        """
+        candidates = [level for level in self.levels if level[0] >= zoom * 0.999]
+        scale, image = candidates[-1] if candidates else self.levels[0]
+        while scale / 2 >= zoom and min(image.size) >= 2:
+            image = image.reduce(2)
+            scale = image.width / self.page_size[0]
+            self.levels.append((scale, image))
+            self.levels.sort(key=lambda level: -level[0])
+        return scale, image
+
+    def render(self):
+        self.render_job = None
+        if not self.levels:
+            return
+        width, height = self.view_size()
+        if self.photo is None or (self.photo.width(), self.photo.height()) != (width, height):
+            self.photo = ImageTk.PhotoImage("RGB", (width, height))
+            self.canvas.delete("image")
+            self.canvas.create_image(0, 0, image=self.photo, anchor="nw", tags="image")
+            self.canvas.tag_lower("image")
+        with trace_span("display", size=(width, height), zoom=round(self.zoom, 4)) as span:
+            self._render_frame(width, height, span)
+        self.update_scrollbars()
+        for listener in self.listeners:
+            listener()
+
+    def _render_frame(self, width, height, span):
+        frame = Image.new("RGB", (width, height), self.background)
+        # Sichtbarer Teil der Seite in Canvas-Pixeln
+        left, top = self.page_to_canvas(0, 0)
+        right, bottom = self.page_to_canvas(*self.page_size)
+        x0, y0 = max(0, math.floor(left)), max(0, math.floor(top))
+        x1, y1 = min(width, math.ceil(right)), min(height, math.ceil(bottom))
+        if x1 > x0 and y1 > y0:
+            scale, image = self.level_for(self.zoom)
+            # Derselbe Ausschnitt in Koordinaten der gewählten Stufe
+            px0, py0 = self.canvas_to_page(x0, y0)
+            px1, py1 = self.canvas_to_page(x1, y1)
+            box = (max(0.0, px0 * scale), max(0.0, py0 * scale),
+                   min(image.width, px1 * scale), min(image.height, py1 * scale))
+            resample = Image.NEAREST if self.zoom / scale >= NEAREST_ZOOM else Image.BILINEAR
+            frame.paste(image.resize((x1 - x0, y1 - y0), resample, box=box), (x0, y0))
+            span.set(level=image.size)
+        # Übergabe an Tk (Umwandlung in das PhotoImage)
+        with trace_span("display:photo", size=(width, height), bytes=3 * width * height):
+            self.photo.paste(frame)
+
+    def update_scrollbars(self):
+        if self.h_scroll is None:
+            return
+        for axis, scrollbar in ((0, self.h_scroll), (1, self.v_scroll)):
+            view = self.view_size()[axis] / self.zoom
+            first = max(0.0, self.offset[axis] / self.page_size[axis])
+            last = min(1.0, (self.offset[axis] + view) / self.page_size[axis])
+            scrollbar.set(first, last)
+
+
+def get_viewport(canvas):
+    viewport = getattr(canvas, "viewport", None)
+    if viewport is None:
+        viewport = canvas.viewport = Viewport(canvas)
+    return viewport
@@ -0,0 +1,14 @@
+import os
+
+from modules.batch_ocr import collect_files
+
+
+def test_collect_files_skips_the_output_directory(tmp_path):
+    for name in ("scan.png", "in/brief.pdf", "ocr_output/scan.pdf", "ocr_output/sub/x.png"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    output = str(tmp_path / "ocr_output")
+    files = collect_files([str(tmp_path)], exclude=[output])
+    assert files == sorted([os.path.abspath(tmp_path / "in" / "brief.pdf"), os.path.abspath(tmp_path / "scan.png")])
+    assert len(collect_files([str(tmp_path)])) == 4
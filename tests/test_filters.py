@@ -0,0 +1,70 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from modules.filters import otsu_threshold, skew_angle
+from modules.pipeline import apply_pipeline
+from modules.tiled import apply_pipeline_tiled
+
+
+def test_otsu_threshold_uniform_histogram():
+    for level in (0, 128, 255):
+        histogram = [0] * 256
+        histogram[level] = 1000
+        assert otsu_threshold(histogram) == 127
+    assert otsu_threshold([0] * 256) == 127
+
+
+def test_uniform_page_through_otsu_and_deskew():
+    page = Image.new("RGB", (300, 200), "white")
+    assert skew_angle(page.convert("L")) == 0.0
+    layers = [("Otsu", 1.0), ("Deskew", 1.0)]
+    result = apply_pipeline(page, layers)
+    assert np.asarray(result).min() == 255
+    tiled = apply_pipeline_tiled(page, layers, tile_size=64)
+    assert np.array_equal(np.asarray(tiled), np.asarray(result))
+
+
+def test_tiled_binarized_deskew_matches_whole_image():
+    # Schräger Text auf Rauschen: Sauvola binarisiert, Deskew dreht daher mit NEAREST
+    rng = np.random.default_rng(0)
+    page = Image.new("RGB", (700, 530), (235, 230, 220))
+    draw = ImageDraw.Draw(page)
+    for y in range(30, 500, 22):
+        x = 30
+        while x < 640:
+            width = int(rng.integers(15, 60))
+            draw.rectangle((x, y, x + width, y + 9), fill=tuple(int(v) for v in rng.integers(0, 90, 3)))
+            x += width + 10
+    page = page.rotate(3.0, resample=Image.BICUBIC, fillcolor=(235, 230, 220))
+    noisy = np.asarray(page).astype(np.int16) + rng.integers(-20, 20, (530, 700, 3))
+    page = Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+    layers = [("Sauvola", 0.51), ("Kontrast", 0.17), ("Deskew", 0.27)]
+    result = np.asarray(apply_pipeline(page, layers))
+    for tile_size in (100, 128, 256):
+        tiled = apply_pipeline_tiled(page, layers, tile_size=tile_size)
+        assert np.array_equal(np.asarray(tiled), result)
+
+
+def test_local_thresholds_keep_flat_pages_white():
+    page = Image.new("RGB", (400, 300), "white")
+    ImageDraw.Draw(page).text((20, 140), "Eine Zeile Text", fill="black")
+    text = np.asarray(page)[..., 0] < 128
+    for layers in ([("Sauvola", 0.5)], [("Sauvola", 0.0)], [("Niblack", 0.5)], [("Niblack", 0.0)]):
+        for level in (255, 200, 128, 40):
+            uniform = np.asarray(apply_pipeline(Image.new("RGB", (300, 200), (level,) * 3), layers))
+            assert uniform.min() == 255, (layers, level)
+        result = np.asarray(apply_pipeline(page, layers))[..., 0]
+        assert (result[~text] == 255).mean() > 0.99, layers
+        assert (result[text] == 0).all(), layers
+        tiled = apply_pipeline_tiled(page, layers, tile_size=64)
+        assert np.array_equal(np.asarray(tiled)[..., 0], result), layers
+
+
+def test_local_thresholds_in_stripes_match_one_piece(monkeypatch):
+    rng = np.random.default_rng(1)
+    page = Image.fromarray(rng.integers(0, 256, (700, 300, 3)).astype(np.uint8))
+    for layers in ([("Sauvola", 0.3)], [("Niblack", 0.3)]):
+        monkeypatch.setenv("TILE_WORKERS", "1")
+        whole = np.asarray(apply_pipeline(page, layers))
+        monkeypatch.setenv("TILE_WORKERS", "4")
+        assert np.array_equal(np.asarray(apply_pipeline(page, layers)), whole)
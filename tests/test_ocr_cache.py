@@ -0,0 +1,30 @@
+import os
+import sys
+import types
+
+from modules import tesseract_pool
+from modules.ocr_cache import OcrCache, engine_params
+
+
+def test_overwriting_a_key_replaces_its_size(tmp_path):
+    cache = OcrCache(str(tmp_path))
+    cache.put("ab" + "0" * 38, {"text": "x" * 1000})
+    cache.put("cd" + "0" * 38, {"text": "y"})
+    cache.put("ab" + "0" * 38, {"text": "z"})
+    on_disk = sum(os.path.getsize(os.path.join(root, name))
+                  for root, _, names in os.walk(tmp_path) for name in names)
+    assert cache.disk_bytes == on_disk
+
+
+def test_tesseract_version_is_queried_once(monkeypatch):
+    calls = []
+    fake = types.ModuleType("pytesseract")
+    fake.get_tesseract_version = lambda: calls.append(1) or "5.3.0"
+    monkeypatch.setitem(sys.modules, "pytesseract", fake)
+    monkeypatch.setattr(tesseract_pool, "has_tesserocr", lambda: False)
+    tesseract_pool.tesseract_version.cache_clear()
+    try:
+        assert [engine_params("tesseract_cpu") for _ in range(3)] == [{'tesseract': '5.3.0'}] * 3
+        assert len(calls) == 1
+    finally:
+        tesseract_pool.tesseract_version.cache_clear()
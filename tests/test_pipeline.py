@@ -0,0 +1,8 @@
+from modules.pipeline import changes_geometry
+
+
+def test_changes_geometry_only_for_active_rotation():
+    assert changes_geometry([("Sauvola", 0.5), ("Deskew", 0.3)])
+    assert not changes_geometry([("Sauvola", 0.5), ("Deskew", 0.0)])
+    assert not changes_geometry([("Kontrast", 0.5)])
+    assert not changes_geometry([])